@@ -1,49 +1,77 @@
 # api.py
-from fastapi import FastAPI, UploadFile, File, Form, Query, Body
-from fastapi.responses import JSONResponse, FileResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, Query, Body, Request
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import json
+import time
+import asyncio
+import hashlib
 
-from main import run_tailoring_pipeline
-
-app = FastAPI(title="Job Buddy API", version="0.6.0", docs_url="/api/docs", redoc_url="/api/redoc")
-
-HISTORY_PATH = Path(__file__).parent / "runs_log.jsonl"
-
-# ---------- utils ----------
-def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
-    if not path.exists():
-        return []
-    out: List[Dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                out.append(json.loads(line))
-            except Exception:
-                continue
-    return out
-
-def _write_jsonl(path: Path, items: List[Dict[str, Any]]) -> None:
-    tmp = path.with_suffix(".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        for it in items:
-            f.write(json.dumps(it, ensure_ascii=False) + "\n")
-    tmp.replace(path)
-
-def _tracking_defaults(tr: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-    tr = tr or {}
-    return {
-        "applied": bool(tr.get("applied", False)),
-        "platform": tr.get("platform", ""),
-        "application_url": tr.get("application_url", ""),
-        "status": tr.get("status", "Draft"),
-        "notes": tr.get("notes", ""),
-    }
+from constants import (
+    HISTORY_BACKEND, HISTORY_PATH, HISTORY_DB_PATH, HISTORY_SEARCH_ENABLED, HISTORY_BLOBS_ENABLED, HISTORY_FSYNC,
+    JOB_DB_PATH, JOB_WORKERS, JOB_WORKER_MODE, JOB_MAX_QUEUE_DEPTH,
+    BATCH_MAX_ITEMS, WARMUP_ENABLED,
+)
+from history_store import get_history_store, tracking_defaults
+from blob_store import is_ref
+from jobs import JobQueue, QueueFull
+from resume_parser import get_resume_parser
+import metrics
+from ml_service import DeadlineExceeded
+from main import arun_tailoring_pipeline, arun_batch_pipeline, ml_service, aclose_clients, company_cache, company_research_flight, awarm_up
+
+# ---------- storage ----------
+history_store = get_history_store(
+    HISTORY_BACKEND, HISTORY_PATH, HISTORY_DB_PATH,
+    search=HISTORY_SEARCH_ENABLED, blobs=HISTORY_BLOBS_ENABLED, fsync=HISTORY_FSYNC,
+)
+job_queue = JobQueue(
+    JOB_DB_PATH,
+    workers=JOB_WORKERS,
+    mode=JOB_WORKER_MODE,
+    max_queue_depth=JOB_MAX_QUEUE_DEPTH,
+    history_store=history_store,
+)
+
+# Strong references to fire-and-forget tasks (streamed runs outliving their client).
+_background_tasks: set = set()
+
+# Warm-up state reported by /api/ready.
+_warmup: Dict[str, Any] = {"ready": not WARMUP_ENABLED, "duration_s": None, "parts": {}}
+
+async def _warm_up() -> None:
+    t0 = time.perf_counter()
+    try:
+        parts = await awarm_up()
+        t = time.perf_counter()
+        await asyncio.to_thread(history_store.page, 0, 50)  # index / first page
+        await asyncio.to_thread(history_store.sync_search_index)  # runs appended while the server was down
+        parts["history"] = round(time.perf_counter() - t, 3)
+        _warmup["parts"] = parts
+    except Exception as e:
+        _warmup["parts"]["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        _warmup["duration_s"] = round(time.perf_counter() - t0, 3)
+        _warmup["ready"] = True
+        print(f"[startup] warm-up done in {_warmup['duration_s']}s: {_warmup['parts']}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    # Warm-up runs in the background: the server accepts requests (and /api/health) at once.
+    if WARMUP_ENABLED:
+        task = asyncio.create_task(_warm_up())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    yield
+    await asyncio.to_thread(job_queue.stop)
+    await aclose_clients()
+    get_resume_parser().shutdown()
+
+app = FastAPI(title="Job Buddy API", version="0.6.0", docs_url="/api/docs", redoc_url="/api/redoc", lifespan=lifespan)
 
 # ---------- api ----------
 @app.get("/api/health")
@@ -51,16 +79,33 @@ def health():
     from datetime import datetime, timezone
     return {"status": "ok", "time": datetime.now(tz=timezone.utc).isoformat()}
 
+@app.get("/api/ready")
+def ready():
+    """Readiness probe: 503 until startup warm-up has finished (200 at once when disabled)."""
+    return JSONResponse(status_code=200 if _warmup["ready"] else 503, content=_warmup)
+
+def _generate_result(results: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "timestamp": results.get("timestamp"),
+        "requirements_text": results.get("requirements_text", ""),
+        "mapping_text": results.get("mapping_text", ""),
+        "company_profile_text": results.get("company_profile_text", ""),
+        "evidence_links": results.get("evidence_links", []),
+        "tailored_resume_text": results.get("tailored_resume_text", ""),
+        "cover_letter_text": results.get("cover_letter_text", ""),
+    }
+
 @app.post("/api/generate")
 async def generate(
     resume_file: UploadFile = File(...),
     job_description: str = Form(...),
     company_url: Optional[str] = Form(None),
     about_me: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
 ):
     try:
         resume_bytes = await resume_file.read()
-        results = run_tailoring_pipeline(
+        results = await arun_tailoring_pipeline(
             job_description=job_description,
             resume_pdf_bytes=resume_bytes,
             resume_text_fallback=None,
@@ -68,66 +113,389 @@ async def generate(
             company_url=company_url,
             about_me_or_prefs=about_me or "",
             log_path=str(HISTORY_PATH),
+            use_cache=not no_cache,
+            history_store=history_store,
+        )
+        return JSONResponse(status_code=200, content=_generate_result(results))
+    except DeadlineExceeded as e:
+        return JSONResponse(status_code=504, content={"error": f"deadline_exceeded: {e}"})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"generation_failed: {e}"})
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/generate/stream")
+async def generate_stream(
+    resume_file: UploadFile = File(...),
+    job_description: str = Form(...),
+    company_url: Optional[str] = Form(None),
+    about_me: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+):
+    """
+    Same inputs as /api/generate, answered as Server-Sent Events:
+      step_start / step_end (with duration_s and ttfb_s) for every step,
+      delta events carrying tailored resume and cover letter tokens,
+      then a final `result` (same body as /api/generate) or `error`.
+    The run keeps going if the client disconnects, so it still lands in history.
+    """
+    resume_bytes = await resume_file.read()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def _run() -> None:
+        try:
+            results = await arun_tailoring_pipeline(
+                job_description=job_description,
+                resume_pdf_bytes=resume_bytes,
+                resume_text_fallback=None,
+                company_name=None,
+                company_url=company_url,
+                about_me_or_prefs=about_me or "",
+                log_path=str(HISTORY_PATH),
+                use_cache=not no_cache,
+                history_store=history_store,
+                on_event=queue.put_nowait,
+            )
+            queue.put_nowait({"event": "result", **_generate_result(results), "timings": results.get("timings", {})})
+        except Exception as e:
+            queue.put_nowait({"event": "error", "error": f"generation_failed: {e}"})
+
+    task = asyncio.create_task(_run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+    async def _events():
+        while True:
+            ev = await queue.get()
+            name = ev.pop("event")
+            yield _sse(name, ev)
+            if name in ("result", "error"):
+                break
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/regenerate")
+async def regenerate(
+    index: int = Form(..., ge=0),
+    resume_file: Optional[UploadFile] = File(None),
+    job_description: Optional[str] = Form(None),
+    company_name: Optional[str] = Form(None),
+    company_url: Optional[str] = Form(None),
+    about_me: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+):
+    """
+    Rerun a history entry (newest-first `index`) with some inputs changed;
+    omitted fields keep their previous values. Only steps whose inputs
+    changed are recomputed, e.g. new preferences rerun just the cover letter.
+    The result lists reused_steps and recomputed_steps and is saved to
+    history as a new run.
+    """
+    previous = await asyncio.to_thread(history_store.get, index)
+    if previous is None:
+        return JSONResponse(status_code=404, content={"error": "index out of range"})
+    inputs = previous.get("inputs", {}) or {}
+    resume_bytes = await resume_file.read() if resume_file is not None else None
+    if not resume_bytes and not previous.get("resume_text"):
+        return JSONResponse(status_code=400, content={"error": "this run predates regeneration; upload the resume again"})
+
+    try:
+        results = await arun_tailoring_pipeline(
+            job_description=job_description if job_description is not None else inputs.get("job_description") or "",
+            resume_pdf_bytes=resume_bytes or None,
+            resume_text_fallback=previous.get("resume_text"),
+            company_name=company_name if company_name is not None else inputs.get("company_name"),
+            company_url=company_url if company_url is not None else inputs.get("company_url"),
+            about_me_or_prefs=about_me if about_me is not None else inputs.get("about_me_or_prefs") or "",
+            log_path=str(HISTORY_PATH),
+            use_cache=not no_cache,
+            history_store=history_store,
+            previous=previous,
+        )
+    except DeadlineExceeded as e:
+        return JSONResponse(status_code=504, content={"error": f"deadline_exceeded: {e}"})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"generation_failed: {e}"})
+
+    reused = results.get("reused_steps", [])
+    return {
+        **_generate_result(results),
+        "reused_steps": reused,
+        "recomputed_steps": [name for name in results.get("steps", {}) if name not in reused],
+    }
+
+@app.post("/api/batch")
+async def generate_batch(
+    resume_file: UploadFile = File(...),
+    items: str = Form(...),
+    about_me: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+):
+    """
+    One resume, many postings. `items` is a JSON list of
+    {"job_description", "company_url"?, "company_name"?, "about_me"?}.
+    Returns per-item results (same body as /api/generate) or errors, in order.
+    """
+    try:
+        parsed = json.loads(items)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "items must be a JSON list"})
+    if not isinstance(parsed, list) or not parsed or not all(isinstance(it, dict) for it in parsed):
+        return JSONResponse(status_code=400, content={"error": "items must be a non-empty JSON list of objects"})
+    if len(parsed) > BATCH_MAX_ITEMS:
+        return JSONResponse(status_code=413, content={"error": f"too many items (max {BATCH_MAX_ITEMS})"})
+
+    try:
+        resume_bytes = await resume_file.read()
+        batch = await arun_batch_pipeline(
+            items=parsed,
+            resume_pdf_bytes=resume_bytes,
+            about_me_or_prefs=about_me or "",
+            log_path=str(HISTORY_PATH),
+            use_cache=not no_cache,
+            history_store=history_store,
         )
-        return JSONResponse(status_code=200, content={
-            "timestamp": results.get("timestamp"),
-            "requirements_text": results.get("requirements_text", ""),
-            "mapping_text": results.get("mapping_text", ""),
-            "company_profile_text": results.get("company_profile_text", ""),
-            "evidence_links": results.get("evidence_links", []),
-            "tailored_resume_text": results.get("tailored_resume_text", ""),
-            "cover_letter_text": results.get("cover_letter_text", ""),
-        })
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": f"generation_failed: {e}"})
 
+    out = []
+    for entry in batch["items"]:
+        if entry["status"] == "succeeded":
+            entry = dict(entry, result=_generate_result(entry["result"]))
+        out.append(entry)
+    return {"items": out, "summary": batch["summary"]}
+
+# ---------- background jobs ----------
+@app.post("/api/jobs")
+async def submit_job(
+    resume_file: UploadFile = File(...),
+    job_description: str = Form(...),
+    company_url: Optional[str] = Form(None),
+    about_me: Optional[str] = Form(None),
+    no_cache: bool = Form(False),
+):
+    """Queue a generation (same inputs as /api/generate); poll GET /api/jobs/{job_id}."""
+    resume_bytes = await resume_file.read()
+    params = {
+        "job_description": job_description,
+        "company_url": company_url,
+        "about_me_or_prefs": about_me or "",
+        "use_cache": not no_cache,
+    }
+    try:
+        job = await asyncio.to_thread(job_queue.submit, params, resume_bytes)
+    except QueueFull as e:
+        return JSONResponse(status_code=429, content={"error": str(e)}, headers={"Retry-After": "30"})
+    return JSONResponse(status_code=202, content=job)
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "job not found"})
+    results = job.pop("result")
+    if results is not None:
+        job["result"] = _generate_result(results)
+        job["timings"] = results.get("timings", {})
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"error": "job not found"})
+    return {"job_id": job_id, "status": status}
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {
+        "llm": ml_service.cache.stats() if ml_service.cache else None,
+        "company": dict(company_cache.stats(), coalesced=company_research_flight.coalesced) if company_cache else None,
+        "resume": get_resume_parser().cache.stats() if get_resume_parser().cache else None,
+        "prompt_cache": ml_service.prompt_cache_stats(),
+    }
+
+def _scrape_gauges():
+    """Point-in-time values sampled on each /api/metrics scrape."""
+    samples = [("jobbuddy_job_queue_depth", "Queued background jobs.", {}, job_queue.queue_depth())]
+    caches = {"llm": ml_service.cache, "company": company_cache, "resume": get_resume_parser().cache}
+    for name, cache in caches.items():
+        if cache is not None:
+            samples.append(("jobbuddy_response_cache_hit_rate", "Response cache hit rate since start.", {"cache": name}, cache.stats()["hit_rate"]))
+    for call_type, c in ml_service.prompt_cache_stats().items():
+        samples.append(("jobbuddy_prompt_cache_hit_rate", "Share of prompt tokens served from the upstream prompt cache.", {"call_type": call_type}, c["hit_rate"]))
+    if ml_service.rate_limiter is not None:
+        for model, st in ml_service.rate_limiter.stats().items():
+            samples.append(("jobbuddy_rate_limit_queued", "Calls waiting for rate-limit budget.", {"model": model}, st["queued"]))
+            samples.append(("jobbuddy_rate_limit_tokens_available", "Tokens-per-minute budget currently available.", {"model": model}, st["tokens_available"]))
+    return samples
+
+metrics.registry.add_collector(_scrape_gauges)
+
+@app.get("/api/metrics")
+def prometheus_metrics():
+    """
+    Prometheus text exposition: step/run latency histograms, upstream call
+    latency, queue and retry waits, tokens, cost and cache hits. Jobs run in
+    process mode (JOB_WORKER_MODE=process) record in their child processes
+    and are not included here.
+    """
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Large text fields of a run; the summary view only ships previews of these.
+HISTORY_TEXT_FIELDS = (
+    "job_description",
+    "about_me_or_prefs",
+    "resume_text_excerpt",
+    "mapping_text",
+    "tailored_resume_text",
+    "cover_letter_text",
+)
+
+def _history_value(it: Dict[str, Any], field: str) -> Any:
+    """A text field as stored: a string, or a blob reference when its text is in the blob store."""
+    # Snapshots store outputs at the top level; older logs nest them.
+    inputs = it.get("inputs", {}) or {}
+    extracted = it.get("extracted", {}) or {}
+    outputs = it.get("outputs", {}) or {}
+    if field in ("job_description", "about_me_or_prefs"):
+        return inputs.get(field) or ""
+    if field == "resume_text_excerpt":
+        return extracted.get(field) or it.get(field) or ""
+    if field == "mapping_text":
+        return it.get("mapping") or it.get(field) or ""
+    return outputs.get(field) or it.get(field) or ""
+
+def _history_field(it: Dict[str, Any], field: str) -> str:
+    # Rows are read with resolve=False: only the fields shown are fetched from the blob store.
+    history_store.resolve_fields(it, [field])
+    return _history_value(it, field)
+
+def _history_preview(it: Dict[str, Any], field: str, preview_chars: int) -> Tuple[str, int]:
+    """(first preview_chars chars, length) of a field, without inflating blobs when the reference says enough."""
+    value = _history_value(it, field)
+    if not is_ref(value):
+        return value[:preview_chars], len(value)
+    head = value.get("head") or ""
+    if preview_chars == 0 or preview_chars <= len(head) or len(head) >= value["chars"]:
+        return head[:preview_chars], value["chars"]
+    return _history_field(it, field)[:preview_chars], value["chars"]
+
+def _history_row(it: Dict[str, Any], idx: int, view: str, preview_chars: int) -> Dict[str, Any]:
+    inputs = it.get("inputs", {}) or {}
+    tr = tracking_defaults(it.get("tracking"))
+    row: Dict[str, Any] = {
+        "idx": idx,  # newest-first index
+        "timestamp": it.get("timestamp"),
+        "company_name": inputs.get("company_name") or inputs.get("company_url") or "",
+    }
+    if view == "summary":
+        previews = {f: _history_preview(it, f, preview_chars) for f in HISTORY_TEXT_FIELDS}
+        row["previews"] = {f: p for f, (p, _) in previews.items()}
+        row["lengths"] = {f: n for f, (_, n) in previews.items()}
+    else:
+        # full text so the UI can render markdown directly in cells
+        for f in HISTORY_TEXT_FIELDS:
+            row[f] = _history_field(it, f)
+    row.update({
+        # evidence
+        "evidence_links": it.get("evidence_links", []),
+
+        # tracking / editable
+        "applied": tr["applied"],
+        "platform": tr["platform"],
+        "application_url": tr["application_url"],
+        "status": tr["status"],
+        "notes": tr["notes"],
+    })
+    return row
+
+def _etag(*parts: Any) -> str:
+    return '"' + hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest() + '"'
+
 @app.get("/api/history")
-def history(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+def history(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    preview_chars: int = Query(280, ge=0, le=4000),
+):
+    """
+    Newest-first rows for the table.
+
+    view=full     includes the big text fields (rendered as Markdown in cells)
+    view=summary  fixed-length previews + lengths only; fetch full text with
+                  /api/history/field or /api/history/detail
+
+    Responses carry an ETag derived from the store version, so a matching
+    If-None-Match returns 304 without reading the page.
+    """
+    version = history_store.version()
+    etag = _etag(version, limit, offset, view, preview_chars) if version is not None else None
+    if etag and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    slice_ = history_store.page(offset, limit, resolve=False)  # newest first
+    summarized: List[Dict[str, Any]] = [
+        _history_row(it, offset + i, view, preview_chars) for i, it in enumerate(slice_)
+    ]
+    content = {"items": summarized, "total": history_store.count()}
+    if etag is None:
+        etag = _etag(content)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return JSONResponse(content=content, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/api/history/search")
+def history_search(
+    q: str = Query("", max_length=500),
+    status: Optional[str] = Query(None),
+    applied: Optional[bool] = Query(None),
+    since: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}"),
+    until: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}"),
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    preview_chars: int = Query(280, ge=0, le=4000),
+):
     """
-    Newest-first summary for table, including the big text fields the user
-    asked for (so the UI can render them as Markdown directly in cells).
+    Search runs by company, job description, generated documents and tracking
+    notes. Terms are ANDed; "quoted phrases" and prefix* work. Results are
+    ranked by relevance (newest first when q is empty), as summary rows plus
+    `score` and a highlighted `snippet`. Filters: tracking status, applied,
+    and a timestamp range (since/until as YYYY-MM-DD or ISO timestamps).
     """
-    items = list(reversed(_read_jsonl(HISTORY_PATH)))  # newest first
-    slice_ = items[offset: offset + limit]
-    summarized: List[Dict[str, Any]] = []
-    for i, it in enumerate(slice_):
-        inputs = it.get("inputs", {}) or {}
-        extracted = it.get("extracted", {}) or {}
-        outputs = it.get("outputs", {}) or {}
-        tr = _tracking_defaults(it.get("tracking"))
-
-        summarized.append({
-            "idx": offset + i,  # newest-first index
-            "timestamp": it.get("timestamp"),
-            "company_name": inputs.get("company_name") or inputs.get("company_url") or "",
-
-            # requested columns (full text so we can render as markdown)
-            "job_description": inputs.get("job_description", ""),
-            "about_me_or_prefs": inputs.get("about_me_or_prefs", ""),
-            "resume_text_excerpt": extracted.get("resume_text_excerpt", ""),
-            "mapping_text": it.get("mapping") or it.get("mapping_text", ""),
-            "tailored_resume_text": outputs.get("tailored_resume_text", ""),
-            "cover_letter_text": outputs.get("cover_letter_text", ""),
-
-            # evidence
-            "evidence_links": it.get("evidence_links", []),
-
-            # tracking / editable
-            "applied": tr["applied"],
-            "platform": tr["platform"],
-            "application_url": tr["application_url"],
-            "status": tr["status"],
-            "notes": tr["notes"],
-        })
-    return {"items": summarized, "total": len(items)}
+    if history_store.search_index is None:
+        return JSONResponse(status_code=404, content={"error": "history search is disabled (HISTORY_SEARCH_ENABLED=0)"})
+    found = history_store.search(
+        q, offset=offset, limit=limit, status=status, applied=applied, since=since, until=until,
+    )
+    items = [
+        dict(_history_row(hit["record"], hit["index"], "summary", preview_chars), score=hit["score"], snippet=hit["snippet"])
+        for hit in found["items"]
+    ]
+    return {"items": items, "total": found["total"], "offset": offset, "limit": limit}
+
+@app.get("/api/history/field")
+def history_field(index: int = Query(..., ge=0), field: str = Query(...)):
+    if field not in HISTORY_TEXT_FIELDS:
+        return JSONResponse(status_code=400, content={"error": f"unknown field (expected one of {', '.join(HISTORY_TEXT_FIELDS)})"})
+    item = history_store.get(index, resolve=False)
+    if item is None:
+        return JSONResponse(status_code=404, content={"error": "index out of range"})
+    return {"index": index, "field": field, "text": _history_field(item, field)}
 
 @app.get("/api/history/detail")
 def history_detail(index: int = Query(..., ge=0)):
-    items = list(reversed(_read_jsonl(HISTORY_PATH)))  # newest first
-    print(items[0].keys())
-    if index >= len(items):
+    item = history_store.get(index)
+    if item is None:
         return JSONResponse(status_code=404, content={"error": "index out of range"})
-    return items[index]
+    return item
 
 @app.post("/api/history/update")
 def history_update(payload: Dict[str, Any] = Body(...)):
@@ -136,20 +504,9 @@ def history_update(payload: Dict[str, Any] = Body(...)):
     except Exception:
         return JSONResponse(status_code=400, content={"error": "invalid index"})
 
-    items_oldest = _read_jsonl(HISTORY_PATH)             # oldest first
-    items_newest = list(reversed(items_oldest))          # newest first
-    if index < 0 or index >= len(items_newest):
+    tr = history_store.update_tracking(index, payload)
+    if tr is None:
         return JSONResponse(status_code=404, content={"error": "index out of range"})
-
-    run_obj = items_newest[index]
-    tr = _tracking_defaults(run_obj.get("tracking"))
-    for key in ("applied", "platform", "application_url", "status", "notes"):
-        if key in payload and payload[key] is not None:
-            tr[key] = payload[key]
-    run_obj["tracking"] = tr
-
-    items_newest[index] = run_obj
-    _write_jsonl(HISTORY_PATH, list(reversed(items_newest)))  # write back oldest first
     return {"ok": True, "tracking": tr}
 
 # ---------- static ----------
@@ -0,0 +1,8 @@
+# bench/__init__.py
+"""
+Offline benchmarks: a mock OpenAI server (mock_openai), sample inputs
+(samples) and a load driver writing JSON results (run). Run from backend/:
+
+  python -m bench.run all --out bench/results/latest.json
+  python -m bench.run compare bench/results/before.json bench/results/latest.json
+"""
@@ -0,0 +1,154 @@
+# bench/history_stress.py
+"""
+Concurrency stress test for JSONL history writes across processes.
+
+Several spawned processes, each with several threads sharing one
+JsonlHistoryStore, hammer the same log at once with:
+  - store appends (API / job workers)
+  - bare append_jsonl calls (writers that bypass the store, e.g. scripts)
+  - tracking updates on seeded runs, each run owned by one thread so its
+    final tracking is known, with compact_every set low so the log is
+    rewritten many times while the others write
+
+Afterwards a fresh store reads the log back and checks that every append is
+there exactly once and every seeded run carries its owner's last update.
+Exits 1 on any lost or duplicated write.
+
+Usage (from backend/):
+  python -m bench.history_stress --processes 4 --threads 4 --ops 300
+  python -m bench.history_stress --no-fsync --compact-every 20
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+from typing import Dict, Any, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from history_store import JsonlHistoryStore, append_jsonl  # noqa: E402
+
+
+def _record(name: str) -> Dict[str, Any]:
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "inputs": {"company_name": name}, "mapping_text": "x" * 200}
+
+
+def _worker(args: Tuple[str, int, int, int, int, int, bool]) -> Dict[str, Any]:
+    log, proc, threads, ops, seeds, compact_every, fsync = args
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = JsonlHistoryStore(Path(log), compact_every=compact_every, search=False, blobs=False, fsync=fsync)
+    n_workers = threads * int(os.environ["STRESS_PROCESSES"])
+
+    def run(thread: int) -> Dict[str, Any]:
+        wid = proc * threads + thread
+        owned = [s for s in range(seeds) if s % n_workers == wid]
+        appended, last_note = [], {}
+        for k in range(ops):
+            kind = k % 4
+            if kind == 0:
+                name = f"store-{wid}-{k}"
+                store.append(_record(name))
+                appended.append(name)
+            elif kind == 1:
+                name = f"raw-{wid}-{k}"
+                append_jsonl(Path(log), _record(name), fsync=fsync)
+                appended.append(name)
+            elif owned:
+                seq = owned[k % len(owned)]
+                note = f"{wid}:{k}"
+                if store.update_tracking_at(seq, {"notes": note, "status": "Applied"}) is None:
+                    raise RuntimeError(f"seeded run {seq} not found")
+                last_note[seq] = note
+        return {"appended": appended, "last_note": last_note}
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(run, range(threads)))
+    return {
+        "appended": [n for r in results for n in r["appended"]],
+        "last_note": {s: n for r in results for s, n in r["last_note"].items()},
+        "batches": store.writer.batches,
+        "operations": store.writer.operations,
+    }
+
+
+def stress(processes: int, threads: int, ops: int, seeds: int, compact_every: int, fsync: bool, workdir: Path) -> Dict[str, Any]:
+    log = workdir / "runs_log.jsonl"
+    seeder = JsonlHistoryStore(log, search=False, blobs=False, fsync=False)
+    for i in range(seeds):
+        seeder.append(_record(f"seed-{i}"))
+
+    os.environ["STRESS_PROCESSES"] = str(processes)  # inherited by spawned workers
+    t0 = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes) as pool:
+        outs = pool.map(_worker, [(str(log), p, threads, ops, seeds, compact_every, fsync) for p in range(processes)])
+    duration = time.perf_counter() - t0
+
+    check = JsonlHistoryStore(log, search=False, blobs=False, fsync=False)
+    total = check.count()
+    records = check.page(0, total)[::-1]  # oldest first
+    names = [r.get("inputs", {}).get("company_name") for r in records]
+    seen: Dict[str, int] = {}
+    for n in names:
+        seen[n] = seen.get(n, 0) + 1
+
+    expected = [n for o in outs for n in o["appended"]]
+    lost_appends = [n for n in expected if n not in seen]
+    duplicated = [n for n, c in seen.items() if c > 1]
+    lost_updates = []
+    for o in outs:
+        for seq, note in o["last_note"].items():
+            tr = records[seq].get("tracking") or {}
+            if names[seq] != f"seed-{seq}" or tr.get("notes") != note:
+                lost_updates.append({"seq": seq, "expected": note, "found": tr.get("notes")})
+
+    write_ops = sum(o["operations"] for o in outs)
+    batches = sum(o["batches"] for o in outs)
+    raw_appends = sum(1 for n in expected if n.startswith("raw-"))
+    return {
+        "processes": processes,
+        "threads_per_process": threads,
+        "ops_per_thread": ops,
+        "fsync": fsync,
+        "compact_every": compact_every,
+        "duration_s": round(duration, 3),
+        "writes": write_ops + raw_appends,
+        "writes_per_s": round((write_ops + raw_appends) / duration, 1) if duration else None,
+        "group_commits": batches,
+        "ops_per_group_commit": round(write_ops / batches, 2) if batches else None,
+        "records": total,
+        "expected_records": seeds + len(expected),
+        "lost_appends": len(lost_appends),
+        "duplicated": len(duplicated),
+        "lost_updates": len(lost_updates),
+        "examples": {"lost_appends": lost_appends[:5], "duplicated": duplicated[:5], "lost_updates": lost_updates[:5]},
+        "ok": not lost_appends and not duplicated and not lost_updates and total == seeds + len(expected),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cross-process stress test for JSONL history writes.")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=200, help="operations per thread")
+    parser.add_argument("--seeds", type=int, default=64, help="seeded runs receiving tracking updates")
+    parser.add_argument("--compact-every", type=int, default=50)
+    parser.add_argument("--no-fsync", action="store_true")
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="history-stress-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    report = stress(args.processes, args.threads, args.ops, args.seeds, args.compact_every, not args.no_fsync, workdir)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+# bench/mock_openai.py
+"""
+Local stand-in for the parts of the OpenAI API the backend uses, so the app
+can be load-tested without spending money:
+
+  POST /v1/chat/completions    JSON or SSE streaming (stream_options.include_usage)
+  POST /v1/responses           research-style answer with a web_search_call item
+  POST /v1/files               multipart upload (purpose=batch)
+  GET  /v1/files/{id}/content
+  POST /v1/batches             answered immediately, "completed" after N polls
+  GET  /v1/batches/{id}
+
+Behaviour is set by MockConfig (CLI flags below, or POST /_mock/config at
+runtime):
+  - latency: lognormal around latency_ms (latency_sigma=0 makes it fixed);
+    streams pace chunks at stream_tps tokens/s after the first-token delay
+  - faults: error_rate of 500/502/503 and rate_limit_rate of random 429s
+  - limits: rpm / tpm sliding one-minute windows; every response carries
+    x-ratelimit-* headers and going over answers 429 with Retry-After
+  - usage: prompt tokens ~ chars/4; a repeated >=1024-token prompt prefix
+    reports cached_tokens like the real prompt cache
+
+GET /_mock/stats returns request/fault counters; POST /_mock/reset clears them.
+
+Usage (from backend/):
+  python -m bench.mock_openai --port 8765 --latency-ms 400 --rate-limit-rate 0.02
+  OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=sk-mock uvicorn api:app
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, Tuple
+
+_WORDS = (
+    "led team built scalable python services kubernetes reduced latency improved reliability "
+    "designed api postgres migration mentored engineers shipped features owned roadmap "
+    "stakeholders metrics customers growth cloud aws pipelines automation testing quality"
+).split()
+
+
+class MockConfig:
+    def __init__(
+        self,
+        latency_ms: float = 400.0,
+        latency_sigma: float = 0.35,
+        stream_tps: float = 0.0,
+        completion_tokens: int = 250,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        rpm: int = 5000,
+        tpm: int = 2_000_000,
+        retry_after_s: float = 1.0,
+        batch_polls: int = 2,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.stream_tps = stream_tps
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.tpm = tpm
+        self.retry_after_s = retry_after_s
+        self.batch_polls = batch_polls
+        self.seed = seed
+
+    def update(self, changes: Dict[str, Any]) -> None:
+        for k, v in changes.items():
+            if not hasattr(self, k):
+                raise KeyError(k)
+            setattr(self, k, type(getattr(self, k))(v) if getattr(self, k) is not None else v)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class MockState:
+    """Counters, rate-limit windows, prompt-cache prefixes and batch/file storage."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.random = random.Random(config.seed)
+        self.requests: "deque[float]" = deque()
+        self.tokens: "deque[Tuple[float, int]]" = deque()
+        self.prefixes: set = set()
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stats: Dict[str, float] = {
+                "chat": 0, "chat_stream": 0, "responses": 0, "batches": 0, "batch_lines": 0, "files": 0,
+                "rate_limited": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            }
+            self.requests.clear()
+            self.tokens.clear()
+
+    def count(self, key: str, n: float = 1) -> None:
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + n
+
+    def chance(self, p: float) -> bool:
+        with self.lock:
+            return p > 0 and self.random.random() < p
+
+    def latency(self) -> float:
+        c = self.config
+        with self.lock:
+            jitter = math.exp(self.random.gauss(0.0, c.latency_sigma)) if c.latency_sigma > 0 else 1.0
+        return max(0.0, c.latency_ms * jitter / 1000.0)
+
+    # ---------- rate limits ----------
+
+    def admit(self, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """Record a request of `tokens` in the one-minute windows; (allowed, x-ratelimit headers)."""
+        c = self.config
+        now = time.monotonic()
+        with self.lock:
+            while self.requests and now - self.requests[0] >= 60:
+                self.requests.popleft()
+            while self.tokens and now - self.tokens[0][0] >= 60:
+                self.tokens.popleft()
+            used_tokens = sum(n for _, n in self.tokens)
+            allowed = (not c.rpm or len(self.requests) < c.rpm) and (not c.tpm or used_tokens + tokens <= c.tpm)
+            if allowed:
+                self.requests.append(now)
+                self.tokens.append((now, tokens))
+                used_tokens += tokens
+            reset_requests = 60 - (now - self.requests[0]) if self.requests else 0.0
+            reset_tokens = 60 - (now - self.tokens[0][0]) if self.tokens else 0.0
+            headers = {}
+            if c.rpm:
+                headers.update({
+                    "x-ratelimit-limit-requests": str(c.rpm),
+                    "x-ratelimit-remaining-requests": str(max(0, c.rpm - len(self.requests))),
+                    "x-ratelimit-reset-requests": f"{reset_requests:.3f}s",
+                })
+            if c.tpm:
+                headers.update({
+                    "x-ratelimit-limit-tokens": str(c.tpm),
+                    "x-ratelimit-remaining-tokens": str(max(0, c.tpm - used_tokens)),
+                    "x-ratelimit-reset-tokens": f"{reset_tokens:.3f}s",
+                })
+            return allowed, headers
+
+    def cached_tokens(self, prefix: str, prompt_tokens: int) -> int:
+        """Like OpenAI's prompt cache: reuse of a >=1024-token prefix, in 128-token steps."""
+        prefix_tokens = _count(prefix)
+        if prompt_tokens < 1024 or prefix_tokens < 1024:
+            return 0
+        key = hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+        with self.lock:
+            seen = key in self.prefixes
+            self.prefixes.add(key)
+        return (prefix_tokens // 128) * 128 if seen else 0
+
+
+def _count(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _text(n_tokens: int, seed: str) -> str:
+    rnd = random.Random(seed)
+    words = [rnd.choice(_WORDS) for _ in range(max(1, n_tokens))]
+    lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+    return "\n".join(f"- {l}" for l in lines)
+
+
+# ---------- response bodies ----------
+
+def _chat_answer(state: MockState, body: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    messages = body.get("messages") or []
+    prompt = "".join(m.get("content") if isinstance(m.get("content"), str) else json.dumps(m.get("content")) for m in messages)
+    prompt_tokens = _count(prompt)
+    n = min(state.config.completion_tokens, body.get("max_tokens") or state.config.completion_tokens)
+    text = _text(n, prompt[-200:])
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        text = json.dumps({"text": text})
+    prefix = messages[0].get("content") if messages and isinstance(messages[0].get("content"), str) else ""
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": n,
+        "total_tokens": prompt_tokens + n,
+        "prompt_tokens_details": {"cached_tokens": state.cached_tokens(prefix, prompt_tokens)},
+    }
+    return text, usage
+
+def _chat_completion(body: Dict[str, Any], text: str, usage: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-" + uuid.uuid4().hex[:12],
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+def _responses_answer(state: MockState, body: Dict[str, Any]) -> Dict[str, Any]:
+    prompt = (body.get("instructions") or "") + json.dumps(body.get("input"))
+    n = min(state.config.completion_tokens, 400)
+    text = "Company profile\n" + _text(n, prompt) + "\nhttps://example.com/about\nhttps://example.com/careers\nhttps://news.example.org/profile"
+    prompt_tokens = _count(prompt)
+    return {
+        "id": "resp_" + uuid.uuid4().hex[:12],
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body.get("model", "gpt-4.1"),
+        "status": "completed",
+        "output": [
+            {"type": "web_search_call", "id": "ws_" + uuid.uuid4().hex[:8], "status": "completed"},
+            {"type": "message", "id": "msg_" + uuid.uuid4().hex[:8], "status": "completed", "role": "assistant",
+             "content": [{"type": "output_text", "text": text, "annotations": []}]},
+        ],
+        "parallel_tool_calls": False,
+        "tool_choice": body.get("tool_choice", "auto"),
+        "tools": body.get("tools", []),
+        "usage": {
+            "input_tokens": prompt_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": n,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": prompt_tokens + n,
+        },
+    }
+
+def _error_body(status: int) -> Dict[str, Any]:
+    if status == 429:
+        return {"error": {"message": "Rate limit reached (mock). Please try again in 1s.", "type": "requests", "code": "rate_limit_exceeded"}}
+    return {"error": {"message": f"Mock upstream error {status}", "type": "server_error", "code": None}}
+
+
+# ---------- HTTP ----------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: MockState = None  # set per server by start()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, obj: Any = None, raw: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None) -> None:
+        data = raw if raw is not None else json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json" if raw is None else "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _faults(self, tokens: int) -> Optional[Dict[str, str]]:
+        """Apply limits and injected faults; returns rate-limit headers, or None if an error was sent."""
+        st = self.state
+        allowed, headers = st.admit(tokens)
+        if not allowed or st.chance(st.config.rate_limit_rate):
+            st.count("rate_limited")
+            self._send(429, _error_body(429), headers=dict(headers, **{"retry-after": f"{st.config.retry_after_s:g}"}))
+            return None
+        if st.chance(st.config.error_rate):
+            st.count("errors")
+            time.sleep(st.latency() / 2)
+            with st.lock:
+                status = st.random.choice((500, 502, 503))
+            self._send(status, _error_body(status), headers=headers)
+            return None
+        return headers
+
+    def do_POST(self):
+        st = self.state
+        raw = self._body()
+        path = self.path.split("?", 1)[0].rstrip("/")
+
+        if path.endswith("/chat/completions"):
+            body = json.loads(raw or b"{}")
+            text, usage = _chat_answer(st, body)
+            headers = self._faults(usage["total_tokens"])
+            if headers is None:
+                return
+            st.count("prompt_tokens", usage["prompt_tokens"])
+            st.count("completion_tokens", usage["completion_tokens"])
+            if body.get("stream"):
+                return self._stream(body, text, usage, headers)
+            st.count("chat")
+            time.sleep(st.latency())
+            return self._send(200, _chat_completion(body, text, usage), headers=headers)
+
+        if path.endswith("/responses"):
+            body = json.loads(raw or b"{}")
+            out = _responses_answer(st, body)
+            headers = self._faults(out["usage"]["total_tokens"])
+            if headers is None:
+                return
+            st.count("responses")
+            st.count("prompt_tokens", out["usage"]["input_tokens"])
+            st.count("completion_tokens", out["usage"]["output_tokens"])
+            time.sleep(st.latency() * 3)  # web search is several model turns
+            return self._send(200, out, headers=headers)
+
+        if path.endswith("/files"):
+            content = _multipart_file(self.headers.get("Content-Type", ""), raw)
+            file_id = "file-" + uuid.uuid4().hex[:12]
+            with st.lock:
+                st.files[file_id] = content
+            st.count("files")
+            return self._send(200, _file_object(file_id, len(content)))
+
+        if path.endswith("/batches"):
+            return self._create_batch(json.loads(raw or b"{}"))
+
+        m = re.search(r"/batches/([\w-]+)/cancel$", path)
+        if m and m.group(1) in st.batches:
+            st.batches[m.group(1)]["status"] = "cancelled"
+            return self._send(200, self._batch_view(m.group(1)))
+
+        if path == "/_mock/config":
+            try:
+                st.config.update(json.loads(raw or b"{}"))
+            except (KeyError, ValueError) as e:
+                return self._send(400, {"error": f"bad config: {e}"})
+            return self._send(200, st.config.as_dict())
+
+        if path == "/_mock/reset":
+            st.reset()
+            return self._send(200, {"ok": True})
+
+        self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_GET(self):
+        st = self.state
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/_mock/stats":
+            with st.lock:
+                return self._send(200, dict(st.stats, config=st.config.as_dict()))
+        if path.endswith("/models"):
+            return self._send(200, {"object": "list", "data": [{"id": m, "object": "model", "created": 0, "owned_by": "mock"}
+                                                              for m in ("gpt-4o-mini", "gpt-4o", "gpt-4.1", "gpt-4.1-mini")]})
+        m = re.search(r"/files/([\w-]+)/content$", path)
+        if m and m.group(1) in st.files:
+            return self._send(200, raw=st.files[m.group(1)])
+        m = re.search(r"/files/([\w-]+)$", path)
+        if m and m.group(1) in st.files:
+            return self._send(200, _file_object(m.group(1), len(st.files[m.group(1)])))
+        m = re.search(r"/batches/([\w-]+)$", path)
+        if m and m.group(1) in st.batches:
+            b = st.batches[m.group(1)]
+            b["polls"] += 1
+            if b["status"] == "in_progress" and b["polls"] >= st.config.batch_polls:
+                b["status"] = "completed"
+            return self._send(200, self._batch_view(m.group(1)))
+        self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    # ---------- streaming ----------
+
+    def _stream(self, body: Dict[str, Any], text: str, usage: Dict[str, Any], headers: Dict[str, str]) -> None:
+        st = self.state
+        st.count("chat_stream")
+        time.sleep(st.latency())  # time to first token
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+
+        base = {"id": "chatcmpl-" + uuid.uuid4().hex[:12], "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model", "gpt-4o-mini")}
+        words = re.findall(r"\S+\s*", text)
+        step = 4
+        for i in range(0, len(words), step):
+            piece = "".join(words[i:i + step])
+            chunk = dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            self._chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            if st.config.stream_tps > 0:
+                time.sleep(step / st.config.stream_tps)
+        self._chunk(f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))}\n\n".encode("utf-8"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._chunk(f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n".encode("utf-8"))
+        self._chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    # ---------- batches ----------
+
+    def _create_batch(self, body: Dict[str, Any]) -> None:
+        st = self.state
+        content = st.files.get(body.get("input_file_id"))
+        if content is None:
+            return self._send(404, {"error": {"message": "input file not found"}})
+        out, err = [], []
+        for line in content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            req = json.loads(line)
+            if st.chance(st.config.error_rate):
+                response = {"status_code": 500, "request_id": uuid.uuid4().hex, "body": _error_body(500)}
+            elif req["url"].endswith("/chat/completions"):
+                text, usage = _chat_answer(st, req["body"])
+                response = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": _chat_completion(req["body"], text, usage)}
+            else:
+                response = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": _responses_answer(st, req["body"])}
+            rec = {"id": "batch_req_" + uuid.uuid4().hex[:12], "custom_id": req["custom_id"], "response": response, "error": None}
+            (out if response["status_code"] == 200 else err).append(json.dumps(rec))
+        st.count("batches")
+        st.count("batch_lines", len(out) + len(err))
+
+        batch_id = "batch_" + uuid.uuid4().hex[:12]
+        with st.lock:
+            output_id = "file-" + uuid.uuid4().hex[:12]
+            st.files[output_id] = ("\n".join(out) + "\n").encode("utf-8") if out else b""
+            error_id = None
+            if err:
+                error_id = "file-" + uuid.uuid4().hex[:12]
+                st.files[error_id] = ("\n".join(err) + "\n").encode("utf-8")
+            st.batches[batch_id] = {
+                "id": batch_id, "endpoint": body.get("endpoint"), "input_file_id": body.get("input_file_id"),
+                "completion_window": body.get("completion_window", "24h"), "status": "in_progress", "polls": 0,
+                "output_file_id": output_id, "error_file_id": error_id,
+                "request_counts": {"total": len(out) + len(err), "completed": len(out), "failed": len(err)},
+                "metadata": body.get("metadata"),
+            }
+        self._send(200, self._batch_view(batch_id))
+
+    def _batch_view(self, batch_id: str) -> Dict[str, Any]:
+        b = self.state.batches[batch_id]
+        done = b["status"] == "completed"
+        return {
+            "id": b["id"], "object": "batch", "endpoint": b["endpoint"], "errors": None,
+            "input_file_id": b["input_file_id"], "completion_window": b["completion_window"],
+            "status": b["status"], "created_at": 0,
+            "output_file_id": b["output_file_id"] if done else None,
+            "error_file_id": b["error_file_id"] if done else None,
+            "request_counts": b["request_counts"] if done else {"total": b["request_counts"]["total"], "completed": 0, "failed": 0},
+            "metadata": b["metadata"],
+        }
+
+
+def _file_object(file_id: str, size: int) -> Dict[str, Any]:
+    return {"id": file_id, "object": "file", "bytes": size, "created_at": int(time.time()),
+            "filename": f"{file_id}.jsonl", "purpose": "batch", "status": "processed"}
+
+def _multipart_file(content_type: str, raw: bytes) -> bytes:
+    m = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not m:
+        return raw
+    for part in raw.split(b"--" + m.group(1).encode()):
+        head, _, data = part.partition(b"\r\n\r\n")
+        if b'name="file"' in head:
+            return data[:-2] if data.endswith(b"\r\n") else data
+    return b""
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-response (timeouts, cancelled hedges) are expected.
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def start(port: int = 0, config: Optional[MockConfig] = None, host: str = "127.0.0.1") -> Tuple[ThreadingHTTPServer, MockState]:
+    """Serve in a daemon thread; port 0 picks a free port (see server.server_address)."""
+    state = MockState(config or MockConfig())
+    handler = type("MockHandler", (_Handler,), {"state": state})
+    server = _Server((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server, state
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI API for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    defaults = MockConfig()
+    for name, value in defaults.as_dict().items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(value) if value is not None else int, default=value)
+    args = parser.parse_args()
+    config = MockConfig(**{k: getattr(args, k) for k in defaults.as_dict()})
+    server, _ = start(args.port, config, args.host)
+    print(f"[mock_openai] serving {base_url(server)} with {config.as_dict()}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
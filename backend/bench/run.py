@@ -0,0 +1,526 @@
+# bench/run.py
+"""
+Load driver for offline benchmarks. Starts the mock OpenAI server in-process
+and the API under uvicorn in a subprocess (temp caches / history / job DB),
+drives it with concurrent requests and writes one JSON document per run.
+
+Scenarios:
+  generate   POST /api/generate (full pipeline against the mock upstream)
+  history    GET /api/history (summary and full views) with 1k/10k/100k
+             seeded rows, for the configured history backend
+  pdf        resume PDF -> text, in-process and through the parser pool
+  startup    `import api` time, time until /api/ready and the first vs second
+             /api/generate latency on a fresh server, with warm-up on and off
+
+Each scenario reports requests, errors, duration, requests/s, latency
+percentiles (ms) and peak RSS (MB, API process plus its children).
+
+Usage (from backend/):
+  python -m bench.run all --out bench/results/$(git rev-parse --short HEAD).json
+  python -m bench.run generate --requests 200 --concurrency 16 --latency-ms 300 --rate-limit-rate 0.02
+  python -m bench.run history --sizes 1000,10000 --history-backend sqlite
+  python -m bench.run startup --startup-runs 5 --latency-ms 50
+  python -m bench.run compare bench/results/old.json bench/results/new.json --threshold 0.10
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import statistics
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Tuple
+
+import httpx
+
+from bench import samples
+from bench.mock_openai import MockConfig, start as start_mock, base_url
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCHEMA_VERSION = 1
+
+
+# ---------- stats ----------
+
+def latency_summary(latencies_s: List[float]) -> Dict[str, Optional[float]]:
+    if not latencies_s:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ms = sorted(x * 1000 for x in latencies_s)
+
+    def pct(p: float) -> float:
+        k = (len(ms) - 1) * p
+        lo = int(k)
+        hi = min(lo + 1, len(ms) - 1)
+        return round(ms[lo] + (ms[hi] - ms[lo]) * (k - lo), 2)
+
+    return {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99),
+            "mean": round(statistics.fmean(ms), 2), "max": round(ms[-1], 2)}
+
+def scenario_result(latencies: List[float], statuses: Dict[str, int], duration_s: float, **extra: Any) -> Dict[str, Any]:
+    ok = len(latencies)
+    errors = sum(statuses.values()) - statuses.get("200", 0) - statuses.get("304", 0)
+    return {
+        "requests": sum(statuses.values()),
+        "errors": errors,
+        "statuses": statuses,
+        "duration_s": round(duration_s, 3),
+        "rps": round(ok / duration_s, 2) if duration_s > 0 else None,
+        "latency_ms": latency_summary(latencies),
+        **extra,
+    }
+
+
+# ---------- processes / memory ----------
+
+def _proc_rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def _proc_children(pid: int) -> List[int]:
+    out: List[int] = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                out += [int(c) for c in f.read().split()]
+    except OSError:
+        pass
+    return out
+
+class RssSampler:
+    """Peak RSS of a process tree, sampled in the background (Linux /proc; None elsewhere)."""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> None:
+        pids = [self.pid] + _proc_children(self.pid)
+        self.peak_kb = max(self.peak_kb, sum(_proc_rss_kb(p) for p in pids))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "RssSampler":
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def peak_mb(self) -> Optional[float]:
+        return round(self.peak_kb / 1024, 1) if self.peak_kb else None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ApiServer:
+    """uvicorn api:app in a subprocess with its own env (temp storage, mock upstream)."""
+
+    def __init__(self, env: Dict[str, str], startup_timeout: float = 60.0):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = dict(os.environ, **env)
+        self.startup_timeout = startup_timeout
+        self.proc: Optional[subprocess.Popen] = None
+        self.startup_s: Optional[float] = None
+        self.t0 = 0.0
+
+    def __enter__(self) -> "ApiServer":
+        t0 = self.t0 = time.perf_counter()
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=self.env,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"API server exited during startup (code {self.proc.returncode})")
+            try:
+                if httpx.get(self.url + "/api/health", timeout=1.0).status_code == 200:
+                    self.startup_s = round(time.perf_counter() - t0, 3)
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError("API server did not become healthy in time")
+
+    def wait_ready(self) -> Tuple[float, Dict[str, Any]]:
+        """Poll /api/ready; (seconds since process start, warm-up report)."""
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            r = httpx.get(self.url + "/api/ready", timeout=5.0)
+            if r.status_code == 200:
+                return round(time.perf_counter() - self.t0, 3), r.json()
+            time.sleep(0.05)
+        raise RuntimeError("API server did not become ready in time")
+
+    def __exit__(self, *exc) -> None:
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def _server_env(workdir: Path, mock_url: Optional[str], cache: bool, history_backend: str = "jsonl",
+                history_path: Optional[Path] = None, history_db: Optional[Path] = None) -> Dict[str, str]:
+    flag = "1" if cache else "0"
+    return {
+        "OPENAI_BASE_URL": mock_url or "http://127.0.0.1:9/v1",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "sk-mock",
+        "LLM_CACHE_ENABLED": flag,
+        "COMPANY_CACHE_ENABLED": flag,
+        "RESUME_CACHE_ENABLED": flag,
+        "LLM_CACHE_PATH": str(workdir / "llm_cache.sqlite3"),
+        "JOB_DB_PATH": str(workdir / "jobs.sqlite3"),
+        "HISTORY_BACKEND": history_backend,
+        "HISTORY_PATH": str(history_path or workdir / "runs_log.jsonl"),
+        "HISTORY_DB_PATH": str(history_db or workdir / "runs.sqlite3"),
+    }
+
+
+# ---------- load ----------
+
+async def drive(
+    send: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int,
+    warmup: int = 0,
+    timeout: float = 300.0,
+) -> Tuple[List[float], Dict[str, int], float]:
+    """Issue `total` requests with at most `concurrency` in flight; (ok latencies, status counts, duration)."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        for i in range(warmup):
+            await send(client, -1 - i)
+
+        counter = iter(range(total))
+
+        async def worker() -> None:
+            for i in counter:
+                t = time.perf_counter()
+                try:
+                    r = await send(client, i)
+                    status = str(r.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                statuses[status] = statuses.get(status, 0) + 1
+                if status in ("200", "304"):
+                    latencies.append(time.perf_counter() - t)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        return latencies, statuses, time.perf_counter() - t0
+
+
+# ---------- scenarios ----------
+
+def bench_generate(args: argparse.Namespace) -> Dict[str, Any]:
+    config = MockConfig(
+        latency_ms=args.latency_ms, latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, rpm=args.mock_rpm, tpm=args.mock_tpm, seed=args.seed,
+    )
+    mock, mock_state = start_mock(0, config)
+    pdfs = [samples.resume_pdf(samples.resume_text(i)) for i in range(4)]
+    jds = samples.generate_items(16)
+    try:
+        with tempfile.TemporaryDirectory(prefix="jobbuddy-bench-") as tmp:
+            with ApiServer(_server_env(Path(tmp), base_url(mock), args.cache)) as server:
+                async def send(client: httpx.AsyncClient, i: int) -> httpx.Response:
+                    jd = jds[i % len(jds)]
+                    return await client.post(
+                        server.url + "/api/generate",
+                        files={"resume_file": ("resume.pdf", pdfs[i % len(pdfs)], "application/pdf")},
+                        data={"job_description": jd["job_description"], "company_url": jd["company_url"],
+                              "about_me": "Prefers remote roles."},
+                    )
+
+                mock_state.reset()
+                with RssSampler(server.proc.pid) as rss:
+                    latencies, statuses, duration = asyncio.run(drive(send, args.requests, args.concurrency, args.warmup))
+                upstream = dict(mock_state.stats)
+                return scenario_result(
+                    latencies, statuses, duration,
+                    concurrency=args.concurrency, peak_rss_mb=rss.peak_mb, startup_s=server.startup_s,
+                    upstream=upstream, mock=config.as_dict(),
+                )
+    finally:
+        mock.shutdown()
+
+
+def _seed_history(path: Path, rows: int) -> None:
+    # Oldest first, like the append-only log the app writes.
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(rows):
+            f.write(json.dumps(samples.history_record(i), ensure_ascii=False) + "\n")
+
+def bench_history(args: argparse.Namespace) -> Dict[str, Any]:
+    from history_store import SqliteHistoryStore
+
+    out: Dict[str, Any] = {}
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="jobbuddy-bench-") as tmp:
+            tmp_path = Path(tmp)
+            jsonl = tmp_path / "runs_log.jsonl"
+            db = tmp_path / "runs.sqlite3"
+            t0 = time.perf_counter()
+            _seed_history(jsonl, rows)
+            if args.history_backend == "sqlite":
+                SqliteHistoryStore(db).import_jsonl(jsonl)
+            seed_s = round(time.perf_counter() - t0, 3)
+
+            env = _server_env(tmp_path, None, True, args.history_backend, jsonl, db)
+            with ApiServer(env) as server:
+                for view in ("summary", "full"):
+                    rnd = random.Random(args.seed)
+                    pages = max(1, rows // 50)
+
+                    async def send(client: httpx.AsyncClient, i: int) -> httpx.Response:
+                        # Mostly the first pages (what the UI loads), sometimes deep ones.
+                        page = 0 if rnd.random() < 0.6 else rnd.randrange(pages)
+                        return await client.get(server.url + "/api/history",
+                                                params={"limit": 50, "offset": page * 50, "view": view})
+
+                    with RssSampler(server.proc.pid) as rss:
+                        latencies, statuses, duration = asyncio.run(
+                            drive(send, args.requests, args.concurrency, args.warmup)
+                        )
+                    out[f"history_{args.history_backend}_{rows}_{view}"] = scenario_result(
+                        latencies, statuses, duration,
+                        rows=rows, concurrency=args.concurrency, seed_s=seed_s,
+                        startup_s=server.startup_s, peak_rss_mb=rss.peak_mb,
+                    )
+    return out
+
+
+def bench_pdf(args: argparse.Namespace) -> Dict[str, Any]:
+    from resume_parser import ResumeParser, extract_pdf_text, available_backend
+
+    backend = available_backend()
+    out: Dict[str, Any] = {}
+    for pages in (1, 3, 10):
+        pdf = samples.resume_pdf(samples.resume_text(pages), pages=pages)
+        latencies = []
+        t0 = time.perf_counter()
+        for _ in range(args.pdf_iterations):
+            t = time.perf_counter()
+            extract_pdf_text(pdf, backend, 20, 5.0)
+            latencies.append(time.perf_counter() - t)
+        duration = time.perf_counter() - t0
+        out[f"pdf_inprocess_{pages}p"] = scenario_result(
+            latencies, {"200": len(latencies)}, duration,
+            backend=backend, pages=pages, pdf_bytes=len(pdf),
+            peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        )
+
+    # Through the process pool (as the API does), uncached, concurrent callers.
+    pdfs = [samples.resume_pdf(samples.resume_text(i), pages=2) for i in range(8)]
+    parser = ResumeParser(backend=backend, workers=args.pdf_workers, cache=None)
+    try:
+        parser.extract_text(pdfs[0])  # start the pool
+        latencies = []
+        lock = threading.Lock()
+
+        def one(i: int) -> None:
+            t = time.perf_counter()
+            parser.extract_text(pdfs[i % len(pdfs)])
+            with lock:
+                latencies.append(time.perf_counter() - t)
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(one, range(args.pdf_iterations)))
+        duration = time.perf_counter() - t0
+    finally:
+        parser.shutdown()
+    out["pdf_pool_2p"] = scenario_result(
+        latencies, {"200": len(latencies)}, duration,
+        backend=backend, workers=args.pdf_workers, concurrency=args.concurrency,
+        children_peak_rss_mb=round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    )
+    return out
+
+
+_IMPORT_TIMER = "import time; t = time.perf_counter(); import api; print(time.perf_counter() - t)"
+
+def bench_startup(args: argparse.Namespace) -> Dict[str, Any]:
+    config = MockConfig(latency_ms=args.latency_ms, latency_sigma=0.0, seed=args.seed)
+    mock, _ = start_mock(0, config)
+    jds = samples.generate_items(2)
+    out: Dict[str, Any] = {}
+    try:
+        for warm in (False, True):
+            runs: Dict[str, List[float]] = {"import_s": [], "startup_s": [], "ready_s": [], "first_request_ms": [], "second_request_ms": []}
+            report: Dict[str, Any] = {}
+            for run in range(args.startup_runs):
+                pdfs = [samples.resume_pdf(samples.resume_text(100 * run + i)) for i in range(2)]
+                with tempfile.TemporaryDirectory(prefix="jobbuddy-bench-") as tmp:
+                    env = dict(_server_env(Path(tmp), base_url(mock), cache=False), WARMUP_ENABLED="1" if warm else "0")
+                    imported = subprocess.run([sys.executable, "-c", _IMPORT_TIMER], cwd=BACKEND_DIR,
+                                              env=dict(os.environ, **env), capture_output=True, text=True, check=True)
+                    runs["import_s"].append(float(imported.stdout.strip().splitlines()[-1]))
+                    with ApiServer(env) as server:
+                        ready_s, report = server.wait_ready()
+                        runs["startup_s"].append(server.startup_s)
+                        runs["ready_s"].append(ready_s)
+                        with httpx.Client(timeout=300.0) as client:
+                            for i, key in enumerate(("first_request_ms", "second_request_ms")):
+                                t = time.perf_counter()
+                                r = client.post(
+                                    server.url + "/api/generate",
+                                    files={"resume_file": ("resume.pdf", pdfs[i], "application/pdf")},
+                                    data={"job_description": jds[i]["job_description"], "company_url": jds[i]["company_url"]},
+                                )
+                                r.raise_for_status()
+                                runs[key].append(round((time.perf_counter() - t) * 1000, 1))
+            result: Dict[str, Any] = {k: round(statistics.median(v), 3) for k, v in runs.items()}
+            result.update(runs=args.startup_runs, warmup=report, mock=config.as_dict())
+            out["startup_warm" if warm else "startup_cold"] = result
+    finally:
+        mock.shutdown()
+    return out
+
+
+# ---------- output ----------
+
+def _git(*cmd: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *cmd], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_meta(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "schema": SCHEMA_VERSION,
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--", ".")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k != "func"},
+    }
+
+# metric -> True when higher is better
+COMPARED_METRICS = {"rps": True, "latency_ms.p50": False, "latency_ms.p95": False, "latency_ms.p99": False,
+                    "peak_rss_mb": False, "errors": False,
+                    "import_s": False, "ready_s": False, "first_request_ms": False}
+
+def _get(d: Dict[str, Any], dotted: str) -> Optional[float]:
+    for part in dotted.split("."):
+        if not isinstance(d, dict):
+            return None
+        d = d.get(part)
+    return d if isinstance(d, (int, float)) else None
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Per scenario/metric change between two result files; `regression` beyond threshold."""
+    rows = []
+    for name in sorted(set(old["results"]) & set(new["results"])):
+        for metric, higher_better in COMPARED_METRICS.items():
+            a, b = _get(old["results"][name], metric), _get(new["results"][name], metric)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a if a else (0.0 if b == a else float("inf"))
+            worse = change < -threshold if higher_better else change > threshold
+            rows.append({"scenario": name, "metric": metric, "old": a, "new": b,
+                         "change": round(change, 4), "regression": bool(worse)})
+    return rows
+
+
+def _run(args: argparse.Namespace) -> None:
+    scenarios = {"generate": bench_generate, "history": bench_history, "pdf": bench_pdf, "startup": bench_startup}
+    names = list(scenarios) if args.cmd == "all" else [args.cmd]
+    results: Dict[str, Any] = {}
+    for name in names:
+        print(f"[bench] {name} ...", flush=True)
+        t = time.perf_counter()
+        res = scenarios[name](args)
+        results.update(res if name != "generate" else {"generate": res})
+        print(f"[bench] {name} done in {time.perf_counter() - t:.1f}s", flush=True)
+
+    doc = {"meta": run_meta(args), "results": results}
+    text = json.dumps(doc, indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+        print(f"[bench] wrote {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Job Buddy API.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--out", help="write results JSON here (default: stdout)")
+    common.add_argument("--requests", type=int, default=100)
+    common.add_argument("--concurrency", type=int, default=8)
+    common.add_argument("--warmup", type=int, default=2)
+    common.add_argument("--seed", type=int, default=1)
+    # generate
+    common.add_argument("--cache", action="store_true", help="keep LLM/company/resume caches on (default off)")
+    common.add_argument("--latency-ms", type=float, default=400.0)
+    common.add_argument("--latency-sigma", type=float, default=0.35)
+    common.add_argument("--error-rate", type=float, default=0.0)
+    common.add_argument("--rate-limit-rate", type=float, default=0.0)
+    common.add_argument("--mock-rpm", type=int, default=5000)
+    common.add_argument("--mock-tpm", type=int, default=2_000_000)
+    # history
+    common.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1000, 10000, 100000])
+    common.add_argument("--history-backend", choices=("jsonl", "sqlite"), default="sqlite")
+    # pdf
+    common.add_argument("--pdf-iterations", type=int, default=50)
+    common.add_argument("--pdf-workers", type=int, default=2)
+    # startup
+    common.add_argument("--startup-runs", type=int, default=3, help="fresh servers per warm-up setting (medians reported)")
+
+    for name in ("generate", "history", "pdf", "startup", "all"):
+        sub.add_parser(name, parents=[common])
+
+    cmp_ = sub.add_parser("compare", help="diff two result files; exits 1 on regressions")
+    cmp_.add_argument("old")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+
+    args = parser.parse_args()
+    if args.cmd == "compare":
+        rows = compare(json.loads(Path(args.old).read_text()), json.loads(Path(args.new).read_text()), args.threshold)
+        for r in rows:
+            flag = "REGRESSION" if r["regression"] else ""
+            print(f"{r['scenario']:<36} {r['metric']:<15} {r['old']:>12} -> {r['new']:>12}  {r['change']:+.1%} {flag}")
+        sys.exit(1 if any(r["regression"] for r in rows) else 0)
+    _run(args)
@@ -0,0 +1,147 @@
+# bench/samples.py
+"""
+Synthetic benchmark inputs: resumes (text and rendered PDFs), job
+descriptions with the usual boilerplate, and history rows shaped like real
+pipeline snapshots. Everything is generated deterministically, so runs on
+different commits see identical inputs.
+"""
+
+import random
+import datetime
+from typing import Dict, Any, List
+
+from fpdf import FPDF
+
+COMPANIES = [
+    ("Acme Payments", "https://www.acmepay.example"),
+    ("Globex Cloud", "https://globex.example/careers"),
+    ("Initech Health", "https://initech-health.example"),
+    ("Umbrella Robotics", "https://umbrella-robotics.example/jobs/123"),
+    ("Hooli Search", "https://hooli.example"),
+]
+
+_SKILLS = ["Python", "Go", "TypeScript", "PostgreSQL", "Kubernetes", "AWS", "Kafka", "React",
+           "Terraform", "FastAPI", "Redis", "gRPC", "Spark", "Airflow", "Docker", "GCP"]
+_VERBS = ["Led", "Built", "Designed", "Migrated", "Scaled", "Automated", "Owned", "Shipped", "Reduced", "Improved"]
+_THINGS = ["the payments API", "a real-time analytics pipeline", "the CI/CD platform", "an internal feature-flag service",
+           "the search indexing cluster", "customer onboarding flows", "on-call tooling", "the data warehouse"]
+_RESULTS = ["cutting p95 latency by 40%", "saving $120k/yr in cloud spend", "serving 2M requests/day",
+            "raising availability to 99.95%", "halving deploy time", "enabling 3 new product lines"]
+
+_JD_BOILERPLATE = """ABOUT US:
+We are a fast-growing company on a mission to make work better for everyone. Our culture values ownership,
+curiosity and kindness. We have offices in three countries and a remote-first team.
+
+BENEFITS:
+- Competitive salary and equity
+- Health, dental and vision insurance
+- Flexible PTO and paid parental leave
+- Learning budget and home office stipend
+
+EEO Statement:
+
+We are an equal opportunity employer and consider all applicants without regard to race, religion, sex,
+national origin, age, disability status or protected veteran status. We provide reasonable accommodation
+to applicants with disabilities. Recruitment agencies: we do not accept unsolicited resumes.
+"""
+
+
+def resume_text(seed: int, jobs: int = 4) -> str:
+    rnd = random.Random(f"resume-{seed}")
+    skills = rnd.sample(_SKILLS, 8)
+    lines = [
+        f"Candidate {seed}",
+        f"Senior Software Engineer | candidate{seed}@example.com | +1 555 01{seed % 100:02d}",
+        "",
+        "SUMMARY",
+        f"Backend engineer with {4 + seed % 8} years building reliable distributed systems in {skills[0]} and {skills[1]}.",
+        "",
+        "EXPERIENCE",
+    ]
+    for j in range(jobs):
+        start = 2024 - 2 * (j + 1)
+        lines.append(f"{rnd.choice(COMPANIES)[0]} - Software Engineer ({start}-{start + 2})")
+        for _ in range(4):
+            lines.append(f"- {rnd.choice(_VERBS)} {rnd.choice(_THINGS)}, {rnd.choice(_RESULTS)}.")
+        lines.append("")
+    lines += [
+        "SKILLS",
+        ", ".join(skills),
+        "",
+        "EDUCATION",
+        "B.Sc. Computer Science, State University",
+    ]
+    return "\n".join(lines)
+
+
+def resume_pdf(text: str, pages: int = 1) -> bytes:
+    """Render `text` (repeated to fill `pages` pages) into a PDF, as users upload them."""
+    pdf = FPDF(format="Letter")
+    pdf.set_auto_page_break(auto=False)
+    pdf.set_font("Helvetica", size=10)
+    lines = text.splitlines()
+    per_page = 60
+    for p in range(pages):
+        pdf.add_page()
+        y = 15
+        for i in range(per_page):
+            line = lines[(p * per_page + i) % len(lines)]
+            pdf.text(15, y, line.encode("latin-1", "replace").decode("latin-1"))
+            y += 4.2
+    return bytes(pdf.output())
+
+
+def job_description(seed: int) -> Dict[str, str]:
+    rnd = random.Random(f"jd-{seed}")
+    name, url = COMPANIES[seed % len(COMPANIES)]
+    must = rnd.sample(_SKILLS, 5)
+    nice = rnd.sample([s for s in _SKILLS if s not in must], 3)
+    text = f"""Senior Backend Engineer - {name}
+
+{name} is hiring a Senior Backend Engineer to own core services.
+
+RESPONSIBILITIES:
+- Design, build and operate services in {must[0]} and {must[1]}
+- Own reliability and performance of customer-facing APIs
+- Partner with product and data teams on new features
+- Mentor engineers and improve engineering practices
+
+REQUIREMENTS:
+- 5+ years of backend experience
+- Strong {must[2]} and {must[3]} skills
+- Production experience with {must[4]}
+- Experience with observability, incident response and on-call
+
+NICE TO HAVE:
+- {nice[0]}, {nice[1]} or {nice[2]}
+
+{_JD_BOILERPLATE}"""
+    return {"job_description": text, "company_name": name, "company_url": url}
+
+
+def history_record(i: int) -> Dict[str, Any]:
+    """A pipeline-snapshot-shaped history row with realistic field sizes."""
+    jd = job_description(i)
+    ts = datetime.datetime(2025, 1, 1) + datetime.timedelta(minutes=17 * i)
+    resume = resume_text(i % 50)
+    return {
+        "timestamp": ts.isoformat(timespec="seconds"),
+        "inputs": {
+            "job_description": jd["job_description"],
+            "company_name": jd["company_name"],
+            "company_url": jd["company_url"],
+            "about_me_or_prefs": "Prefers remote roles; interested in platform and infrastructure work.",
+        },
+        "resume_text_excerpt": resume[:4000],
+        "requirements_text": "\n".join(f"- requirement {k}" for k in range(12)),
+        "mapping_text": "\n".join(f"- requirement {k}: matched by experience line {k}" for k in range(12)),
+        "company_profile_text": f"{jd['company_name']} builds software.\n" * 20,
+        "tailored_resume_text": resume + "\n" + "Tailored bullet. " * 40,
+        "cover_letter_text": ("Dear hiring team,\n" + "I am excited to apply. " * 80),
+        "evidence_links": [jd["company_url"]],
+        "timings": {"total_s": 12.5},
+    }
+
+
+def generate_items(n: int) -> List[Dict[str, str]]:
+    return [job_description(i) for i in range(n)]
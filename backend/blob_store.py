@@ -0,0 +1,188 @@
+# blob_store.py
+"""
+Content-addressed, compressed storage for the large text fields of run
+snapshots.
+
+The same resume, company profile and job description show up in hundreds of
+runs. Before a record is written to history its large text fields (see
+BLOB_FIELDS, at least `min_chars` long) are stored once here, keyed by
+SHA-256 and zlib-compressed, and replaced in the record by a small reference:
+
+    {"$blob": "<sha256 hex>", "chars": <length>, "head": "<first HEAD_CHARS chars>"}
+
+`chars` and `head` let listings show lengths and previews without touching
+the blob store (older references have no head).
+
+Readers resolve references when a field is actually needed (resolve() for
+whole records, value() for a single field); decompressed texts sit in a small
+LRU, so shared blobs are inflated once per process. Blobs are never deleted:
+they are shared between runs and the log is append-only.
+
+Blobs live in a `blobs` table of a SQLite file: the history database itself
+for the SQLite backend, a `<log>.blobs.sqlite3` sidecar for JSONL logs.
+"""
+
+import zlib
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+# (container, field): container None = top level of the snapshot.
+BLOB_FIELDS: Tuple[Tuple[Optional[str], str], ...] = (
+    ("inputs", "job_description"),
+    (None, "resume_text"),
+    (None, "resume_text_excerpt"),
+    (None, "requirements_text"),
+    (None, "mapping_text"),
+    (None, "company_profile_text"),
+    (None, "tailored_resume_text"),
+    (None, "cover_letter_text"),
+)
+
+REF_KEY = "$blob"
+COMPRESS_LEVEL = 6
+HEAD_CHARS = 280  # = the history API's default preview length
+
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and REF_KEY in value
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    def __init__(self, path: Union[str, Path], min_chars: int = 256, memory_entries: int = 256):
+        self.path = Path(path)
+        self.min_chars = min_chars
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " hash TEXT PRIMARY KEY, chars INTEGER NOT NULL,"
+            " raw_bytes INTEGER NOT NULL, data BLOB NOT NULL)"
+        )
+
+    # ---------- blobs ----------
+
+    def _remember(self, digest: str, text: str) -> None:
+        # Caller holds the lock.
+        self._memory[digest] = text
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, text: str) -> str:
+        """Store `text` (once per distinct content); returns its hash."""
+        digest = text_hash(text)
+        with self._lock:
+            if digest in self._memory:
+                return digest
+            raw = text.encode("utf-8")
+            self._db.execute(
+                "INSERT OR IGNORE INTO blobs (hash, chars, raw_bytes, data) VALUES (?, ?, ?, ?)",
+                (digest, len(text), len(raw), zlib.compress(raw, COMPRESS_LEVEL)),
+            )
+            self._remember(digest, text)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            text = self._memory.get(digest)
+            if text is not None:
+                self._memory.move_to_end(digest)
+                return text
+            row = self._db.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            text = zlib.decompress(row[0]).decode("utf-8")
+            self._remember(digest, text)
+            return text
+
+    # ---------- records ----------
+
+    def value(self, value: Any) -> Any:
+        """A field value with its blob reference (if any) resolved."""
+        if not is_ref(value):
+            return value
+        text = self.get(value[REF_KEY])
+        if text is None:
+            print(f"[blob_store] missing blob {value[REF_KEY]} in {self.path}")
+            return ""
+        return text
+
+    def pack(self, record: Dict[str, Any], store: bool = True) -> Dict[str, Any]:
+        """
+        Copy of `record` with large text fields replaced by blob references
+        (`store=False` only computes the references, for texts already put).
+        """
+        out = dict(record)
+        for container, field in BLOB_FIELDS:
+            holder = out if container is None else out.get(container)
+            if not isinstance(holder, dict):
+                continue
+            text = holder.get(field)
+            if not isinstance(text, str) or len(text) < self.min_chars:
+                continue
+            if container is not None and holder is record.get(container):
+                holder = out[container] = dict(holder)  # don't mutate the caller's nested dict
+            holder[field] = {REF_KEY: self.put(text) if store else text_hash(text), "chars": len(text), "head": text[:HEAD_CHARS]}
+        return out
+
+    def resolve(self, record: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Resolve references in place (only `fields`, by name, when given); returns the record."""
+        for container, field in BLOB_FIELDS:
+            if fields is not None and field not in fields:
+                continue
+            holder = record if container is None else record.get(container)
+            if isinstance(holder, dict) and is_ref(holder.get(field)):
+                holder[field] = self.value(holder[field])
+        return record
+
+    def sizes(self, digests: List[str]) -> Dict[str, Tuple[int, int]]:
+        """hash -> (raw bytes, stored bytes) for the given blobs."""
+        out: Dict[str, Tuple[int, int]] = {}
+        with self._lock:
+            for i in range(0, len(digests), 500):
+                chunk = digests[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT hash, raw_bytes, LENGTH(data) FROM blobs WHERE hash IN ({','.join('?' * len(chunk))})", chunk,
+                ).fetchall()
+                out.update((h, (raw, stored)) for h, raw, stored in rows)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n, raw, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+            ).fetchone()
+        return {"blobs": n, "raw_bytes": raw, "stored_bytes": stored}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_sidecars: Dict[str, BlobStore] = {}
+_sidecars_lock = threading.Lock()
+
+
+def sidecar_path(log_path: Union[str, Path]) -> Path:
+    return Path(str(log_path) + ".blobs.sqlite3")
+
+
+def blob_store_for(log_path: Union[str, Path]) -> BlobStore:
+    """The (process-wide) blob sidecar of a JSONL log."""
+    key = str(Path(log_path).resolve())
+    with _sidecars_lock:
+        store = _sidecars.get(key)
+        if store is None:
+            store = _sidecars[key] = BlobStore(sidecar_path(log_path))
+        return store
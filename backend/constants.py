@@ -1,6 +1,105 @@
 import os
+import json
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY","")
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# HTTP connection pooling (per upstream host)
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.environ.get("HTTP_READ_TIMEOUT_SECONDS", "120"))
+
+# Tail-latency control: whole-run deadline (0 disables) and hedged LLM calls,
+# a duplicate request fired once a call runs past the observed p95 latency.
+PIPELINE_DEADLINE_SECONDS = float(os.environ.get("PIPELINE_DEADLINE_SECONDS", "300"))
+HEDGE_ENABLED = os.environ.get("HEDGE_ENABLED", "0") == "1"
+HEDGE_CALL_TYPES = [c for c in os.environ.get("HEDGE_CALL_TYPES", "").split(",") if c]  # empty = all
+HEDGE_QUANTILE = float(os.environ.get("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY_SECONDS = float(os.environ.get("HEDGE_MIN_DELAY_SECONDS", "1.0"))
+
+# Startup warm-up (api.py): load encodings, start the PDF pool, preload caches
+# and, with WARMUP_CONNECT, open pooled upstream connections; /api/ready
+# reports when it is done.
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "1") == "1"
+WARMUP_CONNECT = os.environ.get("WARMUP_CONNECT", "1") == "1"
+WARMUP_CACHE_ENTRIES = int(os.environ.get("WARMUP_CACHE_ENTRIES", "256"))
+
+# LLM response cache (memory LRU + SQLite)
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", str(Path(__file__).parent / "llm_cache.sqlite3"))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_MEMORY_ENTRIES", "512"))
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_DISK_ENTRIES", "20000"))
+
+# Company research cache (keyed by domain or lowercased company name)
+COMPANY_CACHE_ENABLED = os.environ.get("COMPANY_CACHE_ENABLED", "1") == "1"
+COMPANY_CACHE_TTL_SECONDS = float(os.environ.get("COMPANY_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# History storage backend: "jsonl" (runs_log.jsonl) or "sqlite" (runs.sqlite3)
+HISTORY_BACKEND = os.environ.get("HISTORY_BACKEND", "jsonl")
+HISTORY_PATH = Path(os.environ.get("HISTORY_PATH", str(Path(__file__).parent / "runs_log.jsonl")))
+HISTORY_DB_PATH = Path(os.environ.get("HISTORY_DB_PATH", str(Path(__file__).parent / "runs.sqlite3")))
+# Full-text search index over history (SQLite FTS5), behind /api/history/search
+HISTORY_SEARCH_ENABLED = os.environ.get("HISTORY_SEARCH_ENABLED", "1") == "1"
+# Large snapshot text fields stored once, compressed, in a content-addressed
+# blob store and referenced from the run records (see blob_store.py)
+HISTORY_BLOBS_ENABLED = os.environ.get("HISTORY_BLOBS_ENABLED", "1") == "1"
+# fsync each group commit of JSONL history writes (see history_writer.py)
+HISTORY_FSYNC = os.environ.get("HISTORY_FSYNC", "1") == "1"
+
+# Background generation jobs (SQLite-backed queue + bounded worker pool)
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", str(Path(__file__).parent / "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_WORKER_MODE = os.environ.get("JOB_WORKER_MODE", "thread")  # "thread" or "process"
+JOB_MAX_QUEUE_DEPTH = int(os.environ.get("JOB_MAX_QUEUE_DEPTH", "100"))
+
+# Batch mode (one resume, many postings)
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "50"))
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "4"))
+
+# Client-side rate limiting per model (corrected from x-ratelimit-* headers).
+# RATE_LIMITS overrides per model, e.g. {"gpt-4o": {"rpm": 500, "tpm": 30000}}
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_RPM = float(os.environ.get("RATE_LIMIT_RPM", "500"))
+RATE_LIMIT_TPM = float(os.environ.get("RATE_LIMIT_TPM", "200000"))
+RATE_LIMITS = json.loads(os.environ.get("RATE_LIMITS", "{}"))
+
+# Model routing: per call_type tier lists (first = preferred), fallback on
+# saturation / slowness / errors. MODEL_TIERS='{"tailor_resume": ["gpt-4o", "gpt-4.1-mini"]}'
+ROUTING_ENABLED = os.environ.get("ROUTING_ENABLED", "1") == "1"
+MODEL_TIERS = json.loads(os.environ.get("MODEL_TIERS", "{}"))
+ROUTING_MAX_QUEUE_WAIT_SECONDS = float(os.environ.get("ROUTING_MAX_QUEUE_WAIT_SECONDS", "10"))
+ROUTING_MAX_LATENCY_SECONDS = float(os.environ.get("ROUTING_MAX_LATENCY_SECONDS", "60"))
+ROUTING_FAILURE_THRESHOLD = int(os.environ.get("ROUTING_FAILURE_THRESHOLD", "3"))
+ROUTING_COOLDOWN_SECONDS = float(os.environ.get("ROUTING_COOLDOWN_SECONDS", "60"))
+
+# Resume PDF parsing (process pool + parsed-text cache keyed by PDF hash)
+PDF_BACKEND = os.environ.get("PDF_BACKEND", "auto")  # "auto", "pypdf2" or "pymupdf"
+PDF_PARSE_WORKERS = int(os.environ.get("PDF_PARSE_WORKERS", "2"))  # 0 parses in-process
+PDF_MAX_BYTES = int(os.environ.get("PDF_MAX_BYTES", str(10 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "20"))
+PDF_PAGE_TIMEOUT_SECONDS = float(os.environ.get("PDF_PAGE_TIMEOUT_SECONDS", "5"))
+RESUME_CACHE_ENABLED = os.environ.get("RESUME_CACHE_ENABLED", "1") == "1"
+RESUME_CACHE_TTL_SECONDS = float(os.environ.get("RESUME_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Per-step token budgets for prompt inputs (see token_budget.DEFAULT_BUDGETS),
+# e.g. TOKEN_BUDGETS='{"match_requirements": {"resume_text": 2500}}'
+TOKEN_BUDGET_ENABLED = os.environ.get("TOKEN_BUDGET_ENABLED", "1") == "1"
+TOKEN_BUDGETS = json.loads(os.environ.get("TOKEN_BUDGETS", "{}"))
+
+# Local pre-matching of requirements against the resume (see prematcher).
+# Scores are cosine similarities of hashed n-gram vectors. PREMATCH_SKIP_LLM
+# (opt-in: the mapping is then a template, not model output) answers the
+# match step locally when every requirement scores >= PREMATCH_COVERED_SCORE.
+PREMATCH_ENABLED = os.environ.get("PREMATCH_ENABLED", "1") == "1"
+PREMATCH_SKIP_LLM = os.environ.get("PREMATCH_SKIP_LLM", "0") == "1"
+PREMATCH_COVERED_SCORE = float(os.environ.get("PREMATCH_COVERED_SCORE", "0.45"))
+PREMATCH_MISSING_SCORE = float(os.environ.get("PREMATCH_MISSING_SCORE", "0.12"))
+PREMATCH_EVIDENCE_LINES = int(os.environ.get("PREMATCH_EVIDENCE_LINES", "3"))
@@ -0,0 +1,246 @@
+# history_search.py
+"""
+Full-text search over run history (SQLite FTS5), kept up to date
+incrementally by the history stores.
+
+Every run is one FTS row (rowid = seq, the oldest-first position) with four
+columns: company, job description, generated documents and tracking notes,
+plus a `run_facets` row holding timestamp / status / applied for filtering.
+
+  - HistoryStore.append      -> add(seq, record)
+  - HistoryStore.update_tracking -> update_tracking(seq, tracking)
+  - anything the store did not announce (runs appended by another process,
+    an index file created after the log) is picked up by sync() before a
+    search. A watermark records the position up to which every run is
+    indexed, so sync() only looks at runs past it: a no-op sync is two
+    primary-key lookups, whatever the size of the history.
+
+Queries are ranked with bm25 (company and notes weigh more than document
+bodies); without a query, filtered runs come back newest first.
+"""
+
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Callable, Iterable, Tuple
+
+# bm25 column weights: company, job_description, documents, notes
+_WEIGHTS = (4.0, 2.0, 1.0, 2.0)
+_SYNC_BATCH = 500
+
+# Generated documents of a run (top level in snapshots; older logs nest some).
+_DOCUMENT_FIELDS = (
+    "requirements_text",
+    "mapping_text",
+    "company_profile_text",
+    "tailored_resume_text",
+    "cover_letter_text",
+)
+
+
+def _record_company(record: Dict[str, Any]) -> str:
+    inputs = record.get("inputs", {}) or {}
+    return " ".join(v for v in (inputs.get("company_name"), inputs.get("company_url")) if v)
+
+
+def _record_documents(record: Dict[str, Any]) -> str:
+    outputs = record.get("outputs", {}) or {}
+    parts = [outputs.get(f) or record.get(f) or "" for f in _DOCUMENT_FIELDS]
+    parts.append(record.get("mapping") or "")
+    return "\n\n".join(p for p in parts if isinstance(p, str) and p)
+
+
+def _tracking_values(tracking: Optional[Dict[str, Any]]) -> Tuple[str, str, int]:
+    tr = tracking or {}
+    notes = " ".join(str(tr.get(k) or "") for k in ("notes", "platform", "status")).strip()
+    return notes, str(tr.get("status") or "Draft"), 1 if tr.get("applied") else 0
+
+
+def fts_query(text: str) -> str:
+    """User text -> FTS5 MATCH expression: every term must match; "quoted phrases" and prefix* kept."""
+    terms = []
+    for raw in re.findall(r'"[^"]*"|\S+', text or ""):
+        if raw.startswith('"'):
+            words = re.findall(r"\w+", raw)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+            continue
+        prefix = raw.endswith("*")
+        for word in re.findall(r"\w+", raw):
+            terms.append(f'"{word}"')
+        if prefix and terms:
+            terms[-1] += "*"
+    return " ".join(terms)
+
+
+class HistorySearchIndex:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS run_fts USING fts5(
+                company, job_description, documents, notes,
+                tokenize = 'porter unicode61'
+            );
+            CREATE TABLE IF NOT EXISTS run_facets (
+                seq INTEGER PRIMARY KEY,
+                timestamp TEXT,
+                status TEXT,
+                applied INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_run_facets_timestamp ON run_facets(timestamp);
+            CREATE INDEX IF NOT EXISTS idx_run_facets_status ON run_facets(status COLLATE NOCASE);
+            CREATE TABLE IF NOT EXISTS run_fts_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            """
+        )
+
+    # ---------- writes ----------
+
+    def _rows(self, items: Iterable[Tuple[int, Dict[str, Any]]]) -> Tuple[list, list]:
+        fts, facets = [], []
+        for seq, record in items:
+            notes, status, applied = _tracking_values(record.get("tracking"))
+            inputs = record.get("inputs", {}) or {}
+            fts.append((seq, _record_company(record), inputs.get("job_description") or "", _record_documents(record), notes))
+            facets.append((seq, record.get("timestamp"), status, applied))
+        return fts, facets
+
+    def add_many(self, items: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+        fts, facets = self._rows(items)
+        if not fts:
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("DELETE FROM run_fts WHERE rowid = ?", [(r[0],) for r in fts])
+                self._db.executemany(
+                    "INSERT INTO run_fts (rowid, company, job_description, documents, notes) VALUES (?, ?, ?, ?, ?)", fts)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO run_facets (seq, timestamp, status, applied) VALUES (?, ?, ?, ?)", facets)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def add(self, seq: int, record: Dict[str, Any]) -> None:
+        self.add_many([(seq, record)])
+
+    def update_tracking(self, seq: int, tracking: Dict[str, Any]) -> None:
+        notes, status, applied = _tracking_values(tracking)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("UPDATE run_fts SET notes = ? WHERE rowid = ?", (notes, seq))
+                self._db.execute("UPDATE run_facets SET status = ?, applied = ? WHERE seq = ?", (status, applied, seq))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM run_fts")
+            self._db.execute("DELETE FROM run_facets")
+            self._db.execute("DELETE FROM run_fts_meta WHERE key = 'synced'")
+
+    def sync(self, count: int, read: Callable[[List[int]], List[Dict[str, Any]]]) -> int:
+        """
+        Index whatever the store holds but the index does not (positions
+        [0, count)); `read(seqs)` returns those records. Returns rows added.
+        Only positions past the watermark are checked: runs added since the
+        last sync, including ones other processes appended in between.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM run_fts_meta WHERE key = 'synced'").fetchone()
+            synced = row[0] if row else 0
+        if synced == count:
+            return 0
+        if synced > count:  # the log was replaced by a shorter one
+            self.clear()
+            synced = 0
+        # Rows at or past `count` are runs appended (and indexed) after the
+        # caller read it; they are left alone, not taken for a shrunken log.
+        with self._lock:
+            have = {s for (s,) in self._db.execute("SELECT seq FROM run_facets WHERE seq >= ?", (synced,))}
+        missing = [s for s in range(synced, count) if s not in have]
+        for i in range(0, len(missing), _SYNC_BATCH):
+            seqs = missing[i:i + _SYNC_BATCH]
+            self.add_many(zip(seqs, read(seqs)))
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO run_fts_meta (key, value) VALUES ('synced', ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+                (count,),
+            )
+        if missing:
+            print(f"[history_search] indexed {len(missing)} runs")
+        return len(missing)
+
+    # ---------- queries ----------
+
+    def search(
+        self,
+        query: str = "",
+        status: Optional[str] = None,
+        applied: Optional[bool] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """(total matches, [{"seq", "score", "snippet"}]) ranked by relevance, or newest first without a query."""
+        where, params = [], []
+        if status:
+            where.append("f.status = ? COLLATE NOCASE")
+            params.append(status)
+        if applied is not None:
+            where.append("f.applied = ?")
+            params.append(1 if applied else 0)
+        if since:
+            where.append("f.timestamp >= ?")
+            params.append(since)
+        if until:
+            where.append("f.timestamp <= ?")
+            params.append(until + "T23:59:59" if len(until) == 10 else until)
+
+        match = fts_query(query)
+        with self._lock:
+            if match:
+                cond = " AND ".join(["run_fts MATCH ?"] + where)
+                args = [match] + params
+                total = self._db.execute(
+                    f"SELECT COUNT(*) FROM run_fts JOIN run_facets f ON f.seq = run_fts.rowid WHERE {cond}", args,
+                ).fetchone()[0]
+                rows = self._db.execute(
+                    f"""
+                    SELECT run_fts.rowid, bm25(run_fts, {', '.join(map(str, _WEIGHTS))}) AS rank,
+                           snippet(run_fts, -1, '[', ']', '…', 16)
+                    FROM run_fts JOIN run_facets f ON f.seq = run_fts.rowid
+                    WHERE {cond}
+                    ORDER BY rank LIMIT ? OFFSET ?
+                    """,
+                    args + [limit, offset],
+                ).fetchall()
+            else:
+                cond = " AND ".join(where) or "1"
+                total = self._db.execute(f"SELECT COUNT(*) FROM run_facets f WHERE {cond}", params).fetchone()[0]
+                rows = [
+                    (seq, None, None)
+                    for (seq,) in self._db.execute(
+                        f"SELECT seq FROM run_facets f WHERE {cond} ORDER BY seq DESC LIMIT ? OFFSET ?",
+                        params + [limit, offset],
+                    )
+                ]
+        hits = [
+            {"seq": seq, "score": round(-rank, 6) if rank is not None else None, "snippet": snippet}
+            for seq, rank, snippet in rows
+        ]
+        return total, hits
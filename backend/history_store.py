@@ -0,0 +1,751 @@
+# history_store.py
+"""
+Pluggable storage for pipeline run snapshots (the History page).
+
+Backends:
+  - JsonlHistoryStore: the original append-only runs_log.jsonl, read through
+    a byte-offset sidecar index (see jsonl_index.py)
+  - SqliteHistoryStore: indexed table with O(page) pagination and
+    single-row tracking updates
+
+Both keep a full-text search index (see history_search.py) up to date on
+append and tracking edits: a `<log>.search.sqlite3` sidecar for JSONL, extra
+tables in the same database for SQLite.
+
+JSONL writes are safe across processes (uvicorn --workers, process job
+workers): they take an flock on `<log>.lock` and go through a group
+committer that batches concurrent appends and tracking edits into one write
+and one fsync per file (see history_writer.py). SQLite gets the same from
+its own transactions.
+
+Large text fields are written as references into a content-addressed blob
+store (see blob_store.py; `<log>.blobs.sqlite3` or the same database) and
+resolved on read. `page(..., resolve=False)` leaves them unresolved for
+callers that only need some fields (see resolve_fields).
+
+Indices used by the API are newest-first (0 = most recent run).
+
+CLI:
+  python history_store.py import runs_log.jsonl runs.sqlite3   (one-time import)
+  python history_store.py pack runs_log.jsonl|runs.sqlite3     (move existing
+      records' text into the blob store; prints the bytes saved)
+  python history_store.py report runs_log.jsonl|runs.sqlite3   (bytes saved so far)
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from collections import Counter
+from typing import Optional, Dict, Any, List, Iterator
+
+from jsonl_index import OffsetIndex, TrackingOverlay
+from history_writer import GroupCommitter, file_lock_for, fsync_file
+from history_search import HistorySearchIndex
+from blob_store import BlobStore, BLOB_FIELDS, REF_KEY, is_ref, blob_store_for, sidecar_path
+
+TRACKING_FIELDS = ("applied", "platform", "application_url", "status", "notes")
+
+
+def tracking_defaults(tr: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    tr = tr or {}
+    return {
+        "applied": bool(tr.get("applied", False)),
+        "platform": tr.get("platform", ""),
+        "application_url": tr.get("application_url", ""),
+        "status": tr.get("status", "Draft"),
+        "notes": tr.get("notes", ""),
+    }
+
+
+def merge_tracking(current: Optional[Dict[str, Any]], changes: Dict[str, Any]) -> Dict[str, Any]:
+    tr = tracking_defaults(current)
+    for key in TRACKING_FIELDS:
+        if key in changes and changes[key] is not None:
+            tr[key] = changes[key]
+    return tr
+
+
+def record_company(record: Dict[str, Any]) -> str:
+    inputs = record.get("inputs", {}) or {}
+    return inputs.get("company_name") or inputs.get("company_url") or ""
+
+
+# ---------- jsonl helpers ----------
+
+def append_jsonl(path: Path, record: Dict[str, Any], fsync: bool = True) -> None:
+    # Same lock as JsonlHistoryStore, so it never interleaves with a compaction.
+    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    with file_lock_for(path).exclusive():
+        with open(path, "ab") as f:
+            f.write(line)
+            if fsync:
+                fsync_file(f)
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Records of a JSONL log, streamed (unparseable lines are skipped)."""
+    path = Path(path)
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except Exception:
+                continue
+
+
+def read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    return list(iter_jsonl(path))
+
+
+# ---------- backends ----------
+
+class HistoryStore:
+    """Interface shared by all history backends."""
+
+    search_index: Optional[HistorySearchIndex] = None
+    blobs: Optional[BlobStore] = None
+    pack_on_write = False  # with blobs disabled, existing references are still resolved
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Store a run; returns its oldest-first position (seq)."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def page(self, offset: int, limit: int, resolve: bool = True) -> List[Dict[str, Any]]:
+        """Newest-first slice [offset, offset + limit); blob references left in place unless `resolve`."""
+        raise NotImplementedError
+
+    def get(self, index: int, resolve: bool = True) -> Optional[Dict[str, Any]]:
+        """Record at newest-first `index`, or None if out of range."""
+        items = self.page(index, 1, resolve=resolve)
+        return items[0] if items else None
+
+    def _pack(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return self.blobs.pack(record) if self.pack_on_write else record
+
+    def _resolved(self, items: List[Dict[str, Any]], resolve: bool) -> List[Dict[str, Any]]:
+        if resolve and self.blobs is not None:
+            for it in items:
+                self.blobs.resolve(it)
+        return items
+
+    def resolve_fields(self, record: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+        """Resolve only the named text fields of a record read with resolve=False."""
+        if self.blobs is not None:
+            self.blobs.resolve(record, fields)
+        return record
+
+    def update_tracking(self, index: int, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge tracking `changes` into the record at `index`; returns the new tracking or None."""
+        raise NotImplementedError
+
+    def update_tracking_at(self, seq: int, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """update_tracking addressed by oldest-first position, which new runs do not shift."""
+        raise NotImplementedError
+
+    def version(self) -> Optional[str]:
+        """Cheap token that changes whenever any record changes (None if unsupported)."""
+        return None
+
+    def _read_seqs(self, seqs: List[int]) -> List[Dict[str, Any]]:
+        """Records at oldest-first positions `seqs`, in that order."""
+        raise NotImplementedError
+
+    def sync_search_index(self) -> int:
+        """Index runs the search index has not seen yet (e.g. appended by another process); returns rows added."""
+        if self.search_index is None:
+            return 0
+        return self.search_index.sync(self.count(), self._read_seqs)
+
+    def search(self, query: str = "", offset: int = 0, limit: int = 20, **filters: Any) -> Dict[str, Any]:
+        """
+        Ranked full-text search (see HistorySearchIndex.search for filters).
+        Returns {"total", "items": [{"index", "score", "snippet", "record"}]}
+        with newest-first indices.
+        """
+        if self.search_index is None:
+            raise NotImplementedError("history search is disabled for this store")
+        self.sync_search_index()
+        total, hits = self.search_index.search(query, offset=offset, limit=limit, **filters)
+        count = self.count()
+        records = self._read_seqs([h["seq"] for h in hits])
+        items = [dict(h, index=count - 1 - h.pop("seq"), record=r) for h, r in zip(hits, records)]
+        return {"total": total, "items": items}
+
+    # ---------- blob migration ----------
+
+    def _raw_records(self) -> Iterator[str]:
+        """Every stored record as written (JSON text, blob references unresolved)."""
+        raise NotImplementedError
+
+    def pack_blobs(self) -> Dict[str, Any]:
+        """Move the text of existing records into the blob store; returns a bytes report."""
+        raise NotImplementedError
+
+    def storage_report(self) -> Dict[str, Any]:
+        """
+        Bytes saved by the blob store: the text the records reference (as if
+        inlined in every record) against the compressed blobs actually stored.
+        """
+        if self.blobs is None:
+            return {"blobs": "disabled"}
+        records = record_bytes = 0
+        refs: Counter = Counter()
+        for line in self._raw_records():
+            records += 1
+            record_bytes += len(line.encode("utf-8"))
+            rec = json.loads(line)
+            for container, field in BLOB_FIELDS:
+                holder = rec if container is None else rec.get(container)
+                if isinstance(holder, dict) and is_ref(holder.get(field)):
+                    refs[holder[field][REF_KEY]] += 1
+        sizes = self.blobs.sizes(list(refs))
+        referenced = sum(sizes[h][0] * n for h, n in refs.items() if h in sizes)
+        stored = sum(sizes[h][1] for h in refs if h in sizes)
+        return {
+            "records": records,
+            "record_bytes": record_bytes,
+            "blob_refs": sum(refs.values()),
+            "unique_blobs": len(refs),
+            "referenced_text_bytes": referenced,
+            "blob_bytes": stored,
+            "bytes_saved": referenced - stored,
+        }
+
+
+class JsonlHistoryStore(HistoryStore):
+    """
+    runs_log.jsonl with a byte-offset sidecar index (random access through
+    mmap) and a tracking overlay log. Tracking edits are appended to the
+    overlay and folded into the log in one pass every `compact_every` edits,
+    instead of rewriting the whole file per edit.
+
+    Appends and tracking edits are group-committed under the exclusive file
+    lock (`fsync` makes each batch durable before callers return); reads
+    take the shared lock.
+    """
+
+    def __init__(self, path: Path, compact_every: int = 200, search: bool = True, blobs: bool = True, fsync: bool = True):
+        self.path = Path(path)
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.index = OffsetIndex(self.path)
+        self.overlay = TrackingOverlay(self.path)
+        self._lock = threading.Lock()
+        self.file_lock = file_lock_for(self.path)
+        self._generation = -1
+        self.writer = GroupCommitter(self._commit)
+        if search:
+            self.search_index = HistorySearchIndex(Path(str(self.path) + ".search.sqlite3"))
+        if blobs or sidecar_path(self.path).exists():
+            self.blobs = blob_store_for(self.path)
+        self.pack_on_write = blobs
+
+    def _refresh(self) -> None:
+        # Caller holds the file lock.
+        generation = self.file_lock.generation()
+        if generation != self._generation:  # the log was replaced by another process (or this is the first read)
+            self.index.invalidate()
+            self.overlay.invalidate()
+            self._generation = generation
+        self.index.refresh()
+        self.overlay.refresh()
+
+    def _commit(self, ops: List[tuple]) -> List[Any]:
+        """
+        One group commit: ("append", line, tracking) -> seq and
+        ("tracking", index, seq, changes) -> (pos, tracking) or None (by
+        newest-first index, or by position when seq is given), applied in
+        submission order.
+        """
+        results: List[Any] = []
+        with self._lock, self.file_lock.exclusive():
+            self._refresh()  # pick up other processes' appends and patches
+            base = self.path.stat().st_size if self.path.exists() else 0
+            buf = bytearray()
+            if base > self.index.indexed_end:
+                buf += b"\n"  # terminate a line torn by a writer that died mid-append
+            starts: List[int] = []
+            count = len(self.index)
+            appended: Dict[int, Optional[Dict[str, Any]]] = {}  # pos -> tracking, records of this batch
+            patched: Dict[int, Dict[str, Any]] = {}
+            for op in ops:
+                if op[0] == "append":
+                    starts.append(base + len(buf))
+                    buf += op[1]
+                    appended[count] = op[2]
+                    results.append(count)
+                    count += 1
+                    continue
+                _, index, seq, changes = op
+                pos = seq if seq is not None else count - 1 - index
+                if not 0 <= pos < count:
+                    results.append(None)
+                    continue
+                if pos in patched:
+                    current = patched[pos]
+                elif pos in appended:
+                    current = appended[pos]
+                else:
+                    current = self.overlay.get(pos)
+                    if current is None:
+                        current = self.index.read([pos])[0].get("tracking")
+                patched[pos] = merge_tracking(current, changes)
+                results.append((pos, patched[pos]))
+
+            if buf:
+                with open(self.path, "ab") as f:
+                    f.write(buf)
+                    if self.fsync:
+                        fsync_file(f)
+                self.index.note_appends(starts, base + len(buf))
+            if patched:
+                self.overlay.append_many(list(patched.items()), fsync=self.fsync)
+                if self.overlay.entries >= self.compact_every:
+                    self._compact()
+        return results
+
+    def append(self, record: Dict[str, Any]) -> int:
+        line = (json.dumps(self._pack(record), ensure_ascii=False) + "\n").encode("utf-8")
+        seq = self.writer.submit(("append", line, record.get("tracking")))
+        if self.search_index is not None:
+            self.search_index.add(seq, record)
+        return seq
+
+    def count(self) -> int:
+        with self._lock, self.file_lock.shared():
+            self._refresh()
+            return len(self.index)
+
+    def page(self, offset: int, limit: int, resolve: bool = True) -> List[Dict[str, Any]]:
+        with self._lock, self.file_lock.shared():
+            self._refresh()
+            total = len(self.index)
+            positions = [p for p in range(total - 1 - offset, total - 1 - offset - limit, -1) if p >= 0]
+            items = self.index.read(positions)
+            for pos, it in zip(positions, items):
+                patch = self.overlay.get(pos)
+                if patch is not None:
+                    it["tracking"] = patch
+        return self._resolved(items, resolve)
+
+    def update_tracking(self, index: int, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._submit_tracking(index, None, changes)
+
+    def update_tracking_at(self, seq: int, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._submit_tracking(None, seq, changes)
+
+    def _submit_tracking(self, index: Optional[int], seq: Optional[int], changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        done = self.writer.submit(("tracking", index, seq, changes))
+        if done is None:
+            return None
+        pos, tr = done
+        if self.search_index is not None:
+            self.search_index.update_tracking(pos, tr)
+        return tr
+
+    def _read_seqs(self, seqs: List[int]) -> List[Dict[str, Any]]:
+        with self._lock, self.file_lock.shared():
+            self._refresh()
+            items = self.index.read(seqs)
+            for pos, it in zip(seqs, items):
+                patch = self.overlay.get(pos)
+                if patch is not None:
+                    it["tracking"] = patch
+        return self._resolved(items, True)
+
+    def _raw_records(self) -> Iterator[str]:
+        if not self.path.exists():
+            return
+        with self.file_lock.shared(), open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+
+    def pack_blobs(self) -> Dict[str, Any]:
+        if self.blobs is None:
+            raise RuntimeError("blob store is disabled for this history store")
+        blobs_before = self.blobs.stats()["stored_bytes"]
+        records = packed = before = 0
+        with self._lock, self.file_lock.exclusive():
+            self._refresh()
+            tmp = self.path.with_suffix(".tmp")
+            offsets = array("Q")
+            written = 0
+            with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+                for start in self.index.offsets:
+                    src.seek(start)
+                    line = src.readline()
+                    before += len(line)
+                    records += 1
+                    it = json.loads(line)
+                    compact = self.blobs.pack(it)
+                    if compact != it:
+                        packed += 1
+                        line = (json.dumps(compact, ensure_ascii=False) + "\n").encode("utf-8")
+                    offsets.append(written)
+                    dst.write(line)
+                    written += len(line)
+                fsync_file(dst)
+            self._generation = self.file_lock.bump_generation()
+            tmp.replace(self.path)
+            self.index.reset(offsets, written)
+        return _pack_report(records, packed, before, written, self.blobs.stats()["stored_bytes"] - blobs_before)
+
+    def version(self) -> Optional[str]:
+        parts = []
+        for p in (self.path, self.overlay.path):
+            try:
+                st = os.stat(p)
+                parts.append(f"{st.st_ino}:{st.st_size}")
+            except FileNotFoundError:
+                parts.append("-")
+        return "/".join(parts)
+
+    def compact(self) -> None:
+        """Fold pending tracking patches into the log and reset the overlay."""
+        with self._lock, self.file_lock.exclusive():
+            self._refresh()
+            self._compact()
+
+    def _compact(self) -> None:
+        # Caller holds both locks (exclusive file lock) and has refreshed index + overlay.
+        if not self.overlay.patches:
+            return
+        tmp = self.path.with_suffix(".tmp")
+        offsets = array("Q")
+        written = 0
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            for pos, start in enumerate(self.index.offsets):
+                src.seek(start)
+                line = src.readline()
+                patch = self.overlay.get(pos)
+                if patch is not None:
+                    it = json.loads(line)
+                    it["tracking"] = patch
+                    line = (json.dumps(it, ensure_ascii=False) + "\n").encode("utf-8")
+                offsets.append(written)
+                dst.write(line)
+                written += len(line)
+            if self.fsync:
+                fsync_file(dst)
+        self._generation = self.file_lock.bump_generation()  # before the swap: a crash in between only forces a reload
+        tmp.replace(self.path)
+        self.index.reset(offsets, written)
+        self.overlay.clear()
+
+
+class SqliteHistoryStore(HistoryStore):
+    """
+    Runs are stored with a dense `seq` (0 = oldest), so a newest-first index
+    maps directly to a seq range and pages are fetched through the primary key.
+    Tracking lives in its own column so edits touch a single row.
+    """
+
+    def __init__(self, path: Path, search: bool = True, blobs: bool = True):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                seq INTEGER PRIMARY KEY,
+                timestamp TEXT,
+                company TEXT,
+                record TEXT NOT NULL,
+                tracking TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON runs(timestamp);
+            CREATE INDEX IF NOT EXISTS idx_runs_company ON runs(company COLLATE NOCASE);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+            CREATE TABLE IF NOT EXISTS imports (
+                source TEXT PRIMARY KEY,
+                imported_at TEXT NOT NULL DEFAULT (datetime('now')),
+                count INTEGER NOT NULL
+            );
+            """
+        )
+        if search:
+            self.search_index = HistorySearchIndex(self.path)
+        self.blobs = BlobStore(self.path)
+        self.pack_on_write = blobs
+
+    def _row(self, record: Dict[str, Any]) -> tuple:
+        record = dict(record)
+        tracking = record.pop("tracking", None)
+        return (
+            record.get("timestamp"),
+            record_company(record),
+            json.dumps(record, ensure_ascii=False),
+            json.dumps(tracking, ensure_ascii=False) if tracking is not None else None,
+        )
+
+    def _next_seq(self) -> int:
+        return self._db.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM runs").fetchone()[0]
+
+    def _insert_rows(self, start: int, records: List[Dict[str, Any]]) -> None:
+        # Caller holds the lock inside a write transaction.
+        self._db.executemany(
+            "INSERT INTO runs (seq, timestamp, company, record, tracking) VALUES (?, ?, ?, ?, ?)",
+            [(start + i,) + self._row(r) for i, r in enumerate(records)],
+        )
+
+    def _insert_many(self, records: List[Dict[str, Any]]) -> int:
+        # Caller holds the lock. seq is assigned densely inside the transaction;
+        # returns the first one.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            start = self._next_seq()
+            self._insert_rows(start, records)
+            self._db.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return start
+
+    def append(self, record: Dict[str, Any]) -> int:
+        # Blobs are written first (own connection), so the run row never points at a missing blob.
+        packed = self._pack(record)
+        with self._lock:
+            seq = self._insert_many([packed])
+        if self.search_index is not None:
+            self.search_index.add(seq, record)
+        return seq
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM runs").fetchone()[0]
+
+    def page(self, offset: int, limit: int, resolve: bool = True) -> List[Dict[str, Any]]:
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM runs").fetchone()[0]
+            hi = total - 1 - offset
+            lo = hi - limit + 1
+            rows = self._db.execute(
+                "SELECT record, tracking FROM runs WHERE seq BETWEEN ? AND ? ORDER BY seq DESC",
+                (lo, hi),
+            ).fetchall()
+        out = []
+        for record, tracking in rows:
+            it = json.loads(record)
+            if tracking is not None:
+                it["tracking"] = json.loads(tracking)
+            out.append(it)
+        return self._resolved(out, resolve)
+
+    def update_tracking(self, index: int, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._update_tracking(index, None, changes)
+
+    def update_tracking_at(self, seq: int, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._update_tracking(None, seq, changes)
+
+    def _update_tracking(self, index: Optional[int], seq: Optional[int], changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Read and write in one IMMEDIATE transaction: another process can't
+        # append (shifting `index`) or edit the row in between.
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if seq is None:
+                    total = self._db.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM runs").fetchone()[0]
+                    seq = total - 1 - index if index >= 0 else -1
+                row = self._db.execute("SELECT tracking FROM runs WHERE seq = ?", (seq,)).fetchone()
+                if row is None:
+                    self._db.execute("ROLLBACK")
+                    return None
+                tr = merge_tracking(json.loads(row[0]) if row[0] else None, changes)
+                self._db.execute("UPDATE runs SET tracking = ? WHERE seq = ?", (json.dumps(tr, ensure_ascii=False), seq))
+                self._db.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if self.search_index is not None:
+            self.search_index.update_tracking(seq, tr)
+        return tr
+
+    def _read_seqs(self, seqs: List[int]) -> List[Dict[str, Any]]:
+        if not seqs:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT seq, record, tracking FROM runs WHERE seq IN ({','.join('?' * len(seqs))})", seqs,
+            ).fetchall()
+        by_seq = {}
+        for seq, record, tracking in rows:
+            it = json.loads(record)
+            if tracking is not None:
+                it["tracking"] = json.loads(tracking)
+            by_seq[seq] = it
+        return self._resolved([by_seq.get(s, {}) for s in seqs], True)
+
+    def _raw_records(self) -> Iterator[str]:
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT seq, record FROM runs WHERE seq > ? ORDER BY seq LIMIT 500", (last,),
+                ).fetchall()
+            if not rows:
+                return
+            for seq, record in rows:
+                yield record
+            last = rows[-1][0]
+
+    def pack_blobs(self, batch_size: int = 500) -> Dict[str, Any]:
+        if self.blobs is None:
+            raise RuntimeError("blob store is disabled for this history store")
+        blobs_before = self.blobs.stats()["stored_bytes"]
+        records = packed = before = after = 0
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT seq, record FROM runs WHERE seq > ? ORDER BY seq LIMIT ?", (last, batch_size),
+                ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for seq, record in rows:
+                records += 1
+                before += len(record.encode("utf-8"))
+                it = json.loads(record)
+                compact = self.blobs.pack(it)
+                text = json.dumps(compact, ensure_ascii=False) if compact != it else record
+                after += len(text.encode("utf-8"))
+                if compact != it:
+                    packed += 1
+                    updates.append((text, seq))
+            with self._lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    self._db.executemany("UPDATE runs SET record = ? WHERE seq = ?", updates)
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+            last = rows[-1][0]
+        with self._lock:
+            try:
+                self._db.execute("VACUUM")  # give the freed pages back to the filesystem
+                self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.OperationalError as e:
+                print(f"[history] VACUUM skipped: {e}")
+        return _pack_report(records, packed, before, after, self.blobs.stats()["stored_bytes"] - blobs_before)
+
+    def version(self) -> Optional[str]:
+        with self._lock:
+            return str(self._db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+
+    def import_jsonl(self, source: Path, batch_size: int = 1000) -> int:
+        """
+        Copy an existing runs_log.jsonl into the table once; returns rows
+        imported. All rows and the `imports` marker are committed in one
+        transaction, so an interrupted import leaves nothing to duplicate.
+        """
+        source = Path(source)
+        key = str(source.resolve())
+        # references in the source point into its own blob sidecar
+        source_blobs = blob_store_for(source) if sidecar_path(source).exists() else None
+
+        def records() -> Iterator[Dict[str, Any]]:
+            for r in iter_jsonl(source):
+                yield source_blobs.resolve(r) if source_blobs else r
+
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM imports WHERE source = ?", (key,)).fetchone():
+                return 0
+            if self.pack_on_write:
+                # Blobs are written first on their own connection (it would wait on
+                # our write transaction). They are content-addressed, so a failed
+                # import leaves at most unreferenced blobs behind.
+                for r in records():
+                    self.blobs.pack(r)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute("SELECT 1 FROM imports WHERE source = ?", (key,)).fetchone():
+                    self._db.execute("ROLLBACK")  # another process imported it meanwhile
+                    return 0
+                start = self._next_seq()
+                n, batch = 0, []
+                for r in records():
+                    batch.append(self.blobs.pack(r, store=False) if self.pack_on_write else r)
+                    if len(batch) >= batch_size:
+                        self._insert_rows(start + n, batch)
+                        n, batch = n + len(batch), []
+                if batch:
+                    self._insert_rows(start + n, batch)
+                    n += len(batch)
+                self._db.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+                self._db.execute("INSERT INTO imports (source, count) VALUES (?, ?)", (key, n))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return n
+
+
+def _pack_report(records: int, packed: int, before: int, after: int, blob_bytes_added: int) -> Dict[str, Any]:
+    return {
+        "records": records,
+        "records_packed": packed,
+        "record_bytes_before": before,
+        "record_bytes_after": after,
+        "blob_bytes_added": blob_bytes_added,
+        "bytes_saved": before - after - blob_bytes_added,
+    }
+
+
+def get_history_store(
+    backend: str, jsonl_path: Path, sqlite_path: Path, search: bool = True, blobs: bool = True, fsync: bool = True,
+) -> HistoryStore:
+    """
+    Build the configured backend. On first use of the SQLite backend an
+    existing JSONL log is imported automatically.
+    """
+    if backend == "sqlite":
+        store = SqliteHistoryStore(sqlite_path, search=search, blobs=blobs)
+        if Path(jsonl_path).exists() and store.count() == 0:
+            n = store.import_jsonl(jsonl_path)
+            print(f"[history] imported {n} runs from {jsonl_path} into {sqlite_path}")
+        return store
+    if backend == "jsonl":
+        return JsonlHistoryStore(jsonl_path, search=search, blobs=blobs, fsync=fsync)
+    raise ValueError(f"Unknown history backend: {backend!r} (expected 'jsonl' or 'sqlite')")
+
+
+def _open_for_cli(path: str) -> HistoryStore:
+    if path.endswith(".jsonl"):
+        return JsonlHistoryStore(Path(path), search=False)
+    return SqliteHistoryStore(Path(path), search=False)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "import":
+        n = SqliteHistoryStore(Path(sys.argv[3])).import_jsonl(Path(sys.argv[2]))
+        print(f"imported {n} runs")
+    elif len(sys.argv) == 3 and sys.argv[1] in ("pack", "report"):
+        store = _open_for_cli(sys.argv[2])
+        report = store.pack_blobs() if sys.argv[1] == "pack" else store.storage_report()
+        print(json.dumps(report, indent=2))
+    else:
+        print("usage: python history_store.py import <runs_log.jsonl> <runs.sqlite3>\n"
+              "       python history_store.py pack|report <runs_log.jsonl | runs.sqlite3>")
+        sys.exit(2)
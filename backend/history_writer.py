@@ -0,0 +1,163 @@
+# history_writer.py
+"""
+Cross-process safety and group commit for the JSONL history.
+
+With `uvicorn --workers N` (or JOB_WORKER_MODE=process) several processes
+write the same runs_log.jsonl, its offset index and tracking overlay. A
+thread lock only orders writers inside one process, so:
+
+FileLock
+  fcntl.flock on `<log>.lock`: exclusive for writers (appends, tracking
+  patches, compaction, blob migration), shared for readers. Every writer
+  re-reads what other processes wrote (index / overlay refresh) after taking
+  it, so a compaction can never drop a run appended elsewhere. The lock
+  file also holds a generation counter, bumped whenever the log is replaced
+  (compaction, blob migration): inode numbers are reused quickly, so a
+  process whose index or overlay predates the current generation reloads
+  them instead of trusting the inode.
+
+GroupCommitter
+  Callers submit operations and block until they are durable. A background
+  thread drains everything queued while the previous batch was being
+  written and commits it as one batch: one lock acquisition, one write and
+  one fsync per file, however many appends and updates it holds.
+"""
+
+import os
+import fcntl
+import struct
+import queue
+import threading
+from pathlib import Path
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+_GENERATION = struct.Struct("<Q")
+
+
+class FileLock:
+    """
+    One per lock file and process (see file_lock_for): threads of a process
+    share the descriptor, so they are serialized by a thread lock first
+    (flock would not order them, and a second thread's LOCK_EX would convert
+    the first one's LOCK_SH instead of waiting).
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+        self._pid = 0
+        self._guard = threading.Lock()
+        self._threads = threading.Lock()
+
+    def _fileno(self) -> int:
+        # flock locks belong to the open file description: reopen after a fork.
+        with self._guard:
+            if self._fd is None or self._pid != os.getpid():
+                self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            return self._fd
+
+    @contextmanager
+    def _locked(self, mode: int) -> Iterator[None]:
+        fd = self._fileno()
+        with self._threads:
+            fcntl.flock(fd, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def exclusive(self):
+        return self._locked(fcntl.LOCK_EX)
+
+    def shared(self):
+        return self._locked(fcntl.LOCK_SH)
+
+    def generation(self) -> int:
+        """Replacement counter of the guarded file (call with the lock held)."""
+        raw = os.pread(self._fileno(), _GENERATION.size, 0)
+        return _GENERATION.unpack(raw)[0] if len(raw) == _GENERATION.size else 0
+
+    def bump_generation(self) -> int:
+        """Mark the guarded file as replaced (call with the exclusive lock held)."""
+        gen = self.generation() + 1
+        os.pwrite(self._fileno(), _GENERATION.pack(gen), 0)
+        return gen
+
+
+_file_locks: Dict[str, FileLock] = {}
+_file_locks_lock = threading.Lock()
+
+
+def file_lock_for(log_path: Union[str, Path]) -> FileLock:
+    """The process-wide lock guarding `log_path` (`<log>.lock`)."""
+    key = str(Path(log_path).resolve())
+    with _file_locks_lock:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = _file_locks[key] = FileLock(str(log_path) + ".lock")
+        return lock
+
+
+def fsync_file(f) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class GroupCommitter:
+    """
+    Batches submitted operations for `commit(batch) -> results` (one result
+    per operation, in order). `max_batch` bounds a batch; `linger` (seconds)
+    optionally waits for more operations once the queue runs dry.
+    """
+
+    def __init__(self, commit: Callable[[List[Any]], List[Any]], max_batch: int = 512, linger: float = 0.0, name: str = "history-writer"):
+        self.commit = commit
+        self.max_batch = max_batch
+        self.linger = linger
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = 0
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+
+    def _ensure_thread(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, op: Any) -> Any:
+        """Queue `op` and wait for the batch holding it to be committed."""
+        fut: Future = Future()
+        self._ensure_thread()
+        self._queue.put((op, fut))
+        return fut.result()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=self.linger) if self.linger else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            ops = [op for op, _ in batch]
+            try:
+                results = self.commit(ops)
+            except BaseException as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.operations += len(batch)
+            for (_, fut), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    fut.set_exception(result)
+                else:
+                    fut.set_result(result)
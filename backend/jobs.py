@@ -0,0 +1,355 @@
+# jobs.py
+"""
+Background generation jobs backed by a local SQLite queue.
+
+- submit() persists the inputs (including the resume bytes) and returns a job id
+- a bounded pool of worker slots claims queued jobs and runs the pipeline,
+  either in the slot's thread (own event loop) or in a child process
+- queue depth is capped (QueueFull -> HTTP 429 upstream)
+- cancel() drops queued jobs immediately and interrupts running ones
+- queued jobs survive restarts; jobs left "running" by a dead process are
+  re-queued on startup
+
+Status flow: queued -> running -> succeeded | failed | cancelled
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+import multiprocessing
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _now() -> float:
+    return time.time()
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA busy_timeout=30000")
+    return db
+
+
+def _run_pipeline(db_path: Path, job_id: str, cancel_event: Optional[threading.Event] = None, history_store=None) -> None:
+    """Run one claimed job to completion and record the outcome."""
+    # Imported here so child processes (and api imports) only pay for it when needed.
+    from main import arun_tailoring_pipeline, aclose_clients
+    from history_store import get_history_store
+    from constants import (
+        HISTORY_BACKEND, HISTORY_PATH, HISTORY_DB_PATH, HISTORY_SEARCH_ENABLED, HISTORY_BLOBS_ENABLED, HISTORY_FSYNC,
+    )
+
+    db = _connect(db_path)
+    row = db.execute("SELECT params, resume FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        # Deleted or purged between being claimed and starting: nothing to run.
+        print(f"[jobs] job {job_id} vanished before it started")
+        db.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            ("job_missing: the job was removed before it started", _now(), job_id),
+        )
+        db.close()
+        return
+    params = json.loads(row[0])
+    store = history_store or get_history_store(
+        HISTORY_BACKEND, HISTORY_PATH, HISTORY_DB_PATH,
+        search=HISTORY_SEARCH_ENABLED, blobs=HISTORY_BLOBS_ENABLED, fsync=HISTORY_FSYNC,
+    )
+
+    async def _main():
+        task = asyncio.ensure_future(arun_tailoring_pipeline(
+            job_description=params["job_description"],
+            resume_pdf_bytes=row[1],
+            resume_text_fallback=params.get("resume_text"),
+            company_name=params.get("company_name"),
+            company_url=params.get("company_url"),
+            about_me_or_prefs=params.get("about_me_or_prefs") or "",
+            log_path=str(HISTORY_PATH),
+            use_cache=params.get("use_cache", True),
+            history_store=store,
+        ))
+        try:
+            # Poll for cancellation while the pipeline runs.
+            while not task.done():
+                await asyncio.wait({task}, timeout=0.5)
+                if cancel_event is not None and cancel_event.is_set():
+                    task.cancel()
+            return await task
+        finally:
+            await aclose_clients()
+
+    try:
+        snapshot = asyncio.run(_main())
+        db.execute(
+            "UPDATE jobs SET status = 'succeeded', result = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (json.dumps(snapshot, ensure_ascii=False), _now(), job_id),
+        )
+    except asyncio.CancelledError:
+        db.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ?", (_now(), job_id))
+    except Exception as e:
+        db.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (f"generation_failed: {e}", _now(), job_id),
+        )
+    finally:
+        db.close()
+
+
+def _process_entry(db_path: str, job_id: str) -> None:
+    _run_pipeline(Path(db_path), job_id)
+
+
+class JobQueue:
+    def __init__(self, db_path: Path, workers: int = 2, mode: str = "thread", max_queue_depth: int = 100, history_store=None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown job worker mode: {mode!r} (expected 'thread' or 'process')")
+        self.db_path = Path(db_path)
+        self.workers = workers
+        self.mode = mode
+        self.max_queue_depth = max_queue_depth
+        self.history_store = history_store  # shared with thread workers; process workers open their own
+
+        self._db = _connect(self.db_path)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._cancel_events: Dict[str, threading.Event] = {}
+
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                worker_pid INTEGER,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                params TEXT NOT NULL,
+                resume BLOB,
+                result TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at);
+            """
+        )
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> None:
+        self._recover()
+        self._stopping.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop claiming new jobs; running jobs are interrupted and re-queued on next start."""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _recover(self) -> None:
+        with self._lock:
+            rows = self._db.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+            for job_id, pid in rows:
+                if pid == os.getpid() or not _pid_alive(pid):
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'queued', started_at = NULL, worker_pid = NULL WHERE id = ?",
+                        (job_id,),
+                    )
+                    print(f"[jobs] re-queued interrupted job {job_id}")
+
+    # ---------- public ----------
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def submit(self, params: Dict[str, Any], resume_bytes: Optional[bytes]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                depth = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if depth >= self.max_queue_depth:
+                    raise QueueFull(f"job queue is full ({depth} queued)")
+                self._db.execute(
+                    "INSERT INTO jobs (id, status, created_at, params, resume) VALUES (?, 'queued', ?, ?, ?)",
+                    (job_id, _now(), json.dumps(params, ensure_ascii=False), resume_bytes),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        with self._wakeup:
+            self._wakeup.notify()
+        return {"job_id": job_id, "status": "queued", "queue_depth": depth + 1}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, created_at, started_at, finished_at, result, error, "
+                " (SELECT COUNT(*) FROM jobs q WHERE q.status = 'queued' AND q.created_at < jobs.created_at) "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        out = {
+            "job_id": row[0],
+            "status": row[1],
+            "created_at": row[2],
+            "started_at": row[3],
+            "finished_at": row[4],
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": row[6],
+        }
+        if row[1] == "queued":
+            out["queue_position"] = row[7]
+        return out
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a job; returns its resulting status (None if unknown)."""
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status = row[0]
+            if status == "queued":
+                self._db.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ?, resume = NULL WHERE id = ?",
+                    (_now(), job_id),
+                )
+                return "cancelled"
+            if status == "running":
+                self._db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+                ev = self._cancel_events.get(job_id)
+                if ev is not None:
+                    ev.set()
+                return "cancelling"
+            return status
+
+    # ---------- workers ----------
+
+    def _claim(self) -> Optional[str]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, worker_pid = ? WHERE id = ?",
+                        (_now(), os.getpid(), row[0]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return row[0] if row else None
+
+    def _worker_loop(self) -> None:
+        while not self._stopping.is_set():
+            job_id = self._claim()
+            if job_id is None:
+                # Also poll: jobs may be submitted by other API processes.
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                continue
+            ev = threading.Event()
+            self._cancel_events[job_id] = ev
+            try:
+                if self.mode == "process":
+                    self._run_in_process(job_id, ev)
+                else:
+                    self._run_in_thread(job_id, ev)
+            except Exception as e:
+                print(f"[jobs] worker error on {job_id}: {e}")
+            finally:
+                self._cancel_events.pop(job_id, None)
+                with self._lock:
+                    self._db.execute("UPDATE jobs SET resume = NULL WHERE id = ? AND status NOT IN ('queued', 'running')", (job_id,))
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def _run_in_thread(self, job_id: str, ev: threading.Event) -> None:
+        # Cancel requests made through another process only reach us via the DB.
+        def _watch():
+            while not ev.wait(1.0):
+                if self._stopping.is_set() or self._cancel_requested(job_id):
+                    ev.set()
+        watcher = threading.Thread(target=_watch, daemon=True)
+        watcher.start()
+        try:
+            _run_pipeline(self.db_path, job_id, cancel_event=ev, history_store=self.history_store)
+        finally:
+            if not ev.is_set():
+                ev.set()  # stop the watcher
+            if self._stopping.is_set():
+                self._requeue_if_interrupted(job_id)
+
+    def _run_in_process(self, job_id: str, ev: threading.Event) -> None:
+        proc = multiprocessing.get_context("spawn").Process(
+            target=_process_entry, args=(str(self.db_path), job_id), daemon=True
+        )
+        proc.start()
+        while proc.is_alive():
+            proc.join(timeout=0.5)
+            if proc.is_alive() and (ev.is_set() or self._stopping.is_set() or self._cancel_requested(job_id)):
+                proc.terminate()
+                proc.join()
+                with self._lock:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'running'",
+                        (_now(), job_id),
+                    )
+                if self._stopping.is_set():
+                    self._requeue_if_interrupted(job_id)
+                return
+        if proc.exitcode not in (0, None):
+            with self._lock:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                    (f"worker process exited with code {proc.exitcode}", _now(), job_id),
+                )
+
+    def _requeue_if_interrupted(self, job_id: str) -> None:
+        # Interrupted by shutdown rather than by the user: put it back in line.
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, finished_at = NULL, worker_pid = NULL "
+                "WHERE id = ? AND status = 'cancelled' AND cancel_requested = 0",
+                (job_id,),
+            )
@@ -0,0 +1,235 @@
+# jsonl_index.py
+"""
+Random access into runs_log.jsonl without parsing the whole file.
+
+OffsetIndex
+  Sidecar `<log>.idx` holding a 16-byte header (indexed byte length, inode of
+  the log) followed by one little-endian uint64 start offset per record.
+  Appends extend it in place; if the sidecar is missing, belongs to another
+  file (inode changed) or lags behind the log, it is rebuilt or caught up
+  lazily by scanning only the unindexed tail.
+
+TrackingOverlay
+  `<log>.tracking` is a small append-only patch log of
+  {"pos": <oldest-first position>, "tracking": {...}} lines. Readers apply the
+  latest patch per position; the store folds patches back into the log once
+  enough accumulate (see JsonlHistoryStore.compact).
+"""
+
+import os
+import json
+import mmap
+import struct
+from array import array
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+_HEADER = struct.Struct("<QQ")  # indexed_end, inode
+
+
+def _inode(path: Path) -> int:
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return 0
+
+
+def _size(path: Path) -> int:
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def scan_records(path: Path, start: int = 0) -> Tuple[List[int], int]:
+    """
+    Offsets of complete, parseable JSON lines from `start`, plus the end of the
+    last complete line (a partially written tail is left for the next scan).
+    """
+    offsets: List[int] = []
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            stripped = line.strip()
+            if stripped:
+                try:
+                    json.loads(stripped)
+                    offsets.append(pos)
+                except Exception:
+                    pass
+            pos += len(line)
+    return offsets, pos
+
+
+class OffsetIndex:
+    def __init__(self, log_path: Path):
+        self.log_path = Path(log_path)
+        self.idx_path = Path(str(log_path) + ".idx")
+        self.offsets = array("Q")
+        self.indexed_end = 0
+        self.inode = 0
+        self._loaded = False
+
+    # ---------- persistence ----------
+
+    def _load(self) -> None:
+        self._loaded = True
+        self.offsets = array("Q")
+        self.indexed_end, self.inode = 0, 0
+        try:
+            raw = self.idx_path.read_bytes()
+        except FileNotFoundError:
+            return
+        if len(raw) < _HEADER.size or (len(raw) - _HEADER.size) % 8:
+            return
+        indexed_end, inode = _HEADER.unpack_from(raw)
+        offsets = array("Q")
+        offsets.frombytes(raw[_HEADER.size:])
+        # An append may have written its offset but not the header yet.
+        while offsets and offsets[-1] >= indexed_end:
+            offsets.pop()
+        self.offsets, self.indexed_end, self.inode = offsets, indexed_end, inode
+
+    def _save(self) -> None:
+        tmp = self.idx_path.with_name(self.idx_path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(self.indexed_end, self.inode))
+            f.write(self.offsets.tobytes())
+        tmp.replace(self.idx_path)
+
+    def _save_append(self, new_offsets: List[int]) -> None:
+        if not self.idx_path.exists():
+            self._save()
+            return
+        with open(self.idx_path, "r+b") as f:
+            f.seek(_HEADER.size + (len(self.offsets) - len(new_offsets)) * 8)
+            f.write(array("Q", new_offsets).tobytes())
+            f.truncate()
+            f.seek(0)
+            f.write(_HEADER.pack(self.indexed_end, self.inode))
+
+    # ---------- maintenance ----------
+
+    def refresh(self) -> None:
+        """Bring the index in line with the log (rebuild, catch up, or no-op)."""
+        if not self._loaded:
+            self._load()
+        size, inode = _size(self.log_path), _inode(self.log_path)
+        if inode != self.inode or size < self.indexed_end:
+            self.offsets, self.indexed_end, self.inode = array("Q"), 0, inode
+            if size == 0:
+                self._save()
+                return
+            self._catch_up(rebuild=True)
+        elif size > self.indexed_end:
+            self._catch_up(rebuild=False)
+
+    def invalidate(self) -> None:
+        """Forget the in-memory index; the next refresh reloads it from disk."""
+        self._loaded = False
+
+    def _catch_up(self, rebuild: bool) -> None:
+        new, self.indexed_end = scan_records(self.log_path, self.indexed_end)
+        self.offsets.extend(new)
+        if rebuild:
+            self._save()
+        else:
+            self._save_append(new)
+
+    def note_append(self, offset: int, end: int) -> None:
+        """Record a line the caller just appended at [offset, end)."""
+        self.note_appends([offset], end)
+
+    def note_appends(self, starts: List[int], end: int) -> None:
+        """Record lines the caller just appended back to back, starting at starts[0] and ending at `end`."""
+        if not self._loaded:
+            self._load()
+        if not starts or starts[0] != self.indexed_end or _inode(self.log_path) != self.inode:
+            self.refresh()  # someone else wrote in between (or a torn line precedes ours); scan instead
+            return
+        self.offsets.extend(starts)
+        self.indexed_end = end
+        self._save_append(starts)
+
+    def reset(self, offsets: array, indexed_end: int) -> None:
+        """Install a freshly computed index (after the log was rewritten)."""
+        self._loaded = True
+        self.offsets = offsets
+        self.indexed_end = indexed_end
+        self.inode = _inode(self.log_path)
+        self._save()
+
+    # ---------- reads ----------
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def read(self, positions: List[int]) -> List[Dict[str, Any]]:
+        """Parse the records at the given oldest-first positions via mmap."""
+        if not positions or self.indexed_end == 0:
+            return []
+        out = []
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for pos in positions:
+                start = self.offsets[pos]
+                end = mm.find(b"\n", start)
+                out.append(json.loads(mm[start:end if end >= 0 else len(mm)]))
+        return out
+
+
+class TrackingOverlay:
+    def __init__(self, log_path: Path):
+        self.path = Path(str(log_path) + ".tracking")
+        self.patches: Dict[int, Dict[str, Any]] = {}
+        self.entries = 0
+        self._read_upto = 0
+        self._inode = 0
+
+    def refresh(self) -> None:
+        size, inode = _size(self.path), _inode(self.path)
+        if inode != self._inode or size < self._read_upto:  # replaced by a compaction
+            self.patches, self.entries, self._read_upto, self._inode = {}, 0, 0, inode
+        if size == self._read_upto:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._read_upto)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._read_upto += len(line)
+                try:
+                    patch = json.loads(line)
+                    self.patches[int(patch["pos"])] = patch["tracking"]
+                    self.entries += 1
+                except Exception:
+                    continue
+
+    def invalidate(self) -> None:
+        """Forget what was read; the next refresh re-reads the overlay."""
+        self.patches, self.entries, self._read_upto, self._inode = {}, 0, 0, 0
+
+    def get(self, pos: int) -> Optional[Dict[str, Any]]:
+        return self.patches.get(pos)
+
+    def append(self, pos: int, tracking: Dict[str, Any]) -> None:
+        self.append_many([(pos, tracking)])
+
+    def append_many(self, patches: List[Tuple[int, Dict[str, Any]]], fsync: bool = False) -> None:
+        self.refresh()
+        data = "".join(json.dumps({"pos": pos, "tracking": tr}, ensure_ascii=False) + "\n" for pos, tr in patches)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.refresh()
+
+    def clear(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8"):
+            pass
+        tmp.replace(self.path)
+        self.patches, self.entries, self._read_upto, self._inode = {}, 0, 0, _inode(self.path)
@@ -0,0 +1,224 @@
+# llm_cache.py
+"""
+Content-addressed cache for LLM responses.
+
+Two tiers:
+  - in-memory LRU (fast, per process)
+  - on-disk SQLite (shared across restarts and worker processes)
+
+Entries expire after `ttl_seconds`; each tier is bounded by entry count and
+evicts least-recently-used entries first. Values are JSON-serializable dicts.
+
+SingleFlight coalesces concurrent computations of the same key so that only
+one upstream call is in flight per key.
+"""
+
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+
+
+def make_cache_key(model: str, messages: list, temperature: float, max_tokens: int, response_format: str = "text") -> str:
+    blob = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "response_format": response_format,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: Optional[str],
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_memory_entries: int = 512,
+        max_disk_entries: int = 20000,
+        table: str = "entries",
+    ):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_at, value)
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_accessed ON {table}(accessed_at)")
+
+    # ---------- public ----------
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                created_at, value = hit
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self._counters["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if now - row[1] <= self.ttl_seconds:
+                        self._db.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+                        value = json.loads(row[0])
+                        self._remember(key, row[1], value)
+                        self._counters["disk_hits"] += 1
+                        return value
+                    self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self._counters["expired"] += 1
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._counters["sets"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                self._evict_disk(now)
+
+    def preload(self, limit: int) -> int:
+        """Load the `limit` most recently used disk entries into memory (startup warm-up)."""
+        if self._db is None or limit <= 0:
+            return 0
+        now = time.time()
+        limit = min(limit, self.max_memory_entries)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, value, created_at FROM {self.table} WHERE created_at >= ? ORDER BY accessed_at DESC LIMIT ?",
+                (now - self.ttl_seconds, limit),
+            ).fetchall()
+            for key, value, created_at in reversed(rows):  # most recent ends up freshest in the LRU
+                if key not in self._memory:
+                    self._remember(key, created_at, json.loads(value))
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._counters)
+            out["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                out["disk_entries"] = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        hits = out["memory_hits"] + out["disk_hits"]
+        lookups = hits + out["misses"]
+        out["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return out
+
+    # ---------- internals (caller holds the lock) ----------
+
+    def _remember(self, key: str, created_at: float, value: Dict[str, Any]) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _evict_disk(self, now: float) -> None:
+        cur = self._db.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._counters["expired"] += max(cur.rowcount, 0)
+        count = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._counters["evictions"] += overflow
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller runs the
+    function, later callers for that key wait for and share its result.
+    `do` is for threads, `ado` for coroutines (coalesced per event loop).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._tasks: Dict[Tuple[int, str], asyncio.Task] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._calls[key] = fut
+            else:
+                self.coalesced += 1
+        if not leader:
+            return fut.result()
+        try:
+            result = fn()
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def ado(self, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Tasks belong to the loop that created them; thread-mode jobs each run
+        # their own loop, so coalescing is per loop (and the map is shared).
+        tkey = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(tkey)
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(coro_fn())
+                self._tasks[tkey] = task
+            else:
+                self.coalesced += 1
+        if leader:
+            def _forget(t, tkey=tkey):
+                with self._lock:
+                    if self._tasks.get(tkey) is t:
+                        del self._tasks[tkey]
+            task.add_done_callback(_forget)
+        # shield: one waiter being cancelled must not cancel the shared call
+        return await asyncio.shield(task)
@@ -4,38 +4,89 @@ Plain-text pipeline steps that return human-readable sections
 and a single orchestrator returning all intermediate outputs.
 
 - Extract requirements from JD
-- Parse resume (PDF or text fallback)
-- Match requirements vs resume
+- Parse resume (PDF or text fallback; cached, parsed in a worker process)
+- Match requirements vs resume (local pre-match first, see prematcher)
 - Company research (web)
 - Tailored resume draft (text)
 - Cover letter draft (text)
 - Snapshot to JSONL for audit
 
+Independent steps run concurrently (see PIPELINE_GRAPH); per-step timings
+are recorded in the snapshot under "timings". arun_batch_pipeline tailors one
+resume to many postings, parsing it once and sharing company research.
+
+Every step's output is keyed by a hash of its inputs (see _step_key) and the
+keys are stored in the snapshot under "steps". Passing a previous snapshot as
+`previous` reruns only the steps whose key changed and reuses the rest.
+
 Dependencies:
   - PyPDF2
   - openai (for web tool) and your MLService abstraction
 """
 
-import io
+import os
 import json
+import time
+import hashlib
+import asyncio
 import datetime
-from typing import Optional, Dict, Any
+import weakref
+import threading
+import contextvars
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable, TYPE_CHECKING
+
 
-from PyPDF2 import PdfReader
+from ml_service import MLService, DeadlineExceeded, llm_deadline, time_left
+from resume_parser import get_resume_parser
+from llm_cache import ResponseCache, SingleFlight
+from history_store import HistoryStore, get_history_store
+from prompts import PROMPTS, build_messages, build_input
+from token_budget import apply_budgets
+from prematcher import Coverage, prematch, VERSION as PREMATCH_VERSION
+import metrics
 
-from ml_service import MLService
-from prompts import (
-    EXTRACT_REQUIREMENTS_PROMPT,
-    MATCH_REQUIREMENTS_PROMPT,
-    COMPANY_RESEARCH_PROMPT,
-    TAILOR_RESUME_PROMPT,
-    COVER_LETTER_PROMPT,
+from constants import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, LLM_CACHE_PATH, COMPANY_CACHE_ENABLED, COMPANY_CACHE_TTL_SECONDS,
+    BATCH_MAX_CONCURRENCY, PIPELINE_DEADLINE_SECONDS, WARMUP_CONNECT, WARMUP_CACHE_ENTRIES,
+    PREMATCH_ENABLED, PREMATCH_SKIP_LLM, HISTORY_SEARCH_ENABLED, HISTORY_BLOBS_ENABLED, HISTORY_FSYNC,
 )
 
-from openai import OpenAI
-from constants import OPENAI_API_KEY
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
+
+# The OpenAI SDK is slow to import and only the company research step uses it,
+# so it is imported and the clients are built on first use (or in awarm_up).
+_client: Optional["OpenAI"] = None
+_client_lock = threading.Lock()
+
+def get_client() -> "OpenAI":
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        return _client
+
+# AsyncOpenAI pools connections on the loop that first uses it; the API and
+# each background job worker run their own loop, so keep one client per loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+def get_async_client() -> "AsyncOpenAI":
+    loop = asyncio.get_running_loop()
+    c = _async_clients.get(loop)
+    if c is None:
+        from openai import AsyncOpenAI
+        c = _async_clients[loop] = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+    return c
+
+async def aclose_clients() -> None:
+    """Close the running loop's async HTTP clients (call before the loop ends)."""
+    c = _async_clients.pop(asyncio.get_running_loop(), None)
+    if c is not None:
+        await c.close()
+    await ml_service.aclose()
 
 # Model selection (adjust as needed)
 EXTRACTION_MODEL = "gpt-4o-mini"
@@ -46,144 +97,608 @@ WEB_MODEL = "gpt-4.1"  # supports web_search_preview
 
 ml_service = MLService(EXTRACTION_MODEL)
 
+# Company profiles are cached per normalized company key; concurrent lookups
+# of the same company share one upstream web-search call.
+company_cache = ResponseCache(
+    LLM_CACHE_PATH,
+    ttl_seconds=COMPANY_CACHE_TTL_SECONDS,
+    max_memory_entries=256,
+    max_disk_entries=5000,
+    table="company_profiles",
+) if COMPANY_CACHE_ENABLED else None
+company_research_flight = SingleFlight()
+
+async def awarm_up(connect: bool = WARMUP_CONNECT, cache_entries: int = WARMUP_CACHE_ENTRIES) -> Dict[str, Any]:
+    """
+    Startup warm-up on the running loop: token encoding, cache preloads, the
+    resume parser pool and, with `connect`, pooled upstream connections for
+    both the chat and the research clients. Returns seconds per part, or
+    "error: ..." for parts that failed (none are needed for correctness).
+    """
+    parts: Dict[str, Any] = {}
+
+    async def timed(name: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        t = time.perf_counter()
+        try:
+            await fn()
+            parts[name] = round(time.perf_counter() - t, 3)
+        except Exception as e:
+            parts[name] = f"error: {type(e).__name__}: {e}"
+
+    async def ml() -> None:
+        parts.update(await asyncio.to_thread(ml_service.warm_up, connect, cache_entries))
+        if connect:
+            parts.update(await ml_service.awarm_up())
+
+    async def research() -> None:
+        await asyncio.to_thread(get_client)  # SDK import
+        if connect:
+            await get_async_client().models.list()
+
+    jobs = [
+        ml(),
+        timed("resume_parser", lambda: asyncio.to_thread(get_resume_parser().warm_up, cache_entries)),
+        timed("research_client", research),
+    ]
+    if company_cache is not None and cache_entries:
+        jobs.append(timed("company_cache", lambda: asyncio.to_thread(company_cache.preload, cache_entries)))
+    await asyncio.gather(*jobs)
+    return parts
+
 # ---------- helpers ----------
 
 def _now_iso() -> str:
     return datetime.datetime.now().isoformat(timespec="seconds")
 
+_log_stores: Dict[str, HistoryStore] = {}
+_log_stores_lock = threading.Lock()
+
+def _log_store(path: str) -> HistoryStore:
+    """Process-wide JSONL store for a bare log path (callers that were not given a store)."""
+    key = os.path.abspath(path)
+    with _log_stores_lock:
+        store = _log_stores.get(key)
+        if store is None:
+            store = _log_stores[key] = get_history_store(
+                "jsonl", path, None, search=HISTORY_SEARCH_ENABLED, blobs=HISTORY_BLOBS_ENABLED, fsync=HISTORY_FSYNC,
+            )
+        return store
+
 def save_snapshot_jsonl(snapshot: Dict[str, Any], path: str = "runs_log.jsonl") -> None:
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+    # Through the store: file lock + group commit, offset / search index and blob packing.
+    _log_store(path).append(snapshot)
+
+def _save_snapshot(snapshot: Dict[str, Any], log_path: str, history_store: Optional[HistoryStore]) -> None:
+    if history_store is not None:
+        history_store.append(snapshot)
+    else:
+        save_snapshot_jsonl(snapshot, log_path)
 
 def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
-    reader = PdfReader(io.BytesIO(pdf_bytes))
-    chunks = []
-    for page in reader.pages:
-        chunks.append(page.extract_text() or "")
-    return "\n".join(chunks).strip()
+    # Cached by content hash; parsed in a worker process (see resume_parser).
+    return get_resume_parser().extract_text(pdf_bytes)
 
 # ---------- steps ----------
+# Each LLM step is split into a request builder (call_llm kwargs) shared by the
+# blocking and async variants, so the two can never drift apart.
 
-def extract_requirements_from_jd(job_description: str) -> Dict[str, Any]:
-    prompt = EXTRACT_REQUIREMENTS_PROMPT.format(job_description=job_description.strip())
-    messages = [{"role": "user", "content": prompt}]
-    resp, meta = ml_service.call_llm(
-        messages=messages,
-        model=EXTRACTION_MODEL,
-        call_type="extract_requirements",
-        max_tokens=1500,
-    )
-    return {"requirements_text": (resp or "").strip(), "model_meta": meta}
+def _budgeted(step: str, **inputs: str):
+    """Fit a step's prompt inputs to its token budget (see token_budget)."""
+    return apply_budgets(step, inputs, ml_service.count_tokens)
 
-def match_requirements_to_resume(resume_text: str, requirements_text: str) -> Dict[str, Any]:
-    prompt = MATCH_REQUIREMENTS_PROMPT.format(
-        requirements_text=requirements_text.strip(),
-        resume_text=resume_text.strip(),
-    )
-    messages = [{"role": "user", "content": prompt}]
-    resp, meta = ml_service.call_llm(
-        messages=messages,
-        model=MATCH_MODEL,
-        call_type="match_requirements",
-        max_tokens=1800,
-    )
-    return {"mapping_text": (resp or "").strip(), "model_meta": meta}
+def _extract_requirements_request(job_description: str) -> Dict[str, Any]:
+    inputs, budget = _budgeted("extract_requirements", job_description=job_description)
+    return {
+        "messages": build_messages("extract_requirements", **inputs),
+        "model": EXTRACTION_MODEL,
+        "call_type": "extract_requirements",
+        "max_tokens": 1500,
+        "token_budget": budget,
+    }
+
+def _match_requirements_request(resume_text: str, requirements_text: str) -> Dict[str, Any]:
+    # The local pre-match decides the clear-cut requirements; the LLM only sees
+    # the ambiguous ones and the resume lines relevant to them.
+    coverage = prematch(resume_text, requirements_text) if PREMATCH_ENABLED else None
+    inputs = {"resume_text": resume_text, "requirements_text": requirements_text}
+    if coverage is not None:
+        inputs = coverage.llm_inputs()
+    inputs, budget = _budgeted("match_requirements", **inputs)
+    return {
+        "messages": build_messages("match_requirements", **inputs),
+        "model": MATCH_MODEL,
+        "call_type": "match_requirements",
+        "max_tokens": 1800,
+        "token_budget": budget,
+        "prematch": coverage,
+    }
+
+def _prematched_mapping(coverage: Optional[Coverage]) -> Optional[Dict[str, Any]]:
+    """The match step's result when the pre-match found strong evidence for every requirement (no LLM call)."""
+    if coverage is None or not (PREMATCH_SKIP_LLM and coverage.confident):
+        return None
+    return {"mapping_text": coverage.mapping_text(), "model_meta": None, "prematch": coverage.summary(skipped_llm=True)}
 
-def research_company_via_web(company_name: Optional[str], company_url: Optional[str], min_results: int = 5) -> Dict[str, Any]:
-    prompt = COMPANY_RESEARCH_PROMPT.format(
-        company_name=(company_name or "").strip() or "(unknown)",
-        company_url=(company_url or "").strip(),
+def _tailored_resume_request(resume_text: str, mapping_text: str, company_profile_text: str) -> Dict[str, Any]:
+    inputs, budget = _budgeted(
+        "tailor_resume",
+        resume_text=resume_text,
+        mapping_text=mapping_text,
+        company_profile_text=company_profile_text,
     )
-    resp = client.responses.create(
-        model=WEB_MODEL,
-        tools=[{"type": "web_search_preview"}],
-        tool_choice={"type": "web_search_preview"},
-        input=prompt,
-        instructions=f"Use a web search tool and consult at least {min_results} credible results if needed.",
+    return {
+        "messages": build_messages("tailor_resume", **inputs),
+        "model": RESUME_MODEL,
+        "call_type": "tailor_resume",
+        "max_tokens": 2400,
+        "token_budget": budget,
+    }
+
+def _cover_letter_request(requirements_text: str, company_profile_text: str, about_me_or_prefs: str) -> Dict[str, Any]:
+    inputs, budget = _budgeted(
+        "cover_letter",
+        about_me_or_prefs=about_me_or_prefs,
+        company_profile_text=company_profile_text,
+        requirements_text=requirements_text,
     )
-    text = resp.output_text or ""
+    return {
+        "messages": build_messages("cover_letter", **inputs),
+        "model": COVER_LETTER_MODEL,
+        "call_type": "cover_letter",
+        "max_tokens": 900,
+        "token_budget": budget,
+    }
+
+def _company_research_request(company_name: Optional[str], company_url: Optional[str], min_results: int) -> Dict[str, Any]:
+    instructions, _ = PROMPTS["research_company"]
+    return {
+        "model": WEB_MODEL,
+        "tools": [{"type": "web_search_preview"}],
+        "tool_choice": {"type": "web_search_preview"},
+        "instructions": f"{instructions}\n- Use a web search tool and consult at least {min_results} credible results if needed.",
+        "input": build_input(
+            "research_company",
+            company_name=(company_name or "").strip() or "(unknown)",
+            company_url=company_url,
+        ),
+    }
+
+def _company_research_meta(usage: Dict[str, Any], latency_s: Optional[float] = None) -> Dict[str, Any]:
+    """model_meta for a Responses API research call, shaped like ml_service's."""
+    usage = usage or {}
+    return {
+        "type": "research_company",
+        "model": WEB_MODEL,
+        "usage": usage,
+        "cost": ml_service.calculate_text_model_cost(usage, WEB_MODEL),
+        "latency_s": latency_s,
+        "queue_wait_s": 0.0,
+        "retry_wait_s": 0.0,
+        "retries": 0,
+    }
+
+def _research_usage(resp: Any) -> Dict[str, Any]:
+    usage = getattr(resp, "usage", None)
+    return usage.model_dump() if usage is not None else {}
+
+def _research_from_cache(hit: Dict[str, Any]) -> Dict[str, Any]:
+    meta = dict(hit.get("model_meta") or _company_research_meta({}), cost=0.0, cache_hit=True, latency_s=0.0)
+    metrics.record_llm_call(meta)
+    return dict(hit, model_meta=meta, cache_hit=True)
+
+def _company_research_result(text: str, model_meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     evidence_links = []
     for line in text.splitlines():
         s = line.strip()
         if s.startswith("http://") or s.startswith("https://"):
             evidence_links.append(s)
-    return {"company_profile_text": text.strip(), "evidence_links": evidence_links[:5]}
+    return {
+        "company_profile_text": text.strip(),
+        "evidence_links": evidence_links[:5],
+        "model": WEB_MODEL,
+        "researched_at": _now_iso(),
+        "model_meta": model_meta or _company_research_meta({}),
+    }
 
-def generate_tailored_resume_text(resume_text: str, mapping_text: str, company_profile_text: str) -> Dict[str, Any]:
-    prompt = TAILOR_RESUME_PROMPT.format(
-        resume_text=resume_text.strip(),
-        mapping_text=mapping_text.strip(),
-        company_profile_text=company_profile_text.strip(),
-    )
-    messages = [{"role": "user", "content": prompt}]
-    resp, meta = ml_service.call_llm(
-        messages=messages,
-        model=RESUME_MODEL,
-        call_type="tailor_resume",
-        max_tokens=2400,
-    )
-    return {"tailored_resume_text": (resp or "").strip(), "model_meta": meta}
+def company_cache_key(company_name: Optional[str], company_url: Optional[str]) -> Optional[str]:
+    """Normalized company key: the URL's domain (sans www.), else the lowercased name."""
+    url = (company_url or "").strip()
+    if url:
+        parsed = urlparse(url if "//" in url else f"//{url}")
+        host = (parsed.hostname or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        if host:
+            return f"domain:{host}"
+    name = " ".join((company_name or "").lower().split())
+    return f"name:{name}" if name else None
 
-def generate_cover_letter_text(requirements_text: str, company_profile_text: str, about_me_or_prefs: str) -> Dict[str, Any]:
-    prompt = COVER_LETTER_PROMPT.format(
-        requirements_text=requirements_text.strip(),
-        company_profile_text=company_profile_text.strip(),
-        about_me_or_prefs=(about_me_or_prefs or "").strip(),
-    )
-    messages = [{"role": "user", "content": prompt}]
-    resp, meta = ml_service.call_llm(
-        messages=messages,
-        model=COVER_LETTER_MODEL,
-        call_type="cover_letter",
-        max_tokens=900,
-    )
-    return {"cover_letter_text": (resp or "").strip(), "model_meta": meta}
+def extract_requirements_from_jd(job_description: str, use_cache: bool = True) -> Dict[str, Any]:
+    request = _extract_requirements_request(job_description)
+    budget = request.pop("token_budget")
+    resp, meta = ml_service.call_llm(**request, use_cache=use_cache)
+    return {"requirements_text": (resp or "").strip(), "model_meta": meta, "token_budget": budget}
+
+def match_requirements_to_resume(resume_text: str, requirements_text: str, use_cache: bool = True) -> Dict[str, Any]:
+    request = _match_requirements_request(resume_text, requirements_text)
+    budget = request.pop("token_budget")
+    coverage = request.pop("prematch")
+    local = _prematched_mapping(coverage)
+    if local is not None:
+        return local
+    resp, meta = ml_service.call_llm(**request, use_cache=use_cache)
+    result = {"mapping_text": (resp or "").strip(), "model_meta": meta, "token_budget": budget}
+    if coverage is not None:
+        result["prematch"] = coverage.summary()
+    return result
+
+def research_company_via_web(company_name: Optional[str], company_url: Optional[str], min_results: int = 5, use_cache: bool = True) -> Dict[str, Any]:
+    key = company_cache_key(company_name, company_url)
+    if not (use_cache and key and company_cache is not None):
+        return dict(_research_company_uncached(company_name, company_url, min_results), cache_hit=False)
+
+    hit = company_cache.get(key)
+    if hit is not None:
+        return _research_from_cache(hit)
+
+    def _fetch() -> Dict[str, Any]:
+        result = _research_company_uncached(company_name, company_url, min_results)
+        company_cache.set(key, result)
+        return result
+
+    return dict(company_research_flight.do(key, _fetch), cache_hit=False)
+
+def _research_company_uncached(company_name: Optional[str], company_url: Optional[str], min_results: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        resp = get_client().responses.create(**_company_research_request(company_name, company_url, min_results), timeout=ml_service.httpx_timeout())
+    except Exception:
+        metrics.record_llm_error("research_company", WEB_MODEL)
+        raise
+    meta = dict(_company_research_meta(_research_usage(resp), round(time.perf_counter() - started, 3)), cache_hit=False)
+    metrics.record_llm_call(meta)
+    return _company_research_result(resp.output_text or "", meta)
+
+def generate_tailored_resume_text(resume_text: str, mapping_text: str, company_profile_text: str, use_cache: bool = True) -> Dict[str, Any]:
+    request = _tailored_resume_request(resume_text, mapping_text, company_profile_text)
+    budget = request.pop("token_budget")
+    resp, meta = ml_service.call_llm(**request, use_cache=use_cache)
+    return {"tailored_resume_text": (resp or "").strip(), "model_meta": meta, "token_budget": budget}
+
+def generate_cover_letter_text(requirements_text: str, company_profile_text: str, about_me_or_prefs: str, use_cache: bool = True) -> Dict[str, Any]:
+    request = _cover_letter_request(requirements_text, company_profile_text, about_me_or_prefs)
+    budget = request.pop("token_budget")
+    resp, meta = ml_service.call_llm(**request, use_cache=use_cache)
+    return {"cover_letter_text": (resp or "").strip(), "model_meta": meta, "token_budget": budget}
+
+# ---------- async steps ----------
+
+async def aextract_requirements_from_jd(job_description: str, use_cache: bool = True) -> Dict[str, Any]:
+    request = _extract_requirements_request(job_description)
+    budget = request.pop("token_budget")
+    resp, meta = await ml_service.acall_llm(**request, use_cache=use_cache)
+    return {"requirements_text": (resp or "").strip(), "model_meta": meta, "token_budget": budget}
+
+async def amatch_requirements_to_resume(resume_text: str, requirements_text: str, use_cache: bool = True) -> Dict[str, Any]:
+    request = _match_requirements_request(resume_text, requirements_text)
+    budget = request.pop("token_budget")
+    coverage = request.pop("prematch")
+    local = _prematched_mapping(coverage)
+    if local is not None:
+        return local
+    resp, meta = await ml_service.acall_llm(**request, use_cache=use_cache)
+    result = {"mapping_text": (resp or "").strip(), "model_meta": meta, "token_budget": budget}
+    if coverage is not None:
+        result["prematch"] = coverage.summary()
+    return result
+
+async def aresearch_company_via_web(company_name: Optional[str], company_url: Optional[str], min_results: int = 5, use_cache: bool = True) -> Dict[str, Any]:
+    key = company_cache_key(company_name, company_url)
+    if not (use_cache and key and company_cache is not None):
+        return dict(await _aresearch_company_uncached(company_name, company_url, min_results), cache_hit=False)
+
+    hit = await asyncio.to_thread(company_cache.get, key)
+    if hit is not None:
+        return _research_from_cache(hit)
+
+    async def _fetch() -> Dict[str, Any]:
+        result = await _aresearch_company_uncached(company_name, company_url, min_results)
+        await asyncio.to_thread(company_cache.set, key, result)
+        return result
+
+    return dict(await company_research_flight.ado(key, _fetch), cache_hit=False)
+
+async def _aresearch_company_uncached(company_name: Optional[str], company_url: Optional[str], min_results: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        resp = await get_async_client().responses.create(
+            **_company_research_request(company_name, company_url, min_results), timeout=ml_service.httpx_timeout()
+        )
+    except Exception:
+        metrics.record_llm_error("research_company", WEB_MODEL)
+        raise
+    meta = dict(_company_research_meta(_research_usage(resp), round(time.perf_counter() - started, 3)), cache_hit=False)
+    metrics.record_llm_call(meta)
+    return _company_research_result(resp.output_text or "", meta)
+
+async def agenerate_tailored_resume_text(resume_text: str, mapping_text: str, company_profile_text: str, use_cache: bool = True, on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    request = _tailored_resume_request(resume_text, mapping_text, company_profile_text)
+    budget = request.pop("token_budget")
+    resp, meta = await ml_service.acall_llm(**request, use_cache=use_cache, on_delta=on_delta)
+    return {"tailored_resume_text": (resp or "").strip(), "model_meta": meta, "token_budget": budget}
+
+async def agenerate_cover_letter_text(requirements_text: str, company_profile_text: str, about_me_or_prefs: str, use_cache: bool = True, on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    request = _cover_letter_request(requirements_text, company_profile_text, about_me_or_prefs)
+    budget = request.pop("token_budget")
+    resp, meta = await ml_service.acall_llm(**request, use_cache=use_cache, on_delta=on_delta)
+    return {"cover_letter_text": (resp or "").strip(), "model_meta": meta, "token_budget": budget}
 
 # ---------- orchestrator ----------
 
-def run_tailoring_pipeline(
-    *,
+# Step dependency graph: name -> names of the steps whose outputs it consumes.
+# Steps without dependencies start together; the rest start as soon as all of
+# their inputs are available.
+PIPELINE_GRAPH = {
+    "extract_requirements": (),
+    "parse_resume": (),
+    "research_company": (),
+    "match_requirements": ("extract_requirements", "parse_resume"),
+    "tailor_resume": ("parse_resume", "match_requirements", "research_company"),
+    "cover_letter": ("extract_requirements", "research_company"),
+}
+
+def _step_timing(t0: float, start: float, end: float) -> Dict[str, float]:
+    return {
+        "start_s": round(start - t0, 3),
+        "end_s": round(end - t0, 3),
+        "duration_s": round(end - start, 3),
+    }
+
+def _run_step_graph(steps: Dict[str, Any], graph: Dict[str, tuple]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Execute `steps` (name -> callable taking a dict of upstream results) in
+    dependency order on a thread pool. Returns (results, timings); timings are
+    seconds relative to the start of the run. Steps run in a copy of the
+    caller's context, so an llm_deadline() around the call applies to them and
+    DeadlineExceeded is raised once it passes.
+    """
+    results: Dict[str, Any] = {}
+    timings: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    remaining = dict(graph)
+
+    def _timed(name: str, inputs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return steps[name](inputs)
+        finally:
+            timings[name] = _step_timing(t0, start, time.perf_counter())
+            metrics.record_step(name, timings[name]["duration_s"])
+
+    pool = ThreadPoolExecutor(max_workers=len(graph), thread_name_prefix="pipeline")
+    expired = False
+    try:
+        running: Dict[Future, str] = {}
+        while remaining or running:
+            for name, deps in list(remaining.items()):
+                if all(d in results for d in deps):
+                    inputs = {d: results[d] for d in deps}
+                    running[pool.submit(contextvars.copy_context().run, _timed, name, inputs)] = name
+                    del remaining[name]
+            left = time_left()
+            done, _ = wait(running, timeout=None if left is None else max(0.0, left), return_when=FIRST_COMPLETED)
+            if not done:
+                expired = True
+                raise DeadlineExceeded(f"Run deadline exceeded while waiting for {sorted(running.values())}.")
+            for fut in done:
+                name = running.pop(fut)
+                exc = fut.exception()
+                if exc is not None:
+                    for other in running:
+                        other.cancel()
+                    raise exc
+                results[name] = fut.result()
+    finally:
+        # Past the deadline, don't wait for in-flight steps; their calls are
+        # bounded by the same deadline and finish in the background.
+        pool.shutdown(wait=not expired, cancel_futures=True)
+
+    timings["total_s"] = round(time.perf_counter() - t0, 3)
+    timings["critical_path"] = _critical_path(graph, timings)
+    return results, timings
+
+async def _arun_step_graph(
+    steps: Dict[str, Any],
+    graph: Dict[str, tuple],
+    on_event: Optional[Callable[[str, str, Dict[str, Any], Any], None]] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Async counterpart of _run_step_graph; `steps` are coroutine functions.
+    on_event(kind, step, info, result) is called with "step_start" and
+    "step_end"; for step_end, `info` is the step's timings entry (it may be
+    extended) and `result` the step's output.
+    """
+    timings: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def _timed(name: str) -> Any:
+        inputs = {d: await tasks[d] for d in graph[name]}
+        start = time.perf_counter()
+        if on_event:
+            on_event("step_start", name, {}, None)
+        try:
+            result = await steps[name](inputs)
+        finally:
+            timings[name] = _step_timing(t0, start, time.perf_counter())
+            metrics.record_step(name, timings[name]["duration_s"])
+        if on_event:
+            on_event("step_end", name, timings[name], result)
+        return result
+
+    for name in graph:
+        tasks[name] = asyncio.create_task(_timed(name))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+    results = {name: task.result() for name, task in tasks.items()}
+    timings["total_s"] = round(time.perf_counter() - t0, 3)
+    timings["critical_path"] = _critical_path(graph, timings)
+    return results, timings
+
+def _critical_path(graph: Dict[str, tuple], timings: Dict[str, Any]) -> List[str]:
+    # Walk back from the last step to finish through whichever dependency finished last.
+    step_names = [n for n in graph if n in timings]
+    if not step_names:
+        return []
+    node = max(step_names, key=lambda n: timings[n]["end_s"])
+    path = [node]
+    while graph[node]:
+        node = max(graph[node], key=lambda n: timings[n]["end_s"])
+        path.append(node)
+    return list(reversed(path))
+
+# ---------- incremental regeneration ----------
+
+# What each step's output depends on besides its upstream steps: the run
+# inputs it reads, plus its model and prompt so that editing either
+# invalidates old outputs. parse_resume is keyed by the text it produced
+# (a new upload of the same resume changes nothing downstream).
+_STEP_VERSIONS = {
+    "extract_requirements": (EXTRACTION_MODEL, PROMPTS["extract_requirements"][0]),
+    "parse_resume": ("text",),
+    "research_company": (WEB_MODEL, PROMPTS["research_company"][0]),
+    "match_requirements": (MATCH_MODEL, PROMPTS["match_requirements"][0], PREMATCH_ENABLED and PREMATCH_VERSION, PREMATCH_SKIP_LLM and "confident"),
+    "tailor_resume": (RESUME_MODEL, PROMPTS["tailor_resume"][0]),
+    "cover_letter": (COVER_LETTER_MODEL, PROMPTS["cover_letter"][0]),
+}
+
+# Snapshot fields holding each step's output (what a reused step returns).
+_STEP_SNAPSHOT_FIELDS = {
+    "extract_requirements": ("requirements_text",),
+    "match_requirements": ("mapping_text", "prematch"),
+    "research_company": ("company_profile_text", "evidence_links"),
+    "tailor_resume": ("tailored_resume_text",),
+    "cover_letter": ("cover_letter_text",),
+}
+
+def _step_key(name: str, own_inputs: Any, dep_keys: List[str]) -> str:
+    payload = json.dumps([name, _STEP_VERSIONS[name], own_inputs, dep_keys], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _step_own_inputs(
     job_description: str,
-    resume_pdf_bytes: Optional[bytes] = None,
-    resume_text_fallback: Optional[str] = None,
-    company_name: Optional[str] = None,
-    company_url: Optional[str] = None,
-    about_me_or_prefs: str = "",
-    log_path: str = "runs_log.jsonl",
+    company_name: Optional[str],
+    company_url: Optional[str],
+    about_me_or_prefs: str,
 ) -> Dict[str, Any]:
+    return {
+        "extract_requirements": job_description,
+        "parse_resume": None,  # keyed by its output
+        "research_company": company_cache_key(company_name, company_url) or "",
+        "match_requirements": None,
+        "tailor_resume": None,
+        "cover_letter": about_me_or_prefs,
+    }
+
+def _reused_result(name: str, previous: Dict[str, Any]) -> Any:
+    """A step's output rebuilt from a previous snapshot (no model_meta: nothing was called)."""
+    result: Dict[str, Any] = {f: previous.get(f) for f in _STEP_SNAPSHOT_FIELDS[name]}
+    budget = (previous.get("token_budget") or {}).get(name)
+    if budget:
+        result["token_budget"] = budget
+    result["reused"] = True
+    return result
+
+class _StepKeys:
+    """
+    Wraps pipeline steps so each computes its key once its dependencies are
+    done and, when `previous` holds the same key, returns the stored output
+    instead of running. Steps keyed by their output always run.
+    """
+
+    def __init__(self, graph: Dict[str, tuple], own_inputs: Dict[str, Any], previous: Optional[Dict[str, Any]]):
+        self.graph = graph
+        self.own_inputs = own_inputs
+        self.previous_keys = {
+            name: entry.get("key") for name, entry in ((previous or {}).get("steps") or {}).items()
+        }
+        self.previous = previous
+        self.keys: Dict[str, str] = {}
+        self.reused: List[str] = []
 
-    # Step 1
-    step1 = extract_requirements_from_jd(job_description)
+    def _key(self, name: str) -> str:
+        return _step_key(name, self.own_inputs[name], [self.keys[d] for d in self.graph[name]])
 
-    # Step 2 (resume parsing)
+    def _content_key(self, name: str, result: Any) -> str:
+        return _step_key(name, hashlib.sha256(str(result).encode("utf-8")).hexdigest(), [])
+
+    def wrap(self, name: str, fn: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+        def run(r: Dict[str, Any]) -> Any:
+            if self.own_inputs[name] is None and not self.graph[name]:
+                result = fn(r)
+                self.keys[name] = self._content_key(name, result)
+                return result
+            key = self.keys[name] = self._key(name)
+            if self.previous_keys.get(name) == key:
+                self.reused.append(name)
+                return _reused_result(name, self.previous)
+            return fn(r)
+        return run
+
+    def awrap(self, name: str, fn: Callable[[Dict[str, Any]], Awaitable[Any]]) -> Callable[[Dict[str, Any]], Awaitable[Any]]:
+        async def run(r: Dict[str, Any]) -> Any:
+            if self.own_inputs[name] is None and not self.graph[name]:
+                result = await fn(r)
+                self.keys[name] = self._content_key(name, result)
+                return result
+            key = self.keys[name] = self._key(name)
+            if self.previous_keys.get(name) == key:
+                self.reused.append(name)
+                return _reused_result(name, self.previous)
+            return await fn(r)
+        return run
+
+    def snapshot_fields(self) -> Dict[str, Any]:
+        fields: Dict[str, Any] = {
+            "steps": {name: {"key": self.keys.get(name), "reused": name in self.reused} for name in self.graph},
+        }
+        if self.previous is not None:
+            fields["regenerated_from"] = self.previous.get("timestamp")
+            fields["reused_steps"] = [n for n in self.graph if n in self.reused]
+        return fields
+
+def _resolve_resume_text(resume_pdf_bytes: Optional[bytes], resume_text_fallback: Optional[str]) -> str:
     if resume_pdf_bytes:
         resume_text = extract_text_from_pdf_bytes(resume_pdf_bytes)
     else:
         resume_text = (resume_text_fallback or "").strip()
     if not resume_text:
         raise ValueError("No resume text available (supply PDF bytes or fallback text).")
+    return resume_text
 
-    # Step 3
-    step2 = match_requirements_to_resume(resume_text, step1["requirements_text"])
-
-    # Step 4
-    step3 = research_company_via_web(company_name=company_name, company_url=company_url)
-
-    # Step 5
-    step4 = generate_tailored_resume_text(
-        resume_text=resume_text,
-        mapping_text=step2["mapping_text"],
-        company_profile_text=step3["company_profile_text"],
-    )
-
-    # Step 6
-    step5 = generate_cover_letter_text(
-        requirements_text=step1["requirements_text"],
-        company_profile_text=step3["company_profile_text"],
-        about_me_or_prefs=about_me_or_prefs,
-    )
+def _build_snapshot(
+    results: Dict[str, Any],
+    timings: Dict[str, Any],
+    *,
+    job_description: str,
+    company_name: Optional[str],
+    company_url: Optional[str],
+    about_me_or_prefs: str,
+    step_keys: Optional[_StepKeys] = None,
+) -> Dict[str, Any]:
+    resume_text = results["parse_resume"]
+    step1 = results["extract_requirements"]
+    step2 = results["match_requirements"]
+    step3 = results["research_company"]
+    step4 = results["tailor_resume"]
+    step5 = results["cover_letter"]
 
-    snapshot = {
+    return {
         "timestamp": _now_iso(),
         "inputs": {
             "job_description": job_description,
@@ -194,11 +709,336 @@ def run_tailoring_pipeline(
         "resume_text_excerpt": resume_text[:4000],
         "requirements_text": step1["requirements_text"],
         "mapping_text": step2["mapping_text"],
+        # local coverage table: requirement, status, score, evidence lines
+        "prematch": step2.get("prematch"),
         "company_profile_text": step3["company_profile_text"],
         "tailored_resume_text": step4["tailored_resume_text"],
         "cover_letter_text": step5["cover_letter_text"],
         "evidence_links": step3.get("evidence_links", []),
+        "timings": timings,
+        # per step and input: tokens before/after budgeting and what was cut
+        "token_budget": {
+            name: results[name]["token_budget"]
+            for name in ("extract_requirements", "match_requirements", "tailor_resume", "cover_letter")
+            if results[name].get("token_budget")
+        },
+        # per step: wall time, tokens, cost, cache hit, retries and waits
+        "metrics": metrics.run_metrics(results, timings),
+        # full parsed resume, so a regeneration can reuse it without a new upload
+        "resume_text": resume_text,
+        **(step_keys.snapshot_fields() if step_keys is not None else {}),
+    }
+
+# Fields of step results forwarded to on_event listeners.
+_STEP_OUTPUT_FIELDS = (
+    "requirements_text",
+    "mapping_text",
+    "company_profile_text",
+    "evidence_links",
+    "tailored_resume_text",
+    "cover_letter_text",
+)
+
+def run_tailoring_pipeline(
+    *,
+    job_description: str,
+    resume_pdf_bytes: Optional[bytes] = None,
+    resume_text_fallback: Optional[str] = None,
+    company_name: Optional[str] = None,
+    company_url: Optional[str] = None,
+    about_me_or_prefs: str = "",
+    log_path: str = "runs_log.jsonl",
+    use_cache: bool = True,
+    history_store: Optional[HistoryStore] = None,
+    previous: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Run every step and save the snapshot. With `previous` (an earlier
+    snapshot), steps whose inputs are unchanged reuse its outputs; the new
+    snapshot lists them under "reused_steps".
+    """
+    if not resume_pdf_bytes and not (resume_text_fallback or "").strip():
+        raise ValueError("No resume text available (supply PDF bytes or fallback text).")
+
+    step_keys = _StepKeys(
+        PIPELINE_GRAPH,
+        _step_own_inputs(job_description, company_name, company_url, about_me_or_prefs),
+        previous,
+    )
+    steps = {
+        "extract_requirements": lambda r: extract_requirements_from_jd(job_description, use_cache=use_cache),
+        "parse_resume": lambda r: _resolve_resume_text(resume_pdf_bytes, resume_text_fallback),
+        "research_company": lambda r: research_company_via_web(company_name=company_name, company_url=company_url, use_cache=use_cache),
+        "match_requirements": lambda r: match_requirements_to_resume(
+            r["parse_resume"], r["extract_requirements"]["requirements_text"], use_cache=use_cache
+        ),
+        "tailor_resume": lambda r: generate_tailored_resume_text(
+            resume_text=r["parse_resume"],
+            mapping_text=r["match_requirements"]["mapping_text"],
+            company_profile_text=r["research_company"]["company_profile_text"],
+            use_cache=use_cache,
+        ),
+        "cover_letter": lambda r: generate_cover_letter_text(
+            requirements_text=r["extract_requirements"]["requirements_text"],
+            company_profile_text=r["research_company"]["company_profile_text"],
+            about_me_or_prefs=about_me_or_prefs,
+            use_cache=use_cache,
+        ),
     }
-    save_snapshot_jsonl(snapshot, path=log_path)
+    steps = {name: step_keys.wrap(name, fn) for name, fn in steps.items()}
+    t0 = time.perf_counter()
+    try:
+        with llm_deadline(PIPELINE_DEADLINE_SECONDS):
+            results, timings = _run_step_graph(steps, PIPELINE_GRAPH)
+    except Exception as e:
+        metrics.record_run(time.perf_counter() - t0, status="deadline_exceeded" if isinstance(e, DeadlineExceeded) else "failed")
+        raise
+    metrics.record_run(timings["total_s"])
+
+    snapshot = _build_snapshot(
+        results, timings,
+        job_description=job_description,
+        company_name=company_name,
+        company_url=company_url,
+        about_me_or_prefs=about_me_or_prefs,
+        step_keys=step_keys,
+    )
+    _save_snapshot(snapshot, log_path, history_store)
 
     return snapshot
+
+async def arun_tailoring_pipeline(
+    *,
+    job_description: str,
+    resume_pdf_bytes: Optional[bytes] = None,
+    resume_text_fallback: Optional[str] = None,
+    company_name: Optional[str] = None,
+    company_url: Optional[str] = None,
+    about_me_or_prefs: str = "",
+    log_path: str = "runs_log.jsonl",
+    use_cache: bool = True,
+    history_store: Optional[HistoryStore] = None,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    research_company: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None,
+    previous: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Async variant of run_tailoring_pipeline: LLM calls share the pooled async
+    client and CPU/file work runs in a worker thread, so the event loop stays
+    free to serve other requests.
+
+    If `on_event` is given it receives progress events as they happen:
+      {"event": "step_start", "step"}
+      {"event": "delta", "step", "text"}        tailored resume / cover letter tokens
+      {"event": "step_end", "step", "start_s", "end_s", "duration_s", "ttfb_s", "output"}
+    ttfb_s (step start to first output) is also stored in the snapshot timings.
+
+    `research_company` overrides the company research step (batch mode passes
+    a lookup shared by every posting at the same company).
+
+    With `previous` (an earlier snapshot), steps whose inputs are unchanged
+    reuse its outputs instead of running; see run_tailoring_pipeline.
+    """
+    if not resume_pdf_bytes and not (resume_text_fallback or "").strip():
+        raise ValueError("No resume text available (supply PDF bytes or fallback text).")
+
+    step_started: Dict[str, float] = {}
+    first_output: Dict[str, float] = {}
+
+    def _graph_event(kind: str, step: str, info: Dict[str, Any], result: Any) -> None:
+        now = time.perf_counter()
+        if kind == "step_start":
+            step_started[step] = now
+        else:
+            info["ttfb_s"] = round(first_output.get(step, now) - step_started[step], 3)
+        if on_event:
+            event = {"event": kind, "step": step, **info}
+            if isinstance(result, dict):  # step text outputs; the parsed resume is not echoed back
+                event["output"] = {k: v for k, v in result.items() if k in _STEP_OUTPUT_FIELDS}
+            on_event(event)
+
+    def _delta(step: str) -> Optional[Callable[[str], None]]:
+        if on_event is None:
+            return None
+
+        def _emit(text: str) -> None:
+            first_output.setdefault(step, time.perf_counter())
+            on_event({"event": "delta", "step": step, "text": text})
+        return _emit
+
+    async def _extract(r):
+        return await aextract_requirements_from_jd(job_description, use_cache=use_cache)
+
+    async def _parse(r):
+        return await asyncio.to_thread(_resolve_resume_text, resume_pdf_bytes, resume_text_fallback)
+
+    async def _research(r):
+        if research_company is not None:
+            return await research_company()
+        return await aresearch_company_via_web(company_name=company_name, company_url=company_url, use_cache=use_cache)
+
+    async def _match(r):
+        return await amatch_requirements_to_resume(
+            r["parse_resume"], r["extract_requirements"]["requirements_text"], use_cache=use_cache
+        )
+
+    async def _tailor(r):
+        return await agenerate_tailored_resume_text(
+            resume_text=r["parse_resume"],
+            mapping_text=r["match_requirements"]["mapping_text"],
+            company_profile_text=r["research_company"]["company_profile_text"],
+            use_cache=use_cache,
+            on_delta=_delta("tailor_resume"),
+        )
+
+    async def _cover(r):
+        return await agenerate_cover_letter_text(
+            requirements_text=r["extract_requirements"]["requirements_text"],
+            company_profile_text=r["research_company"]["company_profile_text"],
+            about_me_or_prefs=about_me_or_prefs,
+            use_cache=use_cache,
+            on_delta=_delta("cover_letter"),
+        )
+
+    steps = {
+        "extract_requirements": _extract,
+        "parse_resume": _parse,
+        "research_company": _research,
+        "match_requirements": _match,
+        "tailor_resume": _tailor,
+        "cover_letter": _cover,
+    }
+    step_keys = _StepKeys(
+        PIPELINE_GRAPH,
+        _step_own_inputs(job_description, company_name, company_url, about_me_or_prefs),
+        previous,
+    )
+    steps = {name: step_keys.awrap(name, fn) for name, fn in steps.items()}
+    t0 = time.perf_counter()
+    try:
+        with llm_deadline(PIPELINE_DEADLINE_SECONDS):
+            try:
+                results, timings = await asyncio.wait_for(
+                    _arun_step_graph(steps, PIPELINE_GRAPH, on_event=_graph_event),
+                    PIPELINE_DEADLINE_SECONDS if PIPELINE_DEADLINE_SECONDS > 0 else None,
+                )
+            except asyncio.TimeoutError as e:
+                left = time_left()
+                if isinstance(e, DeadlineExceeded) or left is None or left > 0:
+                    raise
+                raise DeadlineExceeded(f"Run exceeded its {PIPELINE_DEADLINE_SECONDS:g}s deadline.") from None
+    except BaseException as e:
+        status = "failed"
+        if isinstance(e, asyncio.CancelledError):
+            status = "cancelled"
+        elif isinstance(e, DeadlineExceeded):
+            status = "deadline_exceeded"
+        metrics.record_run(time.perf_counter() - t0, status=status)
+        raise
+    metrics.record_run(timings["total_s"])
+
+    snapshot = _build_snapshot(
+        results, timings,
+        job_description=job_description,
+        company_name=company_name,
+        company_url=company_url,
+        about_me_or_prefs=about_me_or_prefs,
+        step_keys=step_keys,
+    )
+    await asyncio.to_thread(_save_snapshot, snapshot, log_path, history_store)
+
+    return snapshot
+
+# ---------- batch ----------
+
+async def arun_batch_pipeline(
+    *,
+    items: List[Dict[str, Any]],
+    resume_pdf_bytes: Optional[bytes] = None,
+    resume_text_fallback: Optional[str] = None,
+    about_me_or_prefs: str = "",
+    log_path: str = "runs_log.jsonl",
+    use_cache: bool = True,
+    history_store: Optional[HistoryStore] = None,
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    on_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Tailor one resume to many postings.
+
+    Each item is {"job_description", "company_url"?, "company_name"?, "about_me"?}.
+    The resume is parsed once, at most `max_concurrency` postings run at a
+    time, and company research is shared by all postings at the same company
+    (same key as the company cache). Every item runs the normal pipeline and
+    lands in history on its own; one failing posting does not fail the batch.
+
+    Returns {"items": [{"index", "status": "succeeded"|"failed", "result"|"error"}],
+             "summary": {...}} with items in input order. `on_item` receives each
+    item entry as it finishes.
+    """
+    t0 = time.perf_counter()
+    resume_text = await asyncio.to_thread(_resolve_resume_text, resume_pdf_bytes, resume_text_fallback)
+
+    shared_research: Dict[str, asyncio.Future] = {}
+
+    def _research_for(item: Dict[str, Any]) -> Callable[[], Awaitable[Dict[str, Any]]]:
+        name, url = item.get("company_name"), item.get("company_url")
+        key = company_cache_key(name, url) or "unknown"
+
+        async def _lookup() -> Dict[str, Any]:
+            fut = shared_research.get(key)
+            if fut is None:
+                fut = shared_research[key] = asyncio.ensure_future(
+                    aresearch_company_via_web(company_name=name, company_url=url, use_cache=use_cache)
+                )
+            # shield: a failing posting must not cancel research other postings wait on
+            return await asyncio.shield(fut)
+        return _lookup
+
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _one(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        async with sem:
+            try:
+                if not (item.get("job_description") or "").strip():
+                    raise ValueError("job_description is required")
+                snapshot = await arun_tailoring_pipeline(
+                    job_description=item["job_description"],
+                    resume_text_fallback=resume_text,
+                    company_name=item.get("company_name"),
+                    company_url=item.get("company_url"),
+                    about_me_or_prefs=item.get("about_me") or about_me_or_prefs,
+                    log_path=log_path,
+                    use_cache=use_cache,
+                    history_store=history_store,
+                    research_company=_research_for(item),
+                )
+                entry = {"index": index, "status": "succeeded", "result": snapshot}
+            except Exception as e:
+                entry = {"index": index, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+        if on_item:
+            on_item(entry)
+        return entry
+
+    entries = await asyncio.gather(*(_one(i, it) for i, it in enumerate(items)))
+
+    succeeded = sum(1 for e in entries if e["status"] == "succeeded")
+    return {
+        "items": list(entries),
+        "summary": {
+            "total": len(entries),
+            "succeeded": succeeded,
+            "failed": len(entries) - succeeded,
+            "unique_companies": len(shared_research),
+            "duration_s": round(time.perf_counter() - t0, 3),
+        },
+    }
+
+def run_batch_pipeline(**kwargs) -> Dict[str, Any]:
+    """Blocking wrapper around arun_batch_pipeline (scripts, CLI)."""
+    async def _run():
+        try:
+            return await arun_batch_pipeline(**kwargs)
+        finally:
+            await aclose_clients()
+    return asyncio.run(_run())
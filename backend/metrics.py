@@ -0,0 +1,233 @@
+# metrics.py
+"""
+In-process metrics with Prometheus text exposition (served at /api/metrics).
+
+Counters and histograms are labelled and thread-safe; no external client
+library is needed. Upstream LLM calls are recorded from their model_meta
+(record_llm_call), steps and runs by the pipeline (record_step, record_run), and
+run_metrics() builds the per-run summary stored in the snapshot.
+"""
+
+import math
+import threading
+from typing import Dict, Any, List, Tuple, Callable
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60)
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_value(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not float(v).is_integer() else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # key -> bucket counts..., sum, count
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                for i, upper in enumerate(self.buckets):
+                    le = 'le="' + _fmt_value(upper) + '"'
+                    lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {_fmt_value(s[i])}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(round(s[-2], 6))}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {_fmt_value(s[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[Tuple[str, str, Dict[str, str], float]]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        m = Counter(*args, **kwargs)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        m = Histogram(*args, **kwargs)
+        self._metrics.append(m)
+        return m
+
+    def add_collector(self, fn: Callable[[], List[Tuple[str, str, Dict[str, str], float]]]) -> None:
+        """fn() -> [(name, help, labels, value)] gauges sampled at scrape time."""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        seen = set()
+        for fn in self._collectors:
+            try:
+                samples = fn()
+            except Exception as e:
+                print(f"[metrics] collector failed: {e}")
+                continue
+            for name, help_text, labels, value in samples:
+                if name not in seen:
+                    seen.add(name)
+                    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                names = tuple(labels)
+                lines.append(f"{name}{_fmt_labels(names, tuple(labels[n] for n in names))} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STEP_SECONDS = registry.histogram("jobbuddy_step_duration_seconds", "Pipeline step wall time.", ("step",))
+RUN_SECONDS = registry.histogram("jobbuddy_pipeline_duration_seconds", "Whole pipeline run wall time.")
+RUNS = registry.counter("jobbuddy_pipeline_runs_total", "Pipeline runs by outcome.", ("status",))
+
+LLM_CALL_SECONDS = registry.histogram("jobbuddy_llm_call_duration_seconds", "Upstream call wall time incl. waits and retries.", ("call_type", "model"))
+LLM_QUEUE_WAIT_SECONDS = registry.histogram("jobbuddy_llm_queue_wait_seconds", "Time spent waiting for rate-limit budget.", ("call_type", "model"), WAIT_BUCKETS)
+LLM_RETRY_WAIT_SECONDS = registry.histogram("jobbuddy_llm_retry_wait_seconds", "Time spent in retry backoff.", ("call_type", "model"), WAIT_BUCKETS)
+LLM_CALLS = registry.counter("jobbuddy_llm_calls_total", "Upstream calls by outcome and response-cache result.", ("call_type", "model", "status", "cache"))
+LLM_RETRIES = registry.counter("jobbuddy_llm_retries_total", "Retried upstream attempts.", ("call_type", "model"))
+LLM_TOKENS = registry.counter("jobbuddy_llm_tokens_total", "Tokens by kind (prompt, completion, cached_prompt).", ("call_type", "model", "kind"))
+LLM_HEDGES = registry.counter("jobbuddy_llm_hedges_total", "Hedged requests: fired, won by the hedge, losers cancelled or abandoned (left to finish).", ("call_type", "model", "outcome"))
+LLM_ROUTING = registry.counter("jobbuddy_llm_routing_total", "Model routing decisions by the model finally used and why.", ("call_type", "model", "reason"))
+LLM_COST = registry.counter("jobbuddy_llm_cost_usd_total", "Estimated upstream cost in USD.", ("call_type", "model"))
+
+
+# ---------- recording ----------
+
+def _tokens(usage: Dict[str, Any]) -> Dict[str, int]:
+    """Chat (prompt/completion) or Responses (input/output) usage -> common keys."""
+    usage = usage or {}
+    prompt = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+    completion = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
+    details = usage.get("prompt_tokens_details") or usage.get("input_tokens_details") or {}
+    return {"prompt": prompt, "completion": completion, "cached_prompt": details.get("cached_tokens", 0) or 0}
+
+def record_llm_call(meta: Dict[str, Any]) -> None:
+    call_type, model = meta.get("type", "llm_call"), meta.get("model", "")
+    cache = "hit" if meta.get("cache_hit") else "miss"
+    LLM_CALLS.inc(call_type=call_type, model=model, status="ok", cache=cache)
+    if meta.get("cache_hit"):
+        return
+    if meta.get("latency_s") is not None:
+        LLM_CALL_SECONDS.observe(meta["latency_s"], call_type=call_type, model=model)
+    LLM_QUEUE_WAIT_SECONDS.observe(meta.get("queue_wait_s", 0.0), call_type=call_type, model=model)
+    LLM_RETRY_WAIT_SECONDS.observe(meta.get("retry_wait_s", 0.0), call_type=call_type, model=model)
+    if meta.get("retries"):
+        LLM_RETRIES.inc(meta["retries"], call_type=call_type, model=model)
+    for kind, n in _tokens(meta.get("usage")).items():
+        if n:
+            LLM_TOKENS.inc(n, call_type=call_type, model=model, kind=kind)
+    LLM_COST.inc(meta.get("cost", 0.0) or 0.0, call_type=call_type, model=model)
+
+def record_llm_error(call_type: str, model: str) -> None:
+    LLM_CALLS.inc(call_type=call_type, model=model, status="error", cache="miss")
+
+def record_hedge(call_type: str, model: str, outcome: str) -> None:
+    LLM_HEDGES.inc(call_type=call_type, model=model, outcome=outcome)
+
+def record_routing(call_type: str, model: str, reason: str) -> None:
+    LLM_ROUTING.inc(call_type=call_type, model=model, reason=reason)
+
+def record_step(step: str, duration_s: float) -> None:
+    STEP_SECONDS.observe(duration_s, step=step)
+
+def record_run(duration_s: float, status: str = "succeeded") -> None:
+    RUNS.inc(status=status)
+    RUN_SECONDS.observe(duration_s)
+
+
+# ---------- per-run summary (stored in the snapshot) ----------
+
+def run_metrics(results: Dict[str, Any], timings: Dict[str, Any]) -> Dict[str, Any]:
+    steps: Dict[str, Any] = {}
+    totals = {"prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0, "cost": 0.0,
+              "retries": 0, "queue_wait_s": 0.0, "retry_wait_s": 0.0, "cache_hits": 0, "llm_calls": 0, "hedged": 0}
+    for name, result in results.items():
+        t = timings.get(name) if isinstance(timings.get(name), dict) else {}
+        entry: Dict[str, Any] = {"duration_s": t.get("duration_s")}
+        meta = result.get("model_meta") if isinstance(result, dict) else None
+        if isinstance(result, dict) and result.get("reused"):
+            entry["reused"] = True  # output carried over from an earlier run
+        if isinstance(result, dict) and (result.get("prematch") or {}).get("skipped_llm"):
+            entry["prematched"] = True  # answered by the local pre-match, no LLM call
+        if meta:
+            tok = _tokens(meta.get("usage"))
+            entry.update({
+                "model": meta.get("model"),
+                "latency_s": meta.get("latency_s"),
+                "queue_wait_s": meta.get("queue_wait_s", 0.0),
+                "retry_wait_s": meta.get("retry_wait_s", 0.0),
+                "retries": meta.get("retries", 0),
+                "prompt_tokens": tok["prompt"],
+                "completion_tokens": tok["completion"],
+                "cached_prompt_tokens": tok["cached_prompt"],
+                "cost": meta.get("cost", 0.0),
+                "cache_hit": bool(meta.get("cache_hit")),
+                "hedged": bool(meta.get("hedged")),
+            })
+            totals["llm_calls"] += 1
+            totals["cache_hits"] += 1 if meta.get("cache_hit") else 0
+            totals["hedged"] += 1 if meta.get("hedged") else 0
+            totals["prompt_tokens"] += tok["prompt"]
+            totals["completion_tokens"] += tok["completion"]
+            totals["cached_prompt_tokens"] += tok["cached_prompt"]
+            totals["cost"] += meta.get("cost", 0.0) or 0.0
+            totals["retries"] += meta.get("retries", 0) or 0
+            totals["queue_wait_s"] += meta.get("queue_wait_s", 0.0) or 0.0
+            totals["retry_wait_s"] += meta.get("retry_wait_s", 0.0) or 0.0
+        steps[name] = entry
+
+    totals["cost"] = round(totals["cost"], 6)
+    totals["queue_wait_s"] = round(totals["queue_wait_s"], 3)
+    totals["retry_wait_s"] = round(totals["retry_wait_s"], 3)
+    timed = [(e["duration_s"], n) for n, e in steps.items() if e.get("duration_s") is not None]
+    return {
+        "steps": steps,
+        "totals": totals,
+        "slowest_step": max(timed)[1] if timed else None,
+    }
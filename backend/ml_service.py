@@ -3,29 +3,546 @@ import json
 import time
 import re
 import base64
+import asyncio
+import weakref
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
 import requests
+import httpx
 import tiktoken
+from typing import Optional, Callable, Dict, Any
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from constants import (
+    OPENAI_BASE_URL, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS, HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS,
+    HEDGE_ENABLED, HEDGE_CALL_TYPES, HEDGE_QUANTILE, HEDGE_MIN_SAMPLES, HEDGE_MIN_DELAY_SECONDS,
+    LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_MEMORY_ENTRIES, LLM_CACHE_MAX_DISK_ENTRIES,
+    RATE_LIMIT_ENABLED, RATE_LIMIT_RPM, RATE_LIMIT_TPM, RATE_LIMITS,
+    ROUTING_ENABLED,
+)
+from llm_cache import ResponseCache, make_cache_key
+from rate_limiter import RateLimiter
+from model_router import ModelRouter, RoutingPlan
+import metrics
+
 load_dotenv()
 
+RETRIABLE_STATUSES = (429, 500, 502, 503, 504)
+FALLBACK_STATUSES = RETRIABLE_STATUSES + (404,)  # 404: model not available to this key
+
+
+def _parse_stream_line(line: str) -> Optional[dict]:
+    """Decode one `data: {...}` line of a streamed completion (None for keep-alives/[DONE])."""
+    if not line or not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == "[DONE]":
+        return None
+    return json.loads(data)
+
+
+def _retry_wait(status: int, headers, body: str, backoff: float) -> float:
+    """Seconds to wait before retrying a retriable HTTP status."""
+    if status != 429:
+        return backoff
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        return float(retry_after) + 1.0
+    m = re.search(r"try again in ([\d.]+) seconds", body)
+    return (float(m.group(1)) + 1.0) if m else backoff
+
+
+def _used_tokens(usage: Optional[dict]) -> Optional[int]:
+    """Tokens a call used, from its `usage` block (None if unknown)."""
+    usage = usage or {}
+    used = usage.get("total_tokens")
+    if used is None and "prompt_tokens" in usage:
+        used = usage["prompt_tokens"] + usage.get("completion_tokens", 0)
+    return used
+
+
+_shared_rate_limiter = None
+
+def shared_rate_limiter() -> Optional[RateLimiter]:
+    """Process-wide limiter: upstream limits are per API key, not per MLService."""
+    global _shared_rate_limiter
+    if _shared_rate_limiter is None and RATE_LIMIT_ENABLED:
+        _shared_rate_limiter = RateLimiter(RATE_LIMIT_RPM, RATE_LIMIT_TPM, RATE_LIMITS)
+    return _shared_rate_limiter
+
+
+# ---------- deadlines ----------
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("llm_deadline", default=None)
+
+@contextmanager
+def llm_deadline(seconds: Optional[float]):
+    """
+    Bound every LLM call made in this context (threads need copy_context,
+    asyncio tasks inherit it): per-attempt timeouts are clamped to the time
+    left, and no attempt or retry starts once it has run out.
+    """
+    if not seconds or seconds <= 0:
+        yield
+        return
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def time_left() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+# ---------- hedging ----------
+
+class LatencyWindow:
+    """Recent successful attempt latencies per (model, call_type)."""
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, model: str, call_type: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault((model, call_type), deque(maxlen=self.size)).append(seconds)
+
+    def quantile(self, model: str, call_type: str, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get((model, call_type), ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
 
 class MLService:
-    def __init__(self, model_name: str = "gpt-4o-mini"):
+    def __init__(self, model_name: str = "gpt-4o-mini", cache: ResponseCache = None, rate_limiter: RateLimiter = None,
+                 router: ModelRouter = None):
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY is not set.")
         self.model = model_name
-        self.encoding = tiktoken.encoding_for_model(model_name)
+        # tiktoken may download or unpack its BPE file; load on first use or in warm_up().
+        self._encoding = None
+        self._encoding_lock = threading.Lock()
+        self._encoding_failed = False  # offline without a cached BPE file: estimate instead
+        self.base_url = OPENAI_BASE_URL.rstrip("/")
+
+        # Pooled keep-alive connections for the blocking client.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_MAX_CONNECTIONS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Response cache shared by call_llm / acall_llm (None disables caching).
+        if cache is None and LLM_CACHE_ENABLED:
+            cache = ResponseCache(
+                LLM_CACHE_PATH,
+                ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                max_memory_entries=LLM_CACHE_MAX_MEMORY_ENTRIES,
+                max_disk_entries=LLM_CACHE_MAX_DISK_ENTRIES,
+            )
+        self.cache = cache
+
+        # Requests wait their turn for RPM/TPM budget instead of hitting 429s.
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+
+        # Per-call model choice from the call_type's tier list, with fallback
+        # to the next model when the chosen one is saturated or failing.
+        if router is None and ROUTING_ENABLED:
+            router = ModelRouter(self.rate_limiter)
+        self.router = router
+
+        # OpenAI prompt-cache reuse (usage.prompt_tokens_details.cached_tokens) per call_type.
+        self._prompt_cache_lock = threading.Lock()
+        self._prompt_cache = {}
+
+        # The async client is bound to the event loop it was created on, so one
+        # is built lazily per loop (the API loop, background job loops).
+        self._async_clients = weakref.WeakKeyDictionary()
+
+        # Hedged requests: a duplicate is sent once an attempt outlives the
+        # observed HEDGE_QUANTILE latency; the first response wins.
+        self.hedge_enabled = HEDGE_ENABLED
+        self.latencies = LatencyWindow()
+        # Blocking hedges get their own session, so a loser that has to run to
+        # completion does not hold one of the primary pool's connections.
+        self._hedge_pool = None
+        self._hedge_session = None
+        self._hedge_lock = threading.Lock()
+        self._hedge_stats = {"fired": 0, "won": 0, "cancelled": 0, "abandoned": 0}
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            with self._encoding_lock:
+                if self._encoding is None:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+        return self._encoding
+
+    # ---------- warm-up ----------
+
+    def warm_up(self, connect: bool = True, cache_entries: int = 0) -> Dict[str, Any]:
+        """
+        Pay first-request costs up front: load the token encoding, preload
+        the response cache and (with `connect`) open a pooled connection to
+        the upstream. Returns per-part seconds; failures are reported, not raised.
+        """
+        parts: Dict[str, Any] = {}
+
+        def timed(name: str, fn: Callable[[], Any]) -> None:
+            t = time.perf_counter()
+            try:
+                fn()
+                parts[name] = round(time.perf_counter() - t, 3)
+            except Exception as e:
+                parts[name] = f"error: {type(e).__name__}: {e}"
+
+        timed("encoding", lambda: self.encoding)
+        if self.cache is not None and cache_entries:
+            timed("llm_cache", lambda: self.cache.preload(cache_entries))
+        if connect:
+            timed("http_pool", lambda: self.session.get(f"{self.base_url}/models", headers=self._headers(),
+                                                         timeout=self.timeouts()).close())
+        return parts
+
+    async def awarm_up(self) -> Dict[str, Any]:
+        """Open the running loop's pooled async connection (see warm_up)."""
+        t = time.perf_counter()
+        try:
+            await self._get_async_client().get("/models")
+        except Exception as e:
+            return {"async_http_pool": f"error: {type(e).__name__}: {e}"}
+        return {"async_http_pool": round(time.perf_counter() - t, 3)}
 
     def count_tokens(self, text: str) -> int:
-        return len(self.encoding.encode(text))
+        if not self._encoding_failed:
+            try:
+                return len(self.encoding.encode(text))
+            except Exception as e:
+                self._encoding_failed = True
+                print(f"[ml_service] token encoding unavailable ({type(e).__name__}: {e}); estimating 4 chars/token")
+        return (len(text) + 3) // 4
+
+    def _estimate_tokens(self, messages: list, max_tokens: int) -> int:
+        """Upper-bound TPM cost of a request: prompt tokens + completion budget."""
+        prompt = 0
+        for m in messages:
+            content = m.get("content")
+            if isinstance(content, list):  # multimodal parts
+                content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+            prompt += 4 + self.count_tokens(content or "")
+        return prompt + max_tokens
+
+    def _observe_limits(self, model: str, headers) -> None:
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_headers(model, headers)
+
+    def _settle(self, model: str, reserved: Optional[int], meta: dict) -> None:
+        if self.rate_limiter is None or reserved is None:
+            return
+        self.rate_limiter.settle(model, reserved, _used_tokens(meta.get("usage")))
+
+    def _release(self, model: str, reserved: Optional[int]) -> None:
+        if self.rate_limiter is not None and reserved is not None:
+            self.rate_limiter.release(model, reserved)
+
+    # ---------- timeouts / hedging ----------
+
+    @staticmethod
+    def timeouts(extra_wait: float = 0.0):
+        """(connect, read) seconds for the next attempt, clamped to the run deadline."""
+        connect, read = HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS
+        left = time_left()
+        if left is not None:
+            left -= extra_wait
+            if left <= 0:
+                raise DeadlineExceeded("Run deadline exceeded before the LLM call could start.")
+            connect, read = min(connect, left), min(read, left)
+        return connect, read
+
+    @classmethod
+    def httpx_timeout(cls) -> httpx.Timeout:
+        connect, read = cls.timeouts()
+        return httpx.Timeout(connect=connect, read=read, write=read, pool=read)
+
+    def _hedge_delay(self, model: str, call_type: str) -> Optional[float]:
+        if not self.hedge_enabled or (HEDGE_CALL_TYPES and call_type not in HEDGE_CALL_TYPES):
+            return None
+        p = self.latencies.quantile(model, call_type, HEDGE_QUANTILE, HEDGE_MIN_SAMPLES)
+        return None if p is None else max(HEDGE_MIN_DELAY_SECONDS, p)
+
+    def _count_hedge(self, outcome: str, call_type: str, model: str) -> None:
+        with self._hedge_lock:
+            self._hedge_stats[outcome] += 1
+        metrics.record_hedge(call_type, model, outcome)
+
+    def hedge_stats(self) -> dict:
+        with self._hedge_lock:
+            return dict(self._hedge_stats, enabled=self.hedge_enabled)
+
+    def _post(self, payload: dict, model: str, call_type: str, estimate: int, hedge: dict):
+        """POST /chat/completions, hedged after the p95 latency when enabled (blocking)."""
+        timeout = self.timeouts()
+
+        def send(session):
+            return session.post(f"{self.base_url}/chat/completions", headers=self._headers(), json=payload, timeout=timeout)
+
+        reservation = {}  # the hedge's own rate-limit reservation, settled by _settle_hedge
+
+        def send_hedge():
+            if self.rate_limiter:
+                reservation["tokens"] = self.rate_limiter.acquire(model, estimate)
+            if reservation.get("abandoned"):
+                return None  # the first request answered while the hedge waited for budget
+            return send(self._hedge_session)
+
+        delay = self._hedge_delay(model, call_type)
+        started = time.perf_counter()
+        if delay is None:
+            response = send(self.session)
+        else:
+            self._ensure_hedge_pool()
+            first = self._hedge_pool.submit(send, self.session)
+            done, _ = wait_futures([first], timeout=delay)
+            if done:
+                response = first.result()
+            else:
+                second = self._hedge_pool.submit(send_hedge)
+                hedge["hedged"] = True
+                self._count_hedge("fired", call_type, model)
+                try:
+                    response = self._first_result([first, second], hedge, call_type, model)
+                finally:
+                    reservation["abandoned"] = True
+                    # The caller settles its own reservation with the winner's usage;
+                    # the hedge's reservation pays for the loser once it finishes.
+                    loser = first if hedge.get("hedge_won") else second
+                    loser.add_done_callback(lambda f: self._settle_hedge(model, reservation, f))
+        if response.ok:
+            self.latencies.record(model, call_type, time.perf_counter() - started)
+        return response
+
+    def _ensure_hedge_pool(self) -> None:
+        with self._hedge_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(HTTP_MAX_CONNECTIONS, thread_name_prefix="hedge")
+                self._hedge_session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_MAX_CONNECTIONS)
+                self._hedge_session.mount("https://", adapter)
+                self._hedge_session.mount("http://", adapter)
+
+    def _settle_hedge(self, model: str, reservation: dict, loser) -> None:
+        """Settle a blocking hedge's reservation with what the losing request used."""
+        reserved = reservation.get("tokens")
+        if self.rate_limiter is None or reserved is None:
+            return
+        used = 0
+        if not loser.cancelled() and loser.exception() is None and loser.result() is not None:
+            try:
+                used = _used_tokens(loser.result().json().get("usage")) or 0
+            except ValueError:
+                used = 0
+        self.rate_limiter.settle(model, reserved, used)
+
+    def _first_result(self, futures: list, hedge: dict, call_type: str, model: str):
+        pending, error = set(futures), None
+        while pending:
+            done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    for other in pending:
+                        # a blocking request cannot be interrupted: it runs to completion
+                        # and its result is dropped (cancel() only stops one not yet started)
+                        self._count_hedge("cancelled" if other.cancel() else "abandoned", call_type, model)
+                    if fut is futures[1]:
+                        hedge["hedge_won"] = True
+                        self._count_hedge("won", call_type, model)
+                    return fut.result()
+                error = error or fut.exception()
+        raise error
+
+    async def _apost(self, client: httpx.AsyncClient, payload: dict, model: str, call_type: str, estimate: int, hedge: dict):
+        """Async _post; the losing request is cancelled."""
+        timeout = self.httpx_timeout()
+
+        async def send_hedge():
+            reserved = await self.rate_limiter.aacquire(model, estimate) if self.rate_limiter else None
+            try:
+                return await client.post("/chat/completions", json=payload, timeout=timeout)
+            finally:
+                # The caller settles its reservation with the winner's usage; the
+                # loser is cancelled, so the hedge's reservation goes back whole.
+                self._release(model, reserved)
+
+        delay = self._hedge_delay(model, call_type)
+        started = time.perf_counter()
+        if delay is None:
+            response = await client.post("/chat/completions", json=payload, timeout=timeout)
+        else:
+            first = asyncio.ensure_future(client.post("/chat/completions", json=payload, timeout=timeout))
+            tasks = [first]
+            try:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if done:
+                    response = first.result()
+                else:
+                    tasks.append(asyncio.ensure_future(send_hedge()))
+                    hedge["hedged"] = True
+                    self._count_hedge("fired", call_type, model)
+                    response = await self._afirst_result(tasks, hedge, call_type, model)
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+                        self._count_hedge("cancelled", call_type, model)
+        if response.is_success:
+            self.latencies.record(model, call_type, time.perf_counter() - started)
+        return response
+
+    async def _afirst_result(self, tasks: list, hedge: dict, call_type: str, model: str):
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is tasks[1]:
+                        hedge["hedge_won"] = True
+                        self._count_hedge("won", call_type, model)
+                    return task.result()
+                error = error or task.exception()
+        raise error
 
     def base64_image(self, image_path: str) -> str:
         """Helper to convert image file to base64 string."""
         with open(image_path, "rb") as f:
             return base64.b64encode(f.read()).decode("utf-8")
 
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def _payload(self, messages: list, model: str, temperature: float, max_tokens: int, response_format: str) -> dict:
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        if response_format != "text":
+            payload["response_format"] = {"type": response_format}
+        return payload
+
+    def _meta(self, usage: dict, model: str, call_type: str) -> dict:
+        self._record_prompt_cache(call_type, usage)
+        return {
+            "type": call_type,
+            "model": model,
+            "usage": usage,
+            "cost": self.calculate_text_model_cost(usage, model)
+        }
+
+    def _parse_result(self, result: dict, model: str, call_type: str):
+        content = result["choices"][0]["message"]["content"]
+        return content, self._meta(result.get("usage", {}), model, call_type)
+
+    def _record_prompt_cache(self, call_type: str, usage: dict) -> None:
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        with self._prompt_cache_lock:
+            c = self._prompt_cache.setdefault(call_type, {"calls": 0, "calls_with_hits": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            c["calls"] += 1
+            c["calls_with_hits"] += 1 if cached_tokens else 0
+            c["prompt_tokens"] += prompt_tokens
+            c["cached_tokens"] += cached_tokens
+
+    def prompt_cache_stats(self) -> dict:
+        """Per call_type share of prompt tokens served from OpenAI's prompt cache."""
+        with self._prompt_cache_lock:
+            out = {k: dict(v) for k, v in self._prompt_cache.items()}
+        for c in out.values():
+            c["hit_rate"] = round(c["cached_tokens"] / c["prompt_tokens"], 4) if c["prompt_tokens"] else 0.0
+        return out
+
+    @staticmethod
+    def _call_timing(started: float, waits: dict, retries: int) -> dict:
+        """Wall time of the whole call and how much of it was spent waiting."""
+        return {
+            "latency_s": round(time.perf_counter() - started, 3),
+            "queue_wait_s": round(waits["queue"], 3),
+            "retry_wait_s": round(waits["retry"], 3),
+            "retries": retries,
+        }
+
+    @staticmethod
+    def _stream_payload(payload: dict) -> dict:
+        return dict(payload, stream=True, stream_options={"include_usage": True})
+
+    def _cache_key(self, use_cache: bool, messages: list, model: str, temperature: float, max_tokens: int, response_format: str):
+        if not use_cache or self.cache is None:
+            return None
+        return make_cache_key(model, messages, temperature, max_tokens, response_format)
+
+    @staticmethod
+    def _from_cache(hit: dict, call_type: str, on_delta=None):
+        # timings of the original call do not apply to a cache hit
+        meta = dict(hit["meta"], type=call_type, cost=0.0, cache_hit=True,
+                    latency_s=0.0, queue_wait_s=0.0, retry_wait_s=0.0, retries=0, hedged=False, hedge_won=False)
+        if on_delta is not None and hit["content"]:
+            on_delta(hit["content"])
+        return hit["content"], meta
+
+    # ---------- routing ----------
+
+    def _route(self, call_type: str, model: str, messages: list, max_tokens: int) -> Optional[RoutingPlan]:
+        if self.router is None:
+            return None
+        input_tokens = self._estimate_tokens(messages, 0)
+        return self.router.plan(call_type, model, input_tokens, max_tokens)
+
+    @staticmethod
+    def _can_fall_back(error: Exception) -> bool:
+        """Upstream trouble another model may not share (not bad requests or the run deadline)."""
+        if isinstance(error, (requests.exceptions.HTTPError, httpx.HTTPStatusError)):
+            return error.response is not None and error.response.status_code in FALLBACK_STATUSES
+        return isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                                  httpx.TimeoutException, httpx.NetworkError))
+
+    def _routing_failed(self, plan: Optional[RoutingPlan], model: str, call_type: str, error: Exception,
+                        is_last: bool, streamed: list) -> bool:
+        """Record a failed attempt; True if the call should move on to the next model."""
+        if plan is None or not self._can_fall_back(error):
+            return False
+        self.router.observe(model, call_type, None, ok=False)
+        plan.failed(model, error)
+        if is_last or streamed:  # partial output already reached the caller
+            return False
+        print(f"[{call_type}] {model} failed ({type(error).__name__}); falling back to the next model in the tier")
+        return True
+
+    @staticmethod
+    def _relay(on_delta, streamed: list):
+        if on_delta is None:
+            return None
+
+        def relay(text):
+            streamed.append(True)
+            on_delta(text)
+        return relay
+
     def call_llm(
         self,
         messages: list,
@@ -35,62 +552,91 @@ class MLService:
         response_format: str = "text",
         call_type: str = "llm_call",
         max_retries: int = 3,
+        use_cache: bool = True,
+        on_delta: Optional[Callable[[str], None]] = None,
     ):
+        """
+        Chat Completions call with retry/backoff and response caching.
+        With `on_delta`, the response is streamed and each content chunk is
+        passed to on_delta as it arrives (model_meta then includes ttft_s).
+        """
         model = model or self.model
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        cache_key = self._cache_key(use_cache, messages, model, temperature, max_tokens, response_format)
+        if cache_key:
+            hit = self.cache.get(cache_key)
+            if hit is not None:
+                content, meta = self._from_cache(hit, call_type, on_delta)
+                metrics.record_llm_call(meta)
+                return content, meta
 
-        payload = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-        }
+        plan = self._route(call_type, model, messages, max_tokens)
+        candidates = plan.order if plan else [model]
+        streamed = []
+        for i, used in enumerate(candidates):
+            try:
+                content, meta = self._call_llm_uncached(
+                    messages, used, temperature, max_tokens, response_format, call_type, max_retries,
+                    on_delta=self._relay(on_delta, streamed),
+                )
+                break
+            except Exception as e:
+                metrics.record_llm_error(call_type, used)
+                if self._routing_failed(plan, used, call_type, e, i == len(candidates) - 1, streamed):
+                    continue
+                raise
+        if plan is not None:
+            self.router.observe(used, call_type, meta["latency_s"] - meta["queue_wait_s"] - meta["retry_wait_s"], ok=True)
+            meta["routing"] = plan.used(used)
+        if cache_key:
+            # a fallback answer is cached under its own model so the preferred one is tried again next time
+            if used != model:
+                cache_key = self._cache_key(use_cache, messages, used, temperature, max_tokens, response_format)
+            self.cache.set(cache_key, {"content": content, "meta": meta})
+        meta = dict(meta, cache_hit=False)
+        metrics.record_llm_call(meta)
+        return content, meta
 
-        if response_format != "text":
-            payload["response_format"] = {"type": response_format}
+    def _call_llm_uncached(self, messages, model, temperature, max_tokens, response_format, call_type, max_retries, on_delta=None):
+        payload = self._payload(messages, model, temperature, max_tokens, response_format)
+        emitted = []  # set once a chunk reached on_delta; such calls cannot be retried
+        estimate = self._estimate_tokens(messages, max_tokens) if self.rate_limiter else 0
+        started, waits = time.perf_counter(), {"queue": 0.0, "retry": 0.0}
+        hedge = {}  # "hedged" / "hedge_won" flags for model_meta
 
         backoff = 2.0
         for attempt in range(1, max_retries + 2):
             try:
-                response = requests.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
-                response.raise_for_status()
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                usage = result.get("usage", {})
-
-                return content, {
-                    "type": call_type,
-                    "model": model,
-                    "usage": usage,
-                    "cost": self.calculate_text_model_cost(usage, model)
-                }
+                t = time.perf_counter()
+                reserved = self.rate_limiter.acquire(model, estimate) if self.rate_limiter else None
+                waits["queue"] += time.perf_counter() - t
+                try:
+                    if on_delta is not None:
+                        content, meta = self._stream_once(payload, model, call_type, on_delta, emitted)
+                    else:
+                        response = self._post(payload, model, call_type, estimate, hedge)
+                        self._observe_limits(model, response.headers)
+                        response.raise_for_status()
+                        content, meta = self._parse_result(response.json(), model, call_type)
+                except BaseException:
+                    self._release(model, reserved)  # a failed attempt must not keep its budget
+                    raise
+                self._settle(model, reserved, meta)
+                meta.update(self._call_timing(started, waits, attempt - 1), **hedge)
+                return content, meta
 
             except requests.exceptions.HTTPError as e:
                 status = e.response.status_code
                 body = e.response.text or ""
-                retry_after = e.response.headers.get("Retry-After")
-                retriable = (status == 429) or (status in (500, 502, 503, 504))
-
-                if retriable and attempt <= max_retries:
-                    if status == 429:
-                        if retry_after:
-                            wait_sec = float(retry_after) + 1.0
-                        else:
-                            import re
-                            m = re.search(r"try again in ([\d.]+) seconds", body)
-                            wait_sec = (float(m.group(1)) + 1.0) if m else backoff
-                    else:
-                        wait_sec = backoff
 
+                if status in RETRIABLE_STATUSES and attempt <= max_retries and not emitted:
+                    wait_sec = _retry_wait(status, e.response.headers, body, backoff)
+                    self.timeouts(extra_wait=wait_sec)  # DeadlineExceeded if the retry could not start in time
                     print(f"[{call_type}] HTTP {status}. Retrying in {wait_sec:.2f}s... [Attempt {attempt}/{max_retries}]")
-                    time.sleep(wait_sec)
+                    if status == 429 and self.rate_limiter is not None:
+                        self.rate_limiter.pause(model, wait_sec)  # the retry waits in line with everyone else
+                    else:
+                        time.sleep(wait_sec)
+                        waits["retry"] += wait_sec
                     backoff = min(backoff * 2, 30.0)
                     continue
 
@@ -99,9 +645,193 @@ class MLService:
                 raise
 
             except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-                if attempt <= max_retries:
+                if attempt <= max_retries and not emitted:
+                    self.timeouts(extra_wait=backoff)
                     print(f"[{call_type}] Network error: {e}. Retrying in {backoff:.2f}s... [Attempt {attempt}/{max_retries}]")
                     time.sleep(backoff)
+                    waits["retry"] += backoff
+                    backoff = min(backoff * 2, 30.0)
+                    continue
+                print(f"[{call_type}] Network error, no more retries: {e}")
+                raise
+
+            except Exception as e:
+                print(f"[{call_type}] Unexpected error: {e}")
+                raise
+
+    def _stream_once(self, payload: dict, model: str, call_type: str, on_delta, emitted: list):
+        start = time.perf_counter()
+        with self.session.post(
+            f"{self.base_url}/chat/completions",
+            headers=self._headers(),
+            json=self._stream_payload(payload),
+            stream=True,
+            timeout=self.timeouts(),
+        ) as response:
+            self._observe_limits(model, response.headers)
+            response.raise_for_status()
+            parts, usage, ttft = [], {}, None
+            for line in response.iter_lines(decode_unicode=True):
+                chunk = _parse_stream_line(line)
+                if chunk is None:
+                    continue
+                usage = chunk.get("usage") or usage
+                for choice in chunk.get("choices") or []:
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                        parts.append(text)
+                        emitted.append(True)
+                        on_delta(text)
+        meta = self._meta(usage, model, call_type)
+        meta["ttft_s"] = round(ttft, 3) if ttft is not None else None
+        return "".join(parts), meta
+
+    # ---------- batch API ----------
+
+    def batch_request(self, custom_id: str, messages: list, model: str = None, temperature: float = 0.7,
+                      max_tokens: int = 500, response_format: str = "text", **_):
+        """One Batch API input line carrying the request call_llm would send."""
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": self._payload(messages, model or self.model, temperature, max_tokens, response_format),
+        }
+
+    def parse_batch_response(self, body: dict, model: str, call_type: str):
+        content, meta = self._parse_result(body, model, call_type)
+        # Batch API requests are billed at half the synchronous price.
+        return content, dict(meta, cost=round(meta["cost"] / 2, 6), batch=True, cache_hit=False)
+
+    # ---------- async ----------
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._async_clients[loop] = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._headers(),
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(connect=HTTP_CONNECT_TIMEOUT_SECONDS, read=HTTP_READ_TIMEOUT_SECONDS,
+                                      write=HTTP_READ_TIMEOUT_SECONDS, pool=HTTP_READ_TIMEOUT_SECONDS),
+            )
+        return client
+
+    async def aclose(self) -> None:
+        """Close the running loop's pooled async client (call before the loop ends)."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def acall_llm(
+        self,
+        messages: list,
+        model: str = None,
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        response_format: str = "text",
+        call_type: str = "llm_call",
+        max_retries: int = 3,
+        use_cache: bool = True,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ):
+        """Non-blocking counterpart of call_llm sharing one pooled keep-alive client."""
+        model = model or self.model
+        cache_key = self._cache_key(use_cache, messages, model, temperature, max_tokens, response_format)
+        if cache_key:
+            hit = await asyncio.to_thread(self.cache.get, cache_key)
+            if hit is not None:
+                content, meta = self._from_cache(hit, call_type, on_delta)
+                metrics.record_llm_call(meta)
+                return content, meta
+
+        plan = self._route(call_type, model, messages, max_tokens)
+        candidates = plan.order if plan else [model]
+        streamed = []
+        for i, used in enumerate(candidates):
+            try:
+                content, meta = await self._acall_llm_uncached(
+                    messages, used, temperature, max_tokens, response_format, call_type, max_retries,
+                    on_delta=self._relay(on_delta, streamed),
+                )
+                break
+            except Exception as e:
+                metrics.record_llm_error(call_type, used)
+                if self._routing_failed(plan, used, call_type, e, i == len(candidates) - 1, streamed):
+                    continue
+                raise
+        if plan is not None:
+            self.router.observe(used, call_type, meta["latency_s"] - meta["queue_wait_s"] - meta["retry_wait_s"], ok=True)
+            meta["routing"] = plan.used(used)
+        if cache_key:
+            if used != model:
+                cache_key = self._cache_key(use_cache, messages, used, temperature, max_tokens, response_format)
+            await asyncio.to_thread(self.cache.set, cache_key, {"content": content, "meta": meta})
+        meta = dict(meta, cache_hit=False)
+        metrics.record_llm_call(meta)
+        return content, meta
+
+    async def _acall_llm_uncached(self, messages, model, temperature, max_tokens, response_format, call_type, max_retries, on_delta=None):
+        payload = self._payload(messages, model, temperature, max_tokens, response_format)
+        client = self._get_async_client()
+        emitted = []
+        estimate = self._estimate_tokens(messages, max_tokens) if self.rate_limiter else 0
+        started, waits = time.perf_counter(), {"queue": 0.0, "retry": 0.0}
+        hedge = {}  # "hedged" / "hedge_won" flags for model_meta
+
+        backoff = 2.0
+        for attempt in range(1, max_retries + 2):
+            try:
+                t = time.perf_counter()
+                reserved = await self.rate_limiter.aacquire(model, estimate) if self.rate_limiter else None
+                waits["queue"] += time.perf_counter() - t
+                try:
+                    if on_delta is not None:
+                        content, meta = await self._astream_once(client, payload, model, call_type, on_delta, emitted)
+                    else:
+                        response = await self._apost(client, payload, model, call_type, estimate, hedge)
+                        self._observe_limits(model, response.headers)
+                        response.raise_for_status()
+                        content, meta = self._parse_result(response.json(), model, call_type)
+                except BaseException:
+                    self._release(model, reserved)  # a failed attempt must not keep its budget
+                    raise
+                self._settle(model, reserved, meta)
+                meta.update(self._call_timing(started, waits, attempt - 1), **hedge)
+                return content, meta
+
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                body = e.response.text or ""
+
+                if status in RETRIABLE_STATUSES and attempt <= max_retries and not emitted:
+                    wait_sec = _retry_wait(status, e.response.headers, body, backoff)
+                    self.timeouts(extra_wait=wait_sec)  # DeadlineExceeded if the retry could not start in time
+                    print(f"[{call_type}] HTTP {status}. Retrying in {wait_sec:.2f}s... [Attempt {attempt}/{max_retries}]")
+                    if status == 429 and self.rate_limiter is not None:
+                        self.rate_limiter.pause(model, wait_sec)
+                    else:
+                        await asyncio.sleep(wait_sec)
+                        waits["retry"] += wait_sec
+                    backoff = min(backoff * 2, 30.0)
+                    continue
+
+                print(f"[{call_type}] HTTPError {status}: {body[:500]}")
+                raise
+
+            except (httpx.TimeoutException, httpx.NetworkError) as e:
+                if attempt <= max_retries and not emitted:
+                    self.timeouts(extra_wait=backoff)
+                    print(f"[{call_type}] Network error: {e}. Retrying in {backoff:.2f}s... [Attempt {attempt}/{max_retries}]")
+                    await asyncio.sleep(backoff)
+                    waits["retry"] += backoff
                     backoff = min(backoff * 2, 30.0)
                     continue
                 print(f"[{call_type}] Network error, no more retries: {e}")
@@ -111,20 +841,48 @@ class MLService:
                 print(f"[{call_type}] Unexpected error: {e}")
                 raise
 
+    async def _astream_once(self, client: httpx.AsyncClient, payload: dict, model: str, call_type: str, on_delta, emitted: list):
+        start = time.perf_counter()
+        async with client.stream("POST", "/chat/completions", json=self._stream_payload(payload), timeout=self.httpx_timeout()) as response:
+            self._observe_limits(model, response.headers)
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            parts, usage, ttft = [], {}, None
+            async for line in response.aiter_lines():
+                chunk = _parse_stream_line(line)
+                if chunk is None:
+                    continue
+                usage = chunk.get("usage") or usage
+                for choice in chunk.get("choices") or []:
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                        parts.append(text)
+                        emitted.append(True)
+                        on_delta(text)
+        meta = self._meta(usage, model, call_type)
+        meta["ttft_s"] = round(ttft, 3) if ttft is not None else None
+        return "".join(parts), meta
+
     def calculate_text_model_cost(self, usage: dict, model_name: str) -> float:
         pricing = {
             "gpt-4o-mini": {"prompt": 0.15, "prompt_cached": 0.075, "completion": 0.60},
             "gpt-4o": {"prompt": 2.50, "prompt_cached": 1.25, "completion": 10.00},
             "gpt-4.1-mini": {"prompt": 0.40, "prompt_cached": 0.10, "completion": 1.60},
+            "gpt-4.1": {"prompt": 2.00, "prompt_cached": 0.50, "completion": 8.00},
         }
 
         if model_name not in pricing:
             return 0.0
 
-        prompt_tokens = usage.get("prompt_tokens", 0)
-        cached_tokens = usage.get("prompt_tokens_details", {}).get("cached_tokens", 0)
+        # Chat Completions usage (prompt/completion) or Responses usage (input/output)
+        prompt_tokens = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+        details = usage.get("prompt_tokens_details") or usage.get("input_tokens_details") or {}
+        cached_tokens = details.get("cached_tokens", 0) or 0
         live_prompt = prompt_tokens - cached_tokens
-        completion_tokens = usage.get("completion_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
 
         p = pricing[model_name]
         cost = (
@@ -0,0 +1,181 @@
+# model_router.py
+"""
+Per-call model routing with fallback tiers.
+
+Each call_type has a tier list, preferred model first (DEFAULT_TIERS, or
+MODEL_TIERS from the environment, which also replaces the model the caller
+asked for). For every call the router walks the tier and takes the first
+model that:
+
+  - fits the input: prompt tokens + max_tokens within its context window
+  - has rate-limit headroom: the estimated queue wait for this request on
+    the shared RateLimiter is under ROUTING_MAX_QUEUE_WAIT_SECONDS
+  - is responsive: its observed latency (EWMA per model and call_type) is
+    under ROUTING_MAX_LATENCY_SECONDS
+  - is not cooling down after ROUTING_FAILURE_THRESHOLD consecutive failures
+
+If no model qualifies, the one with the shortest estimated wait is used.
+When a call still fails on the chosen model, MLService falls back to the
+next candidates in order. Every decision is returned as a dict stored in
+model_meta["routing"].
+"""
+
+import time
+import threading
+from typing import Optional, Dict, Any, List
+
+from constants import (
+    MODEL_TIERS,
+    ROUTING_MAX_QUEUE_WAIT_SECONDS, ROUTING_MAX_LATENCY_SECONDS,
+    ROUTING_FAILURE_THRESHOLD, ROUTING_COOLDOWN_SECONDS,
+)
+import metrics
+
+# Tried after the model the caller asked for, in order.
+DEFAULT_TIERS: Dict[str, List[str]] = {
+    "extract_requirements": ["gpt-4.1-mini"],
+    "match_requirements": ["gpt-4.1-mini"],
+    "tailor_resume": ["gpt-4.1-mini", "gpt-4o-mini"],
+    "cover_letter": ["gpt-4.1-mini"],
+}
+
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4.1-mini": 1_047_576,
+}
+
+
+class RoutingPlan:
+    """Candidate order for one call plus the record that ends up in model_meta."""
+
+    def __init__(self, call_type: str, requested: str, order: List[str], decision: Dict[str, Any]):
+        self.call_type = call_type
+        self.requested = requested
+        self.order = order
+        self.decision = decision
+
+    def failed(self, model: str, error: BaseException) -> None:
+        self.decision["fallbacks"].append({"model": model, "error": f"{type(error).__name__}: {str(error)[:200]}"})
+
+    def used(self, model: str) -> Dict[str, Any]:
+        self.decision["model"] = model
+        if model != self.order[0]:
+            self.decision["reason"] = "fallback_after_error"
+        metrics.record_routing(self.call_type, model, self.decision["reason"])
+        return dict(self.decision)
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        rate_limiter=None,
+        tiers: Optional[Dict[str, List[str]]] = None,
+        overrides: Optional[Dict[str, List[str]]] = None,
+        max_queue_wait: float = ROUTING_MAX_QUEUE_WAIT_SECONDS,
+        max_latency: float = ROUTING_MAX_LATENCY_SECONDS,
+        failure_threshold: int = ROUTING_FAILURE_THRESHOLD,
+        cooldown: float = ROUTING_COOLDOWN_SECONDS,
+    ):
+        self.rate_limiter = rate_limiter
+        self.tiers = DEFAULT_TIERS if tiers is None else tiers
+        self.overrides = MODEL_TIERS if overrides is None else overrides
+        self.max_queue_wait = max_queue_wait
+        self.max_latency = max_latency
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._latency: Dict[tuple, float] = {}   # (model, call_type) -> EWMA seconds
+        self._failures: Dict[str, int] = {}      # model -> consecutive failures
+        self._cool_until: Dict[str, float] = {}  # model -> monotonic time
+
+    def tier(self, call_type: str, requested: str) -> List[str]:
+        if call_type in self.overrides:
+            return list(dict.fromkeys(self.overrides[call_type]))
+        return list(dict.fromkeys([requested] + self.tiers.get(call_type, [])))
+
+    # ---------- feedback ----------
+
+    def observe(self, model: str, call_type: str, latency_s: Optional[float], ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._failures[model] = 0
+                if latency_s is not None:
+                    prev = self._latency.get((model, call_type))
+                    self._latency[(model, call_type)] = latency_s if prev is None else 0.8 * prev + 0.2 * latency_s
+                return
+            self._failures[model] = self._failures.get(model, 0) + 1
+            if self._failures[model] >= self.failure_threshold:
+                self._cool_until[model] = time.monotonic() + self.cooldown
+                self._failures[model] = 0
+                print(f"[router] {model} failed {self.failure_threshold}x in a row; cooling down {self.cooldown:g}s")
+
+    # ---------- routing ----------
+
+    @staticmethod
+    def _fits(model: str, tokens: int) -> bool:
+        return tokens <= CONTEXT_WINDOWS.get(model, tokens)
+
+    def _skip_reason(self, model: str, call_type: str, input_tokens: int, max_tokens: int) -> Optional[str]:
+        if not self._fits(model, input_tokens + max_tokens):
+            return f"context: {input_tokens + max_tokens} > {CONTEXT_WINDOWS[model]} tokens"
+        with self._lock:
+            cool = self._cool_until.get(model, 0.0) - time.monotonic()
+            latency = self._latency.get((model, call_type))
+        if cool > 0:
+            return f"cooling_down: {cool:.0f}s left"
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.estimated_wait(model, input_tokens + max_tokens)
+            if wait > self.max_queue_wait:
+                return f"saturated: ~{wait:.1f}s rate-limit wait"
+        if latency is not None and latency > self.max_latency:
+            return f"slow: {latency:.1f}s observed"
+        return None
+
+    def plan(self, call_type: str, requested: str, input_tokens: int, max_tokens: int) -> RoutingPlan:
+        candidates = self.tier(call_type, requested)
+        fits = [m for m in candidates if self._fits(m, input_tokens + max_tokens)]
+        skipped: List[Dict[str, str]] = []
+        chosen = None
+        for model in candidates:
+            reason = self._skip_reason(model, call_type, input_tokens, max_tokens)
+            if reason is None:
+                chosen = model
+                break
+            skipped.append({"model": model, "reason": reason})
+
+        if chosen is None:
+            # Everything is busy: least-bad option is the shortest expected wait
+            # among models the input fits.
+            pool = fits or candidates
+            if self.rate_limiter is not None:
+                chosen = min(pool, key=lambda m: self.rate_limiter.estimated_wait(m, input_tokens + max_tokens))
+            else:
+                chosen = pool[0]
+            why = "all_constrained"
+        elif chosen == candidates[0]:
+            why = "preferred"
+        else:
+            why = skipped[-1]["reason"].split(":", 1)[0]
+
+        # Fallback order: the chosen model, then the rest of the tier that fits.
+        order = [chosen] + [m for m in fits if m != chosen]
+        decision = {
+            "requested": requested,
+            "tier": candidates,
+            "model": chosen,
+            "reason": why,
+            "skipped": skipped,
+            "input_tokens": input_tokens,
+            "fallbacks": [],
+        }
+        return RoutingPlan(call_type, requested, order, decision)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "latency_ewma_s": {f"{m}/{c}": round(v, 3) for (m, c), v in self._latency.items()},
+                "cooling_down": {m: round(t - now, 1) for m, t in self._cool_until.items() if t > now},
+            }
@@ -0,0 +1,424 @@
+# offline_batch.py
+"""
+Offline bulk tailoring through the OpenAI Batch API.
+
+Collects the requests the interactive pipeline would send for many postings
+into JSONL batch files, submits them, polls until they finish and joins the
+outputs back into normal pipeline snapshots (saved to history like any run).
+
+The pipeline's dependencies make this three batch rounds:
+  1. extract_requirements (+ company research, one per company)
+  2. match_requirements, cover_letter   (need requirements / company profile)
+  3. tailor_resume                      (needs the requirement mapping)
+
+Chat steps go to /v1/chat/completions, company research to /v1/responses;
+each endpoint gets its own batch since a batch targets a single endpoint.
+Responses already in the LLM / company caches are reused and never batched,
+and batch outputs are written back to those caches.
+
+Progress lives in <workdir>/state.json, so re-running the same command after
+an interruption resumes polling instead of resubmitting. The state records a
+hash of the inputs; a workdir is refused for a different resume or postings.
+
+Usage:
+  python offline_batch.py run --resume resume.pdf --items postings.json --workdir batch_runs/nightly
+  (postings.json: [{"job_description": ..., "company_url": ..., "company_name": ...}, ...])
+"""
+
+import io
+import sys
+import json
+import hashlib
+import time
+import argparse
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from openai import OpenAI
+
+import main
+from main import (
+    ml_service,
+    company_cache,
+    company_cache_key,
+    _extract_requirements_request,
+    _match_requirements_request,
+    _prematched_mapping,
+    _tailored_resume_request,
+    _cover_letter_request,
+    _company_research_request,
+    _company_research_result,
+    _company_research_meta,
+    _research_from_cache,
+    _resolve_resume_text,
+    _build_snapshot,
+    _save_snapshot,
+)
+from llm_cache import make_cache_key
+from prematcher import Coverage
+import metrics
+from history_store import HistoryStore
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+RESPONSES_ENDPOINT = "/v1/responses"
+TERMINAL_BATCH_STATUSES = ("completed", "failed", "expired", "cancelled")
+MAX_REQUESTS_PER_BATCH = 50000
+
+STAGES = (
+    ("extract_requirements", "research_company"),
+    ("match_requirements", "cover_letter"),
+    ("tailor_resume",),
+)
+
+# step -> (text field in the step result, request builder from (item, resume_text, results))
+_CHAT_STEPS = {
+    "extract_requirements": ("requirements_text", lambda it, resume, r: _extract_requirements_request(it["job_description"])),
+    "match_requirements": ("mapping_text", lambda it, resume, r: _match_requirements_request(
+        resume, r["extract_requirements"]["requirements_text"])),
+    "cover_letter": ("cover_letter_text", lambda it, resume, r: _cover_letter_request(
+        r["extract_requirements"]["requirements_text"], r["research_company"]["company_profile_text"],
+        it.get("about_me") or "")),
+    "tailor_resume": ("tailored_resume_text", lambda it, resume, r: _tailored_resume_request(
+        resume, r["match_requirements"]["mapping_text"], r["research_company"]["company_profile_text"])),
+}
+
+
+# ---------- helpers ----------
+
+def _chat_args(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Request builder output with call_llm's defaults filled in."""
+    return {"temperature": 0.7, "response_format": "text", **request}
+
+def _chat_result(field: str, content: Optional[str], meta: Dict[str, Any], args: Dict[str, Any], coverage: Optional[Coverage]) -> Dict[str, Any]:
+    result = {field: (content or "").strip(), "model_meta": meta, "token_budget": args["token_budget"]}
+    if coverage is not None:
+        result["prematch"] = coverage.summary()
+    return result
+
+def _chat_cache_key(args: Dict[str, Any]) -> str:
+    return make_cache_key(args["model"], args["messages"], args["temperature"], args["max_tokens"], args["response_format"])
+
+def _company_key(item: Dict[str, Any]) -> str:
+    return company_cache_key(item.get("company_name"), item.get("company_url")) or "unknown"
+
+def _response_output_text(body: Dict[str, Any]) -> str:
+    """Concatenated output_text of a raw Responses API object."""
+    parts = []
+    for out in body.get("output", []):
+        if out.get("type") != "message":
+            continue
+        for c in out.get("content", []):
+            if c.get("type") == "output_text":
+                parts.append(c.get("text", ""))
+    return "".join(parts)
+
+def _inputs_hash(items: List[Dict[str, Any]], resume_text: str) -> str:
+    payload = json.dumps({"items": items, "resume": resume_text}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _write_jsonl(path: Path, lines: List[Dict[str, Any]]) -> bytes:
+    data = "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in lines).encode("utf-8")
+    path.write_bytes(data)
+    return data
+
+
+# ---------- runner ----------
+
+class OfflineBatchRun:
+    def __init__(
+        self,
+        items: List[Dict[str, Any]],
+        resume_text: str,
+        workdir: Path,
+        client: Optional[OpenAI] = None,
+        use_cache: bool = True,
+        poll_interval: float = 60.0,
+        completion_window: str = "24h",
+    ):
+        self.items = items
+        self.resume_text = resume_text
+        self.workdir = Path(workdir)
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self.client = client or main.get_client()
+        self.use_cache = use_cache
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+
+        self.state_path = self.workdir / "state.json"
+        inputs = _inputs_hash(items, resume_text)
+        if self.state_path.exists():
+            self.state = json.loads(self.state_path.read_text())
+            if self.state.get("inputs") != inputs:
+                raise ValueError(f"{self.workdir} holds a batch run for different inputs; use a new workdir")
+        else:
+            self.state = {"inputs": inputs, "stages": {}}
+
+        self.results: List[Dict[str, Any]] = [{"parse_resume": resume_text} for _ in items]
+        self.errors: Dict[int, str] = {}
+        self.companies: Dict[str, Dict[str, Any]] = {}  # company key -> research result
+        self.company_errors: Dict[str, str] = {}
+        self.stage_timings: Dict[str, Dict[str, Any]] = {}
+
+    def _save_state(self) -> None:
+        tmp = self.state_path.with_name("state.json.tmp")
+        tmp.write_text(json.dumps(self.state, indent=2))
+        tmp.replace(self.state_path)
+
+    # ---------- building requests ----------
+
+    def _collect(self, stage_no: int, steps: Tuple[str, ...]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Any]]:
+        """
+        Batch input lines per endpoint for one stage. Cache hits are applied
+        directly; returns (lines_by_endpoint, pending) where pending maps
+        custom_id -> what to do with the response.
+        """
+        lines: Dict[str, List[Dict[str, Any]]] = {CHAT_ENDPOINT: [], RESPONSES_ENDPOINT: []}
+        pending: Dict[str, Any] = {}
+
+        for step in steps:
+            if step == "research_company":
+                for i, item in enumerate(self.items):
+                    key = _company_key(item)
+                    custom_id = f"company:{key}"
+                    if key in self.companies or custom_id in pending:
+                        continue
+                    hit = company_cache.get(key) if (self.use_cache and company_cache is not None and key != "unknown") else None
+                    if hit is not None:
+                        self.companies[key] = _research_from_cache(hit)
+                        continue
+                    body = _company_research_request(item.get("company_name"), item.get("company_url"), 5)
+                    lines[RESPONSES_ENDPOINT].append({"custom_id": custom_id, "method": "POST", "url": RESPONSES_ENDPOINT, "body": body})
+                    pending[custom_id] = ("company", key)
+                continue
+
+            field, build = _CHAT_STEPS[step]
+            for i, item in enumerate(self.items):
+                if i in self.errors:
+                    continue
+                args = _chat_args(build(item, self.resume_text, self.results[i]))
+                coverage = args.pop("prematch", None)
+                local = _prematched_mapping(coverage)
+                if local is not None:
+                    self.results[i][step] = local
+                    continue
+                cache_key = _chat_cache_key(args) if (self.use_cache and ml_service.cache is not None) else None
+                hit = ml_service.cache.get(cache_key) if cache_key else None
+                if hit is not None:
+                    content, meta = ml_service._from_cache(hit, args["call_type"])
+                    self.results[i][step] = _chat_result(field, content, meta, args, coverage)
+                    continue
+                custom_id = f"{i}:{step}"
+                lines[CHAT_ENDPOINT].append(ml_service.batch_request(custom_id, **args))
+                pending[custom_id] = ("chat", i, step, field, args, cache_key, coverage)
+
+        return {ep: ls for ep, ls in lines.items() if ls}, pending
+
+    # ---------- submit / poll ----------
+
+    def _submit(self, stage_no: int, lines_by_endpoint: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+        batch_ids = []
+        for endpoint, lines in lines_by_endpoint.items():
+            for part, start in enumerate(range(0, len(lines), MAX_REQUESTS_PER_BATCH)):
+                chunk = lines[start:start + MAX_REQUESTS_PER_BATCH]
+                name = f"stage{stage_no}_{endpoint.rsplit('/', 1)[-1]}_{part}.jsonl"
+                data = _write_jsonl(self.workdir / name, chunk)
+                f = self.client.files.create(file=(name, io.BytesIO(data)), purpose="batch")
+                b = self.client.batches.create(
+                    input_file_id=f.id,
+                    endpoint=endpoint,
+                    completion_window=self.completion_window,
+                    metadata={"job_buddy_stage": str(stage_no)},
+                )
+                print(f"[offline_batch] stage {stage_no}: submitted {len(chunk)} requests to {endpoint} as {b.id}")
+                batch_ids.append(b.id)
+        return batch_ids
+
+    def _wait(self, stage_no: int, batch_ids: List[str]) -> List[Any]:
+        while True:
+            batches = [self.client.batches.retrieve(bid) for bid in batch_ids]
+            if all(b.status in TERMINAL_BATCH_STATUSES for b in batches):
+                return batches
+            summary = ", ".join(
+                f"{b.id}={b.status}" + (f" {b.request_counts.completed}/{b.request_counts.total}" if b.request_counts else "")
+                for b in batches
+            )
+            print(f"[offline_batch] stage {stage_no}: waiting ({summary})")
+            time.sleep(self.poll_interval)
+
+    def _outputs(self, batches: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """custom_id -> output line, from both output and error files."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for b in batches:
+            for file_id in (b.output_file_id, b.error_file_id):
+                if not file_id:
+                    continue
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        rec = json.loads(line)
+                        out[rec["custom_id"]] = rec
+            if b.status != "completed":
+                print(f"[offline_batch] batch {b.id} ended as {b.status}")
+        return out
+
+    # ---------- joining results ----------
+
+    def _apply(self, pending: Dict[str, Any], outputs: Dict[str, Dict[str, Any]]) -> None:
+        for custom_id, target in pending.items():
+            rec = outputs.get(custom_id)
+            response = (rec or {}).get("response") or {}
+            if rec is None:
+                error = "missing from batch output"
+            elif rec.get("error") or response.get("status_code") != 200:
+                error = json.dumps(rec.get("error") or response.get("body"), ensure_ascii=False)[:500]
+            else:
+                error = None
+
+            if target[0] == "company":
+                key = target[1]
+                if error:
+                    self.company_errors[key] = error
+                    continue
+                meta = _company_research_meta(response["body"].get("usage") or {})
+                meta = dict(meta, cost=round(meta["cost"] / 2, 6), batch=True, cache_hit=False)
+                result = _company_research_result(_response_output_text(response["body"]), meta)
+                metrics.record_llm_call(meta)
+                if self.use_cache and company_cache is not None and key != "unknown":
+                    company_cache.set(key, result)
+                self.companies[key] = dict(result, cache_hit=False)
+                continue
+
+            _, i, step, field, args, cache_key, coverage = target
+            if error:
+                self.errors[i] = f"{step}: {error}"
+                continue
+            content, meta = ml_service.parse_batch_response(response["body"], args["model"], args["call_type"])
+            metrics.record_llm_call(meta)
+            if cache_key:
+                ml_service.cache.set(cache_key, {"content": content, "meta": meta})
+            self.results[i][step] = _chat_result(field, content, meta, args, coverage)
+
+    def _attach_companies(self) -> None:
+        for i, item in enumerate(self.items):
+            key = _company_key(item)
+            if key in self.companies:
+                self.results[i]["research_company"] = self.companies[key]
+            elif i not in self.errors:
+                self.errors[i] = f"research_company: {self.company_errors.get(key, 'no result')}"
+
+    # ---------- driver ----------
+
+    def run(self) -> List[Dict[str, Any]]:
+        t0 = time.perf_counter()
+        for stage_no, steps in enumerate(STAGES, start=1):
+            s0 = time.perf_counter()
+            lines, pending = self._collect(stage_no, steps)
+
+            stage_state = self.state["stages"].get(str(stage_no))
+            if pending and stage_state is None:
+                stage_state = {"batch_ids": self._submit(stage_no, lines)}
+                self.state["stages"][str(stage_no)] = stage_state
+                self._save_state()
+            if pending:
+                batches = self._wait(stage_no, stage_state["batch_ids"])
+                self._apply(pending, self._outputs(batches))
+            if "research_company" in steps:
+                self._attach_companies()
+
+            self.stage_timings[f"stage{stage_no}"] = {
+                "steps": list(steps),
+                "requests": len(pending),
+                "duration_s": round(time.perf_counter() - s0, 3),
+            }
+
+        total_s = round(time.perf_counter() - t0, 3)
+        entries = []
+        for i, item in enumerate(self.items):
+            if i in self.errors:
+                entries.append({"index": i, "status": "failed", "error": self.errors[i]})
+                continue
+            snapshot = _build_snapshot(
+                self.results[i],
+                {"mode": "offline_batch", "stages": self.stage_timings, "total_s": total_s},
+                job_description=item["job_description"],
+                company_name=item.get("company_name"),
+                company_url=item.get("company_url"),
+                about_me_or_prefs=item.get("about_me") or "",
+            )
+            entries.append({"index": i, "status": "succeeded", "result": snapshot})
+        return entries
+
+
+def run_offline_batch(
+    *,
+    items: List[Dict[str, Any]],
+    workdir: str,
+    resume_pdf_bytes: Optional[bytes] = None,
+    resume_text_fallback: Optional[str] = None,
+    about_me_or_prefs: str = "",
+    log_path: str = "runs_log.jsonl",
+    use_cache: bool = True,
+    history_store: Optional[HistoryStore] = None,
+    client: Optional[OpenAI] = None,
+    poll_interval: float = 60.0,
+) -> Dict[str, Any]:
+    """
+    Batch API counterpart of arun_batch_pipeline: same items and result
+    shape, but blocks until every batch has finished (possibly hours).
+    """
+    resume_text = _resolve_resume_text(resume_pdf_bytes, resume_text_fallback)
+    items = [dict(it, about_me=it.get("about_me") or about_me_or_prefs) for it in items]
+    for it in items:
+        if not (it.get("job_description") or "").strip():
+            raise ValueError("every item needs a job_description")
+
+    runner = OfflineBatchRun(items, resume_text, Path(workdir), client=client, use_cache=use_cache, poll_interval=poll_interval)
+    entries = runner.run()
+    for e in entries:
+        if e["status"] == "succeeded":
+            _save_snapshot(e["result"], log_path, history_store)
+
+    succeeded = sum(1 for e in entries if e["status"] == "succeeded")
+    summary = {
+        "total": len(entries),
+        "succeeded": succeeded,
+        "failed": len(entries) - succeeded,
+        "unique_companies": len({_company_key(it) for it in items}),
+        "stages": runner.stage_timings,
+    }
+    (Path(workdir) / "results.json").write_text(json.dumps({"items": entries, "summary": summary}, ensure_ascii=False, indent=2))
+    return {"items": entries, "summary": summary}
+
+
+if __name__ == "__main__":
+    from constants import OPENAI_API_KEY, HISTORY_BACKEND, HISTORY_PATH, HISTORY_DB_PATH
+    from history_store import get_history_store
+
+    parser = argparse.ArgumentParser(description="Tailor one resume to many postings via the OpenAI Batch API.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    run = sub.add_parser("run")
+    run.add_argument("--resume", required=True, help="resume PDF (or .txt)")
+    run.add_argument("--items", required=True, help="JSON list of {job_description, company_url?, company_name?, about_me?}")
+    run.add_argument("--workdir", required=True, help="where batch files, state.json and results.json go")
+    run.add_argument("--about-me", default="")
+    run.add_argument("--poll", type=float, default=60.0, help="seconds between status checks")
+    run.add_argument("--base-url", default=None, help="API base URL (defaults to OPENAI_BASE_URL)")
+    run.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    resume_path = Path(args.resume)
+    raw = resume_path.read_bytes()
+    is_pdf = resume_path.suffix.lower() == ".pdf"
+    result = run_offline_batch(
+        items=json.loads(Path(args.items).read_text()),
+        workdir=args.workdir,
+        resume_pdf_bytes=raw if is_pdf else None,
+        resume_text_fallback=None if is_pdf else raw.decode("utf-8", errors="replace"),
+        about_me_or_prefs=args.about_me,
+        log_path=str(HISTORY_PATH),
+        use_cache=not args.no_cache,
+        history_store=get_history_store(HISTORY_BACKEND, HISTORY_PATH, HISTORY_DB_PATH),
+        client=OpenAI(api_key=OPENAI_API_KEY, base_url=args.base_url) if args.base_url else None,
+        poll_interval=args.poll,
+    )
+    print(json.dumps(result["summary"], indent=2))
+    sys.exit(0 if result["summary"]["failed"] == 0 else 1)
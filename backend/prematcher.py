@@ -0,0 +1,360 @@
+# prematcher.py
+"""
+Local requirement-to-resume pre-matching, before (or instead of) the LLM
+match step.
+
+Requirement lines (the Must-Have / Preferred bullets of the extraction step)
+and resume lines are normalized (lowercase, skill aliases such as k8s ->
+kubernetes, light plural stripping) and turned into hashed n-gram vectors:
+word unigrams and bigrams plus character 4-grams, hashed into DIM buckets,
+sublinear TF weighted by IDF over the resume lines. One matrix product gives
+the cosine of every requirement against every resume line.
+
+Each requirement is then:
+  - covered    best line scores >= PREMATCH_COVERED_SCORE, or every skill it
+               names appears in the resume and the best line is not a miss
+  - missing    best line scores < PREMATCH_MISSING_SCORE, it names skills
+               and none of them appear in the resume (soft requirements
+               without a named skill are never decided missing locally)
+  - ambiguous  anything else; only these go to the LLM
+
+The LLM step then gets the ambiguous requirements, the resume lines relevant
+to them and the decided rows as context. With PREMATCH_SKIP_LLM (off by
+default) the step is answered locally, but only when every requirement has
+evidence at the covered score. Resume vectors only
+depend on the resume, so they are cached (a batch of postings against one
+resume builds them once).
+"""
+
+import re
+import time
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from constants import PREMATCH_COVERED_SCORE, PREMATCH_MISSING_SCORE, PREMATCH_EVIDENCE_LINES
+
+DIM = 1 << 14
+CHAR_NGRAM = 4
+CHAR_WEIGHT = 0.3
+
+# Part of match_requirements' step key: changing the matcher invalidates old mappings.
+VERSION = f"hashed-ngrams/{DIM}/{PREMATCH_COVERED_SCORE}/{PREMATCH_MISSING_SCORE}/{PREMATCH_EVIDENCE_LINES}"
+
+# ---------- normalization ----------
+
+# Multi-word and punctuated names first (matched on the lowercased text).
+_PHRASES = (
+    (r"\bmachine learning\b", "machine_learning"),
+    (r"\bdeep learning\b", "deep_learning"),
+    (r"\bci\s*/\s*cd\b", "cicd"),
+    (r"\bamazon web services\b", "aws"),
+    (r"\bgoogle cloud( platform)?\b", "gcp"),
+    (r"\bmicrosoft azure\b", "azure"),
+    (r"\bnode\.?js\b", "nodejs"),
+    (r"\breact\.?js\b", "react"),
+    (r"\bvue\.?js\b", "vue"),
+    (r"\bnext\.?js\b", "nextjs"),
+    (r"\.net\b", " dotnet"),
+    (r"\bc\+\+", "cpp"),
+    (r"\bc#", "csharp"),
+    (r"\brest(ful)? apis?\b", "rest_api"),
+    (r"\bdistributed systems?\b", "distributed_systems"),
+    (r"\bon-?call\b", "oncall"),
+)
+_PHRASE_RES = [(re.compile(p), r) for p, r in _PHRASES]
+
+SKILL_ALIASES = {
+    "k8s": "kubernetes", "postgres": "postgresql", "psql": "postgresql", "golang": "go",
+    "js": "javascript", "ts": "typescript", "py": "python", "ml": "machine_learning",
+    "tf": "terraform", "gke": "kubernetes", "eks": "kubernetes", "mongo": "mongodb",
+    "sklearn": "scikit-learn", "pg": "postgresql", "grpc": "grpc", "nlp": "nlp",
+}
+
+# Canonical skill tokens (after aliasing) used for the all-skills-present rule.
+SKILLS = frozenset({
+    "python", "go", "java", "javascript", "typescript", "rust", "ruby", "scala", "kotlin", "swift", "php",
+    "cpp", "csharp", "dotnet", "sql", "postgresql", "mysql", "mongodb", "redis", "cassandra", "dynamodb",
+    "elasticsearch", "kafka", "rabbitmq", "spark", "airflow", "dbt", "snowflake", "bigquery", "hadoop",
+    "kubernetes", "docker", "terraform", "ansible", "aws", "gcp", "azure", "linux", "cicd", "jenkins",
+    "react", "vue", "angular", "nodejs", "nextjs", "django", "flask", "fastapi", "rails", "spring",
+    "graphql", "grpc", "rest_api", "machine_learning", "deep_learning", "pytorch", "tensorflow",
+    "scikit-learn", "pandas", "numpy", "nlp", "llm", "tableau", "looker", "figma", "git",
+    "distributed_systems", "microservices", "observability", "prometheus", "grafana", "oncall",
+})
+
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or our that the their this to
+with we you your will who what which while within years year plus strong experience experienced
+ability able skills skill knowledge proficiency proficient familiarity familiar including etc e.g
+i.e using use work working across other such well good great excellent solid hands-on
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9_+#.\-]*")
+_BULLET = re.compile(r"^\s*(?:[-*•·▪◦‣]|\d+[.)])\s+")
+
+
+def normalize(text: str) -> List[str]:
+    s = text.lower()
+    for pattern, repl in _PHRASE_RES:
+        s = pattern.sub(repl, s)
+    tokens = []
+    for tok in _TOKEN.findall(s):
+        tok = tok.strip(".-")
+        tok = SKILL_ALIASES.get(tok, tok)
+        if tok in SKILLS:
+            tokens.append(tok)
+            continue
+        if len(tok) < 2 or tok in _STOPWORDS:
+            continue
+        if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+def _features(tokens: List[str]) -> Dict[int, float]:
+    """Hashed feature counts: word 1- and 2-grams, char 4-grams (down-weighted)."""
+    counts: Dict[int, float] = {}
+
+    def add(feature: str, weight: float) -> None:
+        h = zlib.crc32(feature.encode("utf-8")) & (DIM - 1)
+        counts[h] = counts.get(h, 0.0) + weight
+
+    for i, tok in enumerate(tokens):
+        add(tok, 1.0)
+        if i:
+            add(f"{tokens[i - 1]} {tok}", 1.0)
+        padded = f"<{tok}>"
+        for j in range(len(padded) - CHAR_NGRAM + 1):
+            add("#" + padded[j:j + CHAR_NGRAM], CHAR_WEIGHT)
+    return counts
+
+
+def _tf_matrix(token_lists: List[List[str]]) -> np.ndarray:
+    m = np.zeros((len(token_lists), DIM), dtype=np.float32)
+    for row, tokens in enumerate(token_lists):
+        feats = _features(tokens)
+        if feats:
+            cols = np.fromiter(feats.keys(), dtype=np.int64, count=len(feats))
+            vals = np.fromiter(feats.values(), dtype=np.float32, count=len(feats))
+            m[row, cols] = 1.0 + np.log(vals + 1e-9).clip(min=0.0)  # sublinear tf
+    return m
+
+
+def _l2_normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+# ---------- parsing ----------
+
+_REQUIREMENT_SECTIONS = (("must-have", "must have", "required", "requirements"), ("preferred", "bonus", "nice to have"))
+_SKIPPED_SECTIONS = ("role focus", "company values", "signals", "hard constraint", "ambiguit", "missing info")
+
+
+def _heading(line: str) -> Optional[str]:
+    s = line.strip().strip("#*_ ").rstrip(":").strip().lower()
+    if not s or _BULLET.match(line) or len(s) > 60:
+        return None
+    return s
+
+
+def parse_requirements(requirements_text: str) -> List[Tuple[str, str]]:
+    """(section, requirement) pairs from the extraction step's Must-Have / Preferred bullets."""
+    rows: List[Tuple[str, str]] = []
+    loose: List[Tuple[str, str]] = []
+    section: Optional[str] = None
+    for line in (requirements_text or "").splitlines():
+        if not line.strip():
+            continue
+        if not _BULLET.match(line):
+            h = _heading(line)
+            if h is not None:
+                if any(k in h for k in _SKIPPED_SECTIONS):
+                    section = "skip"
+                elif any(k in h for k in _REQUIREMENT_SECTIONS[0]):
+                    section = "must_have"
+                elif any(k in h for k in _REQUIREMENT_SECTIONS[1]):
+                    section = "preferred"
+                continue
+        text = _BULLET.sub("", line).strip().strip("*").strip()
+        if not text or text.endswith(":"):  # group label ("Technical skills:")
+            continue
+        loose.append(("requirement", text))
+        if section in ("must_have", "preferred"):
+            rows.append((section, text))
+    # no recognizable headings: every bullet is a requirement
+    return rows or ([] if section is not None else loose)
+
+
+def resume_lines(resume_text: str) -> List[str]:
+    out = []
+    for line in (resume_text or "").splitlines():
+        text = _BULLET.sub("", line).strip()
+        if len(text.split()) >= 2 and not text.endswith(":"):
+            out.append(text)
+    return out
+
+
+# ---------- resume index (cached per resume) ----------
+
+class ResumeIndex:
+    def __init__(self, resume_text: str):
+        self.lines = resume_lines(resume_text)
+        tokens = [normalize(line) for line in self.lines]
+        self.skills = {t for ts in tokens for t in ts if t in SKILLS}
+        tf = _tf_matrix(tokens)
+        df = (tf > 0).sum(axis=0)
+        n = max(1, len(self.lines))
+        self.idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+        self.matrix = _l2_normalize(tf * self.idf)
+
+    def score(self, requirements: List[str]) -> Tuple[np.ndarray, List[List[str]]]:
+        """Cosine of each requirement (rows) against each resume line (columns)."""
+        tokens = [normalize(r) for r in requirements]
+        if not self.lines or not requirements:
+            return np.zeros((len(requirements), len(self.lines)), dtype=np.float32), tokens
+        q = _l2_normalize(_tf_matrix(tokens) * self.idf)
+        return q @ self.matrix.T, tokens
+
+
+_index_cache: "OrderedDict[str, ResumeIndex]" = OrderedDict()
+_index_lock = threading.Lock()
+_INDEX_CACHE_SIZE = 32
+
+
+def resume_index(resume_text: str) -> ResumeIndex:
+    key = hashlib.sha256(resume_text.encode("utf-8")).hexdigest()
+    with _index_lock:
+        idx = _index_cache.get(key)
+        if idx is not None:
+            _index_cache.move_to_end(key)
+            return idx
+    idx = ResumeIndex(resume_text)
+    with _index_lock:
+        _index_cache[key] = idx
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return idx
+
+
+# ---------- coverage ----------
+
+class Coverage:
+    def __init__(self, rows: List[Dict[str, Any]], resume_text: str, header: List[str], elapsed_ms: float):
+        self.rows = rows
+        self.resume_text = resume_text
+        self.header = header  # first resume lines (name, title), kept in excerpts
+        self.elapsed_ms = elapsed_ms
+
+    def _status(self, status: str) -> List[Dict[str, Any]]:
+        return [r for r in self.rows if r["status"] == status]
+
+    @property
+    def decided(self) -> bool:
+        """Every requirement is clearly covered or clearly missing."""
+        return bool(self.rows) and not self._status("ambiguous")
+
+    @property
+    def confident(self) -> bool:
+        """
+        Every requirement has resume evidence scoring >= PREMATCH_COVERED_SCORE:
+        the only case in which the LLM match step may be skipped (rows decided
+        through named skills alone, or missing ones, still get the LLM).
+        """
+        return bool(self.rows) and all(r["score"] >= PREMATCH_COVERED_SCORE for r in self.rows)
+
+    def summary(self, skipped_llm: bool = False) -> Dict[str, Any]:
+        return {
+            "requirements": len(self.rows),
+            "covered": len(self._status("covered")),
+            "ambiguous": len(self._status("ambiguous")),
+            "missing": len(self._status("missing")),
+            "elapsed_ms": self.elapsed_ms,
+            "skipped_llm": skipped_llm,
+            "rows": self.rows,
+        }
+
+    def llm_inputs(self) -> Dict[str, str]:
+        """Inputs for the LLM match step: ambiguous requirements, their resume lines, decided rows."""
+        ambiguous = self._status("ambiguous")
+        excerpt: List[str] = list(self.header)
+        for r in ambiguous:
+            for line in r["evidence"]:
+                if line not in excerpt:
+                    excerpt.append(line)
+        if any(not r["evidence"] for r in ambiguous):
+            # nothing lexically close: the LLM has to read the whole resume
+            excerpt = [self.resume_text]
+        decided = ["Covered (resume evidence found):"]
+        decided += [f"- {r['requirement']} | evidence: {r['evidence'][0]}" for r in self._status("covered")] or ["- none"]
+        decided += ["", "Not found in the resume:"]
+        decided += [f"- {r['requirement']}" for r in self._status("missing")] or ["- none"]
+        return {
+            "resume_text": "\n".join(excerpt),
+            "requirements_text": "\n".join(f"- {r['requirement']}" for r in ambiguous) or "- none",
+            "prematch_text": "\n".join(decided),
+        }
+
+    def mapping_text(self) -> str:
+        """The match step's output sections, written from the table alone."""
+        covered, missing = self._status("covered"), self._status("missing")
+        lines = ["Direct Matches"]
+        for r in covered:
+            lines.append(f"- {r['requirement']}")
+            lines += [f"  - Evidence: {e}" for e in r["evidence"][:2]]
+        if not covered:
+            lines.append("- None found.")
+        lines += ["", "Partial or Transferable Matches", "- None identified (local keyword match only).", "", "Gaps"]
+        lines += [f"- {r['requirement']}" for r in missing] or ["- None found."]
+        lines += ["", "De-emphasize / Remove", "- Not assessed (local keyword match only).", "", "Resume Tailoring Suggestions"]
+        if covered:
+            lines.append("- Lead with the evidence for: " + "; ".join(r["requirement"] for r in covered[:5]) + ".")
+        if missing:
+            lines.append("- Do not claim the gaps; highlight adjacent experience where it is real.")
+        return "\n".join(lines)
+
+
+def prematch(
+    resume_text: str,
+    requirements_text: str,
+    covered_score: float = PREMATCH_COVERED_SCORE,
+    missing_score: float = PREMATCH_MISSING_SCORE,
+    evidence_lines: int = PREMATCH_EVIDENCE_LINES,
+) -> Optional[Coverage]:
+    """Coverage table for the parsed requirements, or None when none could be parsed."""
+    t0 = time.perf_counter()
+    parsed = parse_requirements(requirements_text)
+    if not parsed:
+        return None
+    index = resume_index(resume_text)
+    scores, tokens = index.score([text for _, text in parsed])
+
+    rows = []
+    k = min(evidence_lines, len(index.lines))
+    for i, (section, text) in enumerate(parsed):
+        order = np.argsort(-scores[i])[:k] if k else []
+        best = float(scores[i][order[0]]) if k else 0.0
+        skills = {t for t in tokens[i] if t in SKILLS}
+        if best >= covered_score or (skills and skills <= index.skills and best >= missing_score):
+            status = "covered"
+        elif best < missing_score and skills and not (skills & index.skills):
+            status = "missing"
+        else:
+            status = "ambiguous"
+        rows.append({
+            "requirement": text,
+            "section": section,
+            "status": status,
+            "score": round(best, 3),
+            "skills": sorted(skills),
+            "evidence": [index.lines[j] for j in order if scores[i][j] >= missing_score],
+        })
+    header = index.lines[:2]
+    return Coverage(rows, resume_text, header, round((time.perf_counter() - t0) * 1000, 2))
@@ -3,6 +3,14 @@
 Prompts are written as clear task briefings you'd give a careful human.
 They prioritize clarity, evidence, and honesty over hype. Outputs should be
 sectioned with headings and bullet points (not rigid JSON). Keep tone neutral.
+
+Layout (for OpenAI prompt caching, which reuses identical request prefixes):
+  - system message: the step's static instructions (ETHOS included), never
+    interpolated, so every call of a step shares it byte for byte
+  - user message: the variable inputs, most stable first (resume or
+    candidate notes, then company profile, then per-posting text), so e.g.
+    a batch of postings against one resume shares system + resume
+Use build_messages() rather than formatting prompts by hand.
 """
 
 # ---------- Global ethos ----------
@@ -17,14 +25,14 @@ Principles:
 """.strip()
 
 # ---------- Step 1: Extract requirements from JD ----------
-EXTRACT_REQUIREMENTS_PROMPT = f"""
+EXTRACT_REQUIREMENTS_INSTRUCTIONS = f"""
 You are a careful hiring-minded analyst. Read the job description and produce
 a concise, human-readable breakdown of what the role truly requires.
 
 {ETHOS}
 
 Input:
-- Job Description (verbatim text) is provided below.
+- Job Description (verbatim text) is provided in the user message.
 
 Task:
 1) Summarize the role focus in 1–3 short bullets.
@@ -50,20 +58,18 @@ Format:
   - Ambiguities or Missing Info
 - Use bullet points under each section.
 - No marketing language, no filler, no JSON.
-
-Job Description:
-{{job_description}}
 """.strip()
 
 # ---------- Step 2: Match requirements to resume ----------
-MATCH_REQUIREMENTS_PROMPT = f"""
+MATCH_REQUIREMENTS_INSTRUCTIONS = f"""
 You are a meticulous resume analyst. Compare the job requirements to the provided resume.
 
 {ETHOS}
 
-Inputs:
-- Extracted Requirements (from Step 1) below.
-- Current Resume (plain text) below.
+Inputs (in the user message):
+- Current Resume (plain text). When a local pre-match ran, only the resume lines relevant to the listed requirements.
+- Extracted Requirements (from Step 1). When a local pre-match ran, only the requirements it could not decide.
+- Pre-matched Coverage: requirements already decided locally, with the resume line that covers them, and requirements with no resume evidence.
 
 Task:
 1) "Direct Matches":
@@ -77,6 +83,8 @@ Task:
 5) "Resume Tailoring Suggestions":
    - Concise, actionable edits (reorder bullets, rephrase with JD keywords, quantify where possible without inventing).
 
+Include the pre-matched requirements in your output: covered ones under Direct Matches (with the given evidence), not-found ones under Gaps unless the resume shows otherwise.
+
 Format (headings exactly):
 - Direct Matches
 - Partial or Transferable Matches
@@ -87,23 +95,17 @@ Format (headings exactly):
 Constraints:
 - Do not fabricate experience or metrics.
 - Prefer short bullets.
-
-Extracted Requirements:
-{{requirements_text}}
-
-Current Resume:
-{{resume_text}}
 """.strip()
 
 # ---------- Step 3: Company research via web ----------
-COMPANY_RESEARCH_PROMPT = f"""
+COMPANY_RESEARCH_INSTRUCTIONS = f"""
 You will use a web search tool to research the company. Keep it factual and restrained.
 
 {ETHOS}
 
-Inputs:
-- Company name: {{company_name}}
-- Company URL (optional): {{company_url}}
+Inputs (in the user message):
+- Company name
+- Company URL (optional)
 
 Instructions:
 1) Identify the official website (if not provided). Prefer the company's own domain.
@@ -130,15 +132,15 @@ Notes:
 """.strip()
 
 # ---------- Step 4: Generate tailored resume (content draft) ----------
-TAILOR_RESUME_PROMPT = f"""
+TAILOR_RESUME_INSTRUCTIONS = f"""
 You are crafting a tailored resume draft for a specific role.
 
 {ETHOS}
 
-Inputs:
+Inputs (in the user message):
 - Current Resume (plain text)
-- Requirement–Resume Analysis (from Step 2)
 - Company Profile (from research)
+- Requirement–Resume Analysis (from Step 2)
 
 Task:
 1) Draft updated content for a resume (text-only). Sections to include if applicable:
@@ -156,28 +158,18 @@ Format:
 - Plain text with clear section headings.
 - Bullet points with leading hyphens.
 - No tables, no graphics, no JSON.
-
-Materials:
-- Current Resume:
-{{resume_text}}
-
-- Requirement–Resume Analysis:
-{{mapping_text}}
-
-- Company Profile:
-{{company_profile_text}}
 """.strip()
 
 # ---------- Step 5: Simple, honest cover letter ----------
-COVER_LETTER_PROMPT = f"""
+COVER_LETTER_INSTRUCTIONS = f"""
 Write a short, honest cover letter for the role and company. Keep it simple and respectful. Do not mention address and other details on top. Instead simply start with "Hi <Name>" or similar.
 
 {ETHOS}
 
-Inputs:
-- Extracted Requirements (from Step 1)
-- Company Profile (from research)
+Inputs (in the user message):
 - Candidate highlights or preferences (plain text; may include extra context not in resume)
+- Company Profile (from research)
+- Extracted Requirements (from Step 1)
 - Keep tone aligned to the "Suggested Tone for Outreach" if provided.
 
 Constraints:
@@ -191,14 +183,46 @@ Constraints:
 
 Output:
 - Plain text letter with line breaks (no JSON).
-
-Materials:
-- Requirements:
-{{requirements_text}}
-
-- Company Profile:
-{{company_profile_text}}
-
-- Candidate Highlights:
-{{about_me_or_prefs}}
 """.strip()
+
+# ---------- Assembly ----------
+# Per step: static instructions + (label, input name) pairs, most stable first.
+PROMPTS = {
+    "extract_requirements": (EXTRACT_REQUIREMENTS_INSTRUCTIONS, (
+        ("Job Description", "job_description"),
+    )),
+    "match_requirements": (MATCH_REQUIREMENTS_INSTRUCTIONS, (
+        ("Current Resume", "resume_text"),
+        ("Extracted Requirements", "requirements_text"),
+        ("Pre-matched Coverage", "prematch_text"),
+    )),
+    "research_company": (COMPANY_RESEARCH_INSTRUCTIONS, (
+        ("Company name", "company_name"),
+        ("Company URL (optional)", "company_url"),
+    )),
+    "tailor_resume": (TAILOR_RESUME_INSTRUCTIONS, (
+        ("Current Resume", "resume_text"),
+        ("Company Profile", "company_profile_text"),
+        ("Requirement–Resume Analysis", "mapping_text"),
+    )),
+    "cover_letter": (COVER_LETTER_INSTRUCTIONS, (
+        ("Candidate Highlights", "about_me_or_prefs"),
+        ("Company Profile", "company_profile_text"),
+        ("Requirements", "requirements_text"),
+    )),
+}
+
+
+def build_input(step: str, **inputs: str) -> str:
+    """The variable part of a step's prompt (the user message)."""
+    _, fields = PROMPTS[step]
+    return "\n\n".join(f"{label}:\n{(inputs.get(name) or '').strip()}" for label, name in fields)
+
+
+def build_messages(step: str, **inputs: str) -> list:
+    """Chat messages for a step: static system prefix, then the variable inputs."""
+    instructions, _ = PROMPTS[step]
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": build_input(step, **inputs)},
+    ]
@@ -0,0 +1,263 @@
+# rate_limiter.py
+"""
+Client-side rate limiting for OpenAI calls, per model.
+
+Each model has two token buckets refilled continuously:
+  - requests per minute (every call costs 1)
+  - tokens per minute (a call reserves prompt tokens + max_tokens up front;
+    the unused part is refunded once the real usage is known)
+
+Callers queue FIFO per model: only the head of the queue may take budget, so
+a large request is not starved by a stream of small ones and waiters do not
+all wake and race when budget frees up. Works for threads and coroutines on
+any event loop at the same time.
+
+Limits start from RATE_LIMITS / the defaults and are corrected from the
+`x-ratelimit-*` headers of every response. A 429 pauses the model's queue
+instead of letting every caller retry on its own.
+"""
+
+import re
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Optional, Dict, Any
+
+_DURATION_PART = re.compile(r"([\d.]+)(ms|h|m|s)")
+_DURATION_SCALE = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """'1s', '6m0s', '20ms' -> seconds (None if missing/unparseable)."""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(n) * _DURATION_SCALE[u] for n, u in parts)
+
+
+class _Bucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        return max(0.0, (amount - self.level) * 60.0 / self.capacity) if self.capacity > 0 else 0.0
+
+    def set_limit(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.level = min(self.level, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("tokens", "wake", "taken")
+
+    def __init__(self, tokens: int, wake):
+        self.tokens = tokens
+        self.wake = wake
+        self.taken = 0
+
+
+class _ModelLimiter:
+    def __init__(self, rpm: float, tpm: float):
+        self.lock = threading.Lock()
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self.queue: "deque[_Waiter]" = deque()
+        self.paused_until = 0.0
+        self.stats = {"acquired": 0, "waited": 0, "wait_s": 0.0, "paused": 0, "refunded_tokens": 0}
+
+    def _poll(self, w: _Waiter) -> Optional[float]:
+        """0 if `w` got its budget, seconds to sleep if it is at the head, None if behind others."""
+        with self.lock:
+            if self.queue[0] is not w:
+                return None
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            need = min(w.tokens, self.tokens.capacity)  # never wait for more than a full bucket
+            wait = max(self.paused_until - now, self.requests.wait_for(1), self.tokens.wait_for(need))
+            if wait > 0:
+                return wait
+            self.requests.level -= 1
+            self.tokens.level -= need
+            w.taken = int(need)
+            self.queue.popleft()
+            self.stats["acquired"] += 1
+            nxt = self.queue[0] if self.queue else None
+        if nxt is not None:
+            nxt.wake()
+        return 0.0
+
+    def _leave(self, w: _Waiter) -> None:
+        """Drop an abandoned (cancelled) waiter and let the next one try."""
+        with self.lock:
+            was_head = bool(self.queue) and self.queue[0] is w
+            try:
+                self.queue.remove(w)
+            except ValueError:
+                return
+            nxt = self.queue[0] if (was_head and self.queue) else None
+        if nxt is not None:
+            nxt.wake()
+
+    def _enqueue(self, w: _Waiter) -> None:
+        with self.lock:
+            self.queue.append(w)
+
+    def _note_wait(self, started: float) -> None:
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            with self.lock:
+                self.stats["waited"] += 1
+                self.stats["wait_s"] += waited
+
+
+class RateLimiter:
+    def __init__(self, default_rpm: float = 500, default_tpm: float = 200_000, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.limits = limits or {}
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelLimiter] = {}
+
+    def _model(self, model: str) -> _ModelLimiter:
+        with self._lock:
+            m = self._models.get(model)
+            if m is None:
+                conf = self.limits.get(model, {})
+                m = self._models[model] = _ModelLimiter(conf.get("rpm", self.default_rpm), conf.get("tpm", self.default_tpm))
+            return m
+
+    # ---------- acquire ----------
+
+    def acquire(self, model: str, tokens: int) -> int:
+        """
+        Block until `model` has budget for one request of `tokens`; returns the
+        reservation (capped at the bucket size), to settle() or release() later.
+        """
+        m = self._model(model)
+        event = threading.Event()
+        w = _Waiter(tokens, event.set)
+        started = time.monotonic()
+        m._enqueue(w)
+        try:
+            while True:
+                wait = m._poll(w)
+                if wait == 0.0:
+                    m._note_wait(started)
+                    return w.taken
+                event.wait(wait if wait is not None else 1.0)
+                event.clear()
+        except BaseException:
+            m._leave(w)
+            raise
+
+    async def aacquire(self, model: str, tokens: int) -> int:
+        """acquire() for coroutines; cancellation gives up the place in line."""
+        m = self._model(model)
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        w = _Waiter(tokens, lambda: loop.call_soon_threadsafe(wakeup.set))
+        started = time.monotonic()
+        m._enqueue(w)
+        try:
+            while True:
+                wait = m._poll(w)
+                if wait == 0.0:
+                    m._note_wait(started)
+                    return w.taken
+                try:
+                    await asyncio.wait_for(wakeup.wait(), wait if wait is not None else 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+        except BaseException:
+            m._leave(w)
+            raise
+
+    # ---------- feedback ----------
+
+    def settle(self, model: str, reserved: int, used: Optional[int]) -> None:
+        """Refund the part of a reservation the call did not use."""
+        if used is None or used >= reserved:
+            return
+        m = self._model(model)
+        with m.lock:
+            m.tokens.level = min(m.tokens.capacity, m.tokens.level + (reserved - used))
+            m.stats["refunded_tokens"] += reserved - used
+            nxt = m.queue[0] if m.queue else None
+        if nxt is not None:
+            nxt.wake()
+
+    def release(self, model: str, reserved: int) -> None:
+        """Give back a whole reservation (the attempt failed or was retried)."""
+        self.settle(model, reserved, 0)
+
+    def update_from_headers(self, model: str, headers) -> None:
+        """Adopt the server's view of limits / remaining budget (x-ratelimit-* headers)."""
+        if not headers or headers.get("x-ratelimit-limit-requests") is None and headers.get("x-ratelimit-limit-tokens") is None:
+            return
+        m = self._model(model)
+        with m.lock:
+            now = time.monotonic()
+            for bucket, kind in ((m.requests, "requests"), (m.tokens, "tokens")):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                try:
+                    if limit is not None:
+                        bucket.refill(now)
+                        bucket.set_limit(float(limit))
+                    if remaining is not None:
+                        bucket.refill(now)
+                        bucket.level = min(bucket.level, float(remaining))
+                except ValueError:
+                    continue
+
+    def pause(self, model: str, seconds: float) -> None:
+        """Hold the model's whole queue (after a 429) rather than each caller retrying alone."""
+        m = self._model(model)
+        with m.lock:
+            m.paused_until = max(m.paused_until, time.monotonic() + seconds)
+            m.stats["paused"] += 1
+
+    def estimated_wait(self, model: str, tokens: int) -> float:
+        """Seconds a request of `tokens` would wait now, behind everyone already queued."""
+        m = self._model(model)
+        with m.lock:
+            now = time.monotonic()
+            m.requests.refill(now)
+            m.tokens.refill(now)
+            queued = sum(w.tokens for w in m.queue)
+            need = min(queued + tokens, m.tokens.capacity)
+            return max(m.paused_until - now, m.requests.wait_for(1 + len(m.queue)), m.tokens.wait_for(need))
+
+    def stats(self) -> Dict[str, Any]:
+        out = {}
+        with self._lock:
+            models = dict(self._models)
+        for name, m in models.items():
+            with m.lock:
+                now = time.monotonic()
+                m.requests.refill(now)
+                m.tokens.refill(now)
+                out[name] = dict(
+                    m.stats,
+                    wait_s=round(m.stats["wait_s"], 3),
+                    queued=len(m.queue),
+                    rpm_limit=m.requests.capacity,
+                    tpm_limit=m.tokens.capacity,
+                    requests_available=round(m.requests.level, 2),
+                    tokens_available=round(m.tokens.level),
+                )
+        return out
@@ -0,0 +1,193 @@
+# resume_parser.py
+"""
+Resume PDF -> text, off the API process and cached.
+
+- Parsed text is cached by the SHA-256 of the PDF bytes (plus backend and page
+  cap), in the same SQLite file as the LLM cache, so re-uploads are free.
+- Extraction runs in a small spawned process pool, so PDF parsing never holds
+  the API process's GIL or event loop.
+- Backends: "pypdf2" (always available) or "pymupdf" (much faster, optional
+  `pymupdf` package); "auto" picks PyMuPDF when installed.
+- Guards: PDFs over PDF_MAX_BYTES are rejected, only the first PDF_MAX_PAGES
+  pages are read, and a page taking longer than PDF_PAGE_TIMEOUT_SECONDS is
+  skipped.
+"""
+
+import io
+import signal
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from typing import Optional, Dict, Any, Tuple
+
+from constants import (
+    LLM_CACHE_PATH,
+    PDF_BACKEND, PDF_MAX_BYTES, PDF_MAX_PAGES, PDF_PAGE_TIMEOUT_SECONDS, PDF_PARSE_WORKERS,
+    RESUME_CACHE_ENABLED, RESUME_CACHE_TTL_SECONDS,
+)
+from llm_cache import ResponseCache
+
+
+class PageTimeout(Exception):
+    pass
+
+
+def available_backend(requested: str = PDF_BACKEND) -> str:
+    if requested in ("pymupdf", "auto"):
+        try:
+            import fitz  # noqa: F401  (PyMuPDF)
+            return "pymupdf"
+        except ImportError:
+            if requested == "pymupdf":
+                print("[resume_parser] PDF_BACKEND=pymupdf but PyMuPDF is not installed; using PyPDF2")
+    return "pypdf2"
+
+
+# ---------- extraction (runs in the worker process) ----------
+
+def _preload_backend(backend: str) -> None:
+    if backend == "pymupdf":
+        import fitz  # noqa: F401
+    else:
+        from PyPDF2 import PdfReader  # noqa: F401
+
+def _on_alarm(signum, frame):
+    raise PageTimeout()
+
+def _with_page_timeout(fn, timeout: float):
+    """Run fn() under a SIGALRM deadline (main thread of a worker only)."""
+    if timeout <= 0 or threading.current_thread() is not threading.main_thread():
+        return fn()
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _pages_pypdf2(pdf_bytes: bytes):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return len(reader.pages), (lambda i: reader.pages[i].extract_text() or "")
+
+def _pages_pymupdf(pdf_bytes: bytes):
+    import fitz
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    return doc.page_count, (lambda i: doc.load_page(i).get_text() or "")
+
+def extract_pdf_text(pdf_bytes: bytes, backend: str, max_pages: int, page_timeout: float) -> Tuple[str, Dict[str, Any]]:
+    """Text of the first `max_pages` pages plus info about what was skipped."""
+    open_pages = _pages_pymupdf if backend == "pymupdf" else _pages_pypdf2
+    total, page_text = open_pages(pdf_bytes)
+    chunks, timed_out = [], []
+    for i in range(min(total, max_pages)):
+        try:
+            chunks.append(_with_page_timeout(lambda: page_text(i), page_timeout))
+        except PageTimeout:
+            timed_out.append(i + 1)
+    info = {"backend": backend, "pages": total, "pages_read": min(total, max_pages), "pages_timed_out": timed_out}
+    return "\n".join(chunks).strip(), info
+
+
+# ---------- parser (API process side) ----------
+
+class ResumeParser:
+    def __init__(
+        self,
+        backend: str = PDF_BACKEND,
+        workers: int = PDF_PARSE_WORKERS,
+        max_bytes: int = PDF_MAX_BYTES,
+        max_pages: int = PDF_MAX_PAGES,
+        page_timeout: float = PDF_PAGE_TIMEOUT_SECONDS,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.backend = available_backend(backend)
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self.cache = cache
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a threaded server process is not safe
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _reset_pool(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def shutdown(self) -> None:
+        self._reset_pool()
+
+    def warm_up(self, cache_entries: int = 0) -> None:
+        """Start the worker processes (spawn + PDF library imports) before the first upload."""
+        if self.cache is not None and cache_entries:
+            self.cache.preload(cache_entries)
+        if self.workers <= 0:
+            _preload_backend(self.backend)
+            return
+        pool = self._get_pool()
+        for f in [pool.submit(_preload_backend, self.backend) for _ in range(self.workers)]:
+            f.result()
+
+    def cache_key(self, pdf_bytes: bytes) -> str:
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        return f"{digest}:{self.backend}:{self.max_pages}"
+
+    def extract_text(self, pdf_bytes: bytes) -> str:
+        if len(pdf_bytes) > self.max_bytes:
+            raise ValueError(f"Resume PDF is too large ({len(pdf_bytes)} bytes, max {self.max_bytes}).")
+
+        key = self.cache_key(pdf_bytes) if self.cache is not None else None
+        if key:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return hit["text"]
+
+        args = (pdf_bytes, self.backend, self.max_pages, self.page_timeout)
+        if self.workers <= 0:
+            text, info = extract_pdf_text(*args)
+        else:
+            try:
+                text, info = self._get_pool().submit(extract_pdf_text, *args).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. a pathological PDF); start fresh for the next request.
+                self._reset_pool()
+                raise ValueError("Resume PDF could not be parsed (parser process crashed).")
+
+        if info["pages_timed_out"] or info["pages_read"] < info["pages"]:
+            print(f"[resume_parser] partial parse: {info}")
+        if key:
+            self.cache.set(key, {"text": text, "info": info})
+        return text
+
+
+_parser: Optional[ResumeParser] = None
+_parser_lock = threading.Lock()
+
+def get_resume_parser() -> ResumeParser:
+    """Process-wide parser, built on first use (pool workers import this module too)."""
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            cache = None
+            if RESUME_CACHE_ENABLED:
+                cache = ResponseCache(
+                    LLM_CACHE_PATH,
+                    ttl_seconds=RESUME_CACHE_TTL_SECONDS,
+                    max_memory_entries=64,
+                    max_disk_entries=2000,
+                    table="resume_text",
+                )
+            _parser = ResumeParser(cache=cache)
+        return _parser
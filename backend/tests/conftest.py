@@ -0,0 +1,23 @@
+# tests/conftest.py
+"""
+Shared setup: backend modules are imported flat (as api.py does), and every
+on-disk cache / history path points into a throwaway directory before the
+first `import constants`.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+_tmp = Path(tempfile.mkdtemp(prefix="job-buddy-tests-"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ["LLM_CACHE_PATH"] = str(_tmp / "llm_cache.sqlite3")
+os.environ["HISTORY_PATH"] = str(_tmp / "runs_log.jsonl")
+os.environ["HISTORY_DB_PATH"] = str(_tmp / "runs.sqlite3")
+os.environ["JOB_DB_PATH"] = str(_tmp / "jobs.sqlite3")
+# Budgets only trim prompts; skipping them keeps the mock runs independent of the tokenizer.
+os.environ["TOKEN_BUDGET_ENABLED"] = "0"
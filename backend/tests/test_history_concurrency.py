@@ -0,0 +1,68 @@
+# tests/test_history_concurrency.py
+"""
+Several processes append to and edit one JSONL history at once (see
+bench/history_stress.py for the load-test version); nothing may be lost.
+"""
+
+import multiprocessing
+from pathlib import Path
+
+from history_store import JsonlHistoryStore
+
+PROCESSES = 4
+APPENDS = 60       # per process
+EDIT_ROUNDS = 40   # per process
+SEEDS = 8          # runs every process edits
+COMPACT_EVERY = 7  # rewrite the log many times while others write
+# Each process owns one tracking field, so edits of the same run from
+# different processes only survive together if every read-modify-write is atomic.
+FIELDS = ("platform", "application_url", "status", "notes")
+
+
+def _store(log: str) -> JsonlHistoryStore:
+    return JsonlHistoryStore(Path(log), compact_every=COMPACT_EVERY, search=False, blobs=False, fsync=False)
+
+
+def _worker(args):
+    log, wid = args
+    store = _store(log)
+    field = FIELDS[wid]
+    appended, last = {}, {}
+    for k in range(max(APPENDS, EDIT_ROUNDS)):
+        if k < APPENDS:
+            name = f"w{wid}-{k}"
+            appended[store.append({"inputs": {"company_name": name}})] = name
+        if k < EDIT_ROUNDS:
+            seq = k % SEEDS
+            value = f"w{wid}-{k}"
+            assert store.update_tracking_at(seq, {field: value})[field] == value
+            last[seq] = value
+    return appended, last
+
+
+def test_concurrent_appends_and_edits_are_not_lost(tmp_path):
+    log = str(tmp_path / "runs_log.jsonl")
+    seeder = _store(log)
+    seeds = [seeder.append({"inputs": {"company_name": f"seed-{i}"}}) for i in range(SEEDS)]
+    assert seeds == list(range(SEEDS))
+
+    with multiprocessing.get_context("spawn").Pool(PROCESSES) as pool:
+        outs = pool.map(_worker, [(log, w) for w in range(PROCESSES)])
+
+    store = _store(log)
+    total = store.count()
+    assert total == SEEDS + PROCESSES * APPENDS
+
+    appended = [seq for out, _ in outs for seq in out]
+    assert len(set(appended)) == len(appended)
+    assert sorted(seeds + appended) == list(range(total))
+
+    records = store.page(0, total)[::-1]  # oldest first
+    for out, _ in outs:
+        for seq, name in out.items():
+            assert records[seq]["inputs"]["company_name"] == name
+
+    for wid, (_, last) in enumerate(outs):
+        for seq, value in last.items():
+            assert records[seq]["inputs"]["company_name"] == f"seed-{seq}"
+            assert records[seq]["tracking"][FIELDS[wid]] == value
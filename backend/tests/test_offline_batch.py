@@ -0,0 +1,95 @@
+# tests/test_offline_batch.py
+"""Offline Batch API runs against the local mock (bench/mock_openai.py)."""
+
+import json
+import uuid
+
+import pytest
+from openai import OpenAI
+
+import offline_batch
+from bench import mock_openai
+from history_store import JsonlHistoryStore
+
+
+@pytest.fixture
+def mock():
+    server, state = mock_openai.start(config=mock_openai.MockConfig(latency_ms=0, latency_sigma=0, batch_polls=1, seed=1))
+    client = OpenAI(api_key="sk-mock", base_url=mock_openai.base_url(server), max_retries=0)
+    yield client, state
+    server.shutdown()
+
+
+def _items(n=3):
+    tag = uuid.uuid4().hex[:8]  # keeps LLM / company cache entries private to the test
+    return [
+        {
+            "job_description": f"Senior Python engineer ({tag}-{i}). Requirements: Python, Kubernetes, PostgreSQL.",
+            "company_name": f"Acme {tag}" if i < 2 else f"Globex {tag}",
+            "company_url": f"https://acme-{tag}.example" if i < 2 else f"https://globex-{tag}.example",
+        }
+        for i in range(n)
+    ]
+
+
+def _run(client, items, workdir, store, use_cache=True):
+    return offline_batch.run_offline_batch(
+        items=items,
+        workdir=str(workdir),
+        resume_text_fallback="Python engineer. Built Kubernetes services on PostgreSQL.",
+        history_store=store,
+        client=client,
+        use_cache=use_cache,
+        poll_interval=0.01,
+    )
+
+
+def test_snapshots_saved_and_cache_hits_not_resubmitted(mock, tmp_path):
+    client, state = mock
+    store = JsonlHistoryStore(tmp_path / "runs.jsonl", search=False, blobs=False, fsync=False)
+    items = _items()
+
+    first = _run(client, items, tmp_path / "first", store)
+    assert first["summary"]["succeeded"] == 3
+    assert store.count() == 3
+    for entry in first["items"]:
+        snap = entry["result"]
+        assert snap["requirements_text"] and snap["tailored_resume_text"] and snap["cover_letter_text"]
+    submitted = state.stats["batches"]
+    assert submitted > 0
+    assert state.stats["batch_lines"] > 0
+
+    # Same postings in a fresh workdir: every step is a cache hit, nothing is batched.
+    lines = state.stats["batch_lines"]
+    second = _run(client, items, tmp_path / "second", store)
+    assert second["summary"]["succeeded"] == 3
+    assert store.count() == 6
+    assert state.stats["batches"] == submitted
+    assert state.stats["batch_lines"] == lines
+    assert not list((tmp_path / "second").glob("stage*.jsonl"))
+
+
+def test_resume_from_state_does_not_resubmit(mock, tmp_path):
+    client, state = mock
+    store = JsonlHistoryStore(tmp_path / "runs.jsonl", search=False, blobs=False, fsync=False)
+    items = _items(2)
+    workdir = tmp_path / "run"
+
+    _run(client, items, workdir, store, use_cache=False)
+    saved = json.loads((workdir / "state.json").read_text())
+    submitted = state.stats["batches"]
+
+    again = _run(client, items, workdir, store, use_cache=False)
+    assert again["summary"]["succeeded"] == 2
+    assert state.stats["batches"] == submitted
+    assert json.loads((workdir / "state.json").read_text()) == saved
+
+
+def test_state_for_other_inputs_is_refused(mock, tmp_path):
+    client, _ = mock
+    store = JsonlHistoryStore(tmp_path / "runs.jsonl", search=False, blobs=False, fsync=False)
+    workdir = tmp_path / "run"
+    _run(client, _items(2), workdir, store, use_cache=False)
+
+    with pytest.raises(ValueError):
+        _run(client, _items(2), workdir, store, use_cache=False)
@@ -0,0 +1,226 @@
+# token_budget.py
+"""
+Per-step token budgets for prompt inputs.
+
+Each step caps how many tokens of each input it sends (see DEFAULT_BUDGETS,
+overridable with TOKEN_BUDGETS). Inputs within budget pass through
+untouched. Oversized ones are compressed deterministically, stopping as soon
+as they fit:
+
+  1. dedupe      collapse blank runs, drop repeated lines/paragraphs
+  2. boilerplate strip EEO / legal / privacy footers (job descriptions) and
+                 "references on request" style filler (resumes)
+  3. sections    keep the highest-signal sections (requirements,
+                 responsibilities, experience, skills...) in original order
+  4. truncate    cut the tail at a line (or character) boundary
+
+Every call returns a report {"before", "after", "budget", "actions"} that
+the pipeline stores in the snapshot under "token_budget".
+"""
+
+import re
+from typing import Callable, Dict, Any, List, Tuple
+
+from constants import TOKEN_BUDGET_ENABLED, TOKEN_BUDGETS
+
+# step -> input name -> max tokens
+DEFAULT_BUDGETS: Dict[str, Dict[str, int]] = {
+    "extract_requirements": {"job_description": 4000},
+    "match_requirements": {"resume_text": 3500, "requirements_text": 1500, "prematch_text": 1200},
+    "tailor_resume": {"resume_text": 5000, "mapping_text": 1800, "company_profile_text": 1000},
+    "cover_letter": {"about_me_or_prefs": 800, "company_profile_text": 1000, "requirements_text": 1500},
+}
+
+# input name -> kind of text (drives boilerplate and section scoring)
+INPUT_KINDS = {
+    "job_description": "jd",
+    "resume_text": "resume",
+}
+
+_LEGAL_PATTERNS = re.compile(
+    r"equal (employment )?opportunity|\beeoc?\b|affirmative action|reasonable accommodation"
+    r"|without regard to (race|age|sex|gender|religion)|protected veteran|disability status"
+    r"|e-verify|pay transparency|privacy (notice|policy)|fair chance"
+    r"|applicants with (arrest|criminal)|recruitment agencies|unsolicited resumes",
+    re.IGNORECASE,
+)
+_RESUME_FILLER = re.compile(r"references (are )?available (up)?on request|^references:?$", re.IGNORECASE)
+
+_SECTION_SCORES = {
+    "jd": (
+        (3, ("requirement", "qualification", "responsibilit", "what you'll do", "what you will do", "must",
+             "skills", "experience", "you have", "you bring", "you will", "about the role", "the role")),
+        (2, ("nice to have", "preferred", "bonus", "plus", "tech stack", "stack", "location", "team")),
+        (0, ("about us", "about the company", "who we are", "benefits", "perks", "compensation", "salary",
+             "pay range", "why join", "our culture", "life at", "how to apply", "legal", "eeo", "equal opportunity")),
+    ),
+    "resume": (
+        (3, ("experience", "employment", "work history", "skills", "projects", "technical")),
+        (2, ("summary", "profile", "education", "certification", "achievements", "publications")),
+        (0, ("interests", "hobbies", "references", "personal")),
+    ),
+}
+
+
+def budgets_for(step: str) -> Dict[str, int]:
+    return {**DEFAULT_BUDGETS.get(step, {}), **TOKEN_BUDGETS.get(step, {})}
+
+
+# ---------- helpers ----------
+
+def _paragraphs(text: str) -> List[str]:
+    return [p for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+def _is_heading(line: str) -> bool:
+    s = line.strip()
+    if not s or len(s) > 60 or len(s.split()) > 8 or s.endswith("."):
+        return False
+    if s.startswith("#") or s.endswith(":"):
+        return True
+    letters = [c for c in s if c.isalpha()]
+    return len(letters) >= 3 and all(c.isupper() for c in letters)
+
+def _sections(text: str) -> List[Tuple[str, str]]:
+    """(heading, body) blocks; text before the first heading has heading ''."""
+    out: List[Tuple[str, List[str]]] = [("", [])]
+    for line in text.splitlines():
+        if _is_heading(line):
+            out.append((line.strip(), [line]))
+        else:
+            out[-1][1].append(line)
+    return [(h, "\n".join(lines).strip()) for h, lines in out if "\n".join(lines).strip()]
+
+def _section_score(kind: str, heading: str) -> int:
+    if not heading:
+        # preamble: the role summary of a JD, the contact/header block of a resume
+        return 2
+    h = heading.lower().strip("#: ")
+    for score, keys in _SECTION_SCORES.get(kind, ()):
+        if any(k in h for k in keys):
+            return score
+    return 1
+
+
+# ---------- compression stages ----------
+
+def _dedupe(text: str) -> str:
+    seen_lines, seen_paras, paras = set(), set(), []
+    for para in _paragraphs(text):
+        key = re.sub(r"\s+", " ", para).strip().lower()
+        if key in seen_paras:
+            continue
+        seen_paras.add(key)
+        lines = []
+        for line in para.splitlines():
+            line = line.rstrip()
+            norm = re.sub(r"\s+", " ", line).strip().lower()
+            if len(norm) >= 20:  # short lines ("Python", "Remote") legitimately repeat
+                if norm in seen_lines:
+                    continue
+                seen_lines.add(norm)
+            lines.append(line)
+        if lines:
+            paras.append("\n".join(lines))
+    return "\n\n".join(paras)
+
+def _strip_boilerplate(text: str, kind: str) -> str:
+    if kind == "jd":
+        kept: List[str] = []
+        for para in _paragraphs(text):
+            if _LEGAL_PATTERNS.search(para):
+                # also drop the bare heading that introduced it ("EEO Statement:")
+                if kept and "\n" not in kept[-1].strip() and _is_heading(kept[-1]):
+                    kept.pop()
+                continue
+            kept.append(para)
+        return "\n\n".join(kept)
+    if kind == "resume":
+        return "\n".join(l for l in text.splitlines() if not _RESUME_FILLER.search(l.strip()))
+    return text
+
+def _keep_sections(text: str, kind: str, budget: int, count: Callable[[str], int]) -> Tuple[str, List[str]]:
+    sections = _sections(text)
+    ranked = sorted(range(len(sections)), key=lambda i: (-_section_score(kind, sections[i][0]), i))
+    keep, used, dropped = set(), 0, []
+    for i in ranked:
+        cost = count(sections[i][1]) + 1
+        if used + cost <= budget:
+            keep.add(i)
+            used += cost
+        else:
+            dropped.append(sections[i][0] or "(preamble)")
+    return "\n\n".join(sections[i][1] for i in sorted(keep)), dropped
+
+def _truncate(text: str, budget: int, count: Callable[[str], int]) -> str:
+    lines = text.splitlines()
+    lo, hi = 0, len(lines)  # largest prefix of lines that fits
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count("\n".join(lines[:mid])) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    out = "\n".join(lines[:lo])
+    if lo < len(lines) and count(out) < budget:
+        # fill the remainder with part of the next line
+        nxt = lines[lo]
+        a, b = 0, len(nxt)
+        while a < b:
+            mid = (a + b + 1) // 2
+            if count(out + "\n" + nxt[:mid]) <= budget:
+                a = mid
+            else:
+                b = mid - 1
+        if a:
+            out = out + "\n" + nxt[:a] if out else nxt[:a]
+    return out
+
+
+# ---------- public ----------
+
+def fit_to_budget(text: str, budget: int, count: Callable[[str], int], kind: str = "text") -> Tuple[str, Dict[str, Any]]:
+    text = text or ""
+    before = count(text)
+    report: Dict[str, Any] = {"before": before, "after": before, "budget": budget, "actions": []}
+    if before <= budget:
+        return text, report
+
+    stages = [
+        ("dedupe", lambda t: _dedupe(t)),
+        ("boilerplate", lambda t: _strip_boilerplate(t, kind)),
+    ]
+    for name, fn in stages:
+        new = fn(text)
+        if new != text:
+            text = new
+            report["actions"].append(name)
+        if count(text) <= budget:
+            report["after"] = count(text)
+            return text, report
+
+    if kind in _SECTION_SCORES:
+        new, dropped = _keep_sections(text, kind, budget, count)
+        if new.strip() and dropped:
+            text = new
+            report["actions"].append("sections")
+            report["dropped_sections"] = dropped
+
+    if count(text) > budget:
+        text = _truncate(text, budget, count)
+        report["actions"].append("truncate")
+
+    report["after"] = count(text)
+    return text, report
+
+
+def apply_budgets(step: str, inputs: Dict[str, str], count: Callable[[str], int]) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+    """Fit each of a step's inputs to its budget; returns (inputs, per-input reports)."""
+    if not TOKEN_BUDGET_ENABLED:
+        return inputs, {}
+    budgets = budgets_for(step)
+    out, reports = dict(inputs), {}
+    for name, value in inputs.items():
+        if name not in budgets or value is None:
+            continue
+        out[name], reports[name] = fit_to_budget(value, budgets[name], count, INPUT_KINDS.get(name, "text"))
+    return out, reports